@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+
+"""
+fake_slurm - Stands in for the Slurm commands in slurmlib/commands.py, so the
+stats scripts, srequeue and shold can be run and load tested anywhere.
+
+Install it into a directory, then point SLURM_BIN at that directory (see
+slurmlib/commands.py):
+
+    fake_slurm.py --install /tmp/fake_slurm
+    SLURM_BIN=/tmp/fake_slurm ../sstats.py -a
+
+Each command is a link back to this script, which answers by the name it was
+run as.  If FAKE_SLURM_DIR holds a recorded answer for the command, that is
+replayed, otherwise one is made up (sacct output comes from sacct_synth.py
+and honours --format, --starttime & --endtime the way sacct does: every job
+pending, running or ending within the window, unfinished ones End=Unknown).  Recordings are made with
+
+    fake_slurm.py --record /tmp/recorded -- sacct --allusers ...
+
+and saved both for those exact arguments and as the command's default.
+
+Everything else is set from the environment:
+
+    FAKE_SLURM_DIR      -> Where recorded answers are kept
+    FAKE_SLURM_LATENCY  -> Seconds to wait before answering.  Default: 0
+    FAKE_SLURM_RATE     -> Most lines per second we print.  Default: no limit
+    FAKE_SLURM_JOBS     -> Made up jobs submitted per hour.  Default: 200
+    FAKE_SLURM_PENDING  -> Made up pending jobs in squeue & sprio.  Default: 30
+    FAKE_SLURM_SEED     -> Random seed.  Default: 1
+    FAKE_SLURM_FAIL     -> Exit with this code instead of answering
+
+@Version 1.0
+@Author TB
+"""
+
+### Import commands
+import hashlib
+import os
+import random
+import subprocess
+import sys
+import time
+
+# We are usually run through a link, so find where we really are
+HERE = os.path.dirname(os.path.realpath(__file__))
+sys.path[0:0] = [HERE, os.path.join(HERE, '..')]
+
+import sacct_synth
+from slurmlib import columnar
+from slurmlib import commands
+
+# Made up jobs for squeue, and users for sacctmgr
+RUNNING_JOBS = 50
+PENDING_JOBS = int(os.environ.get('FAKE_SLURM_PENDING', 30))
+MAX_JOBS = 50
+
+# Made up node states for sinfo, and how many of each partition's nodes
+NODE_STATES = [('idle', 0.2), ('allocated', 0.5), ('mixed', 0.2), ('drained', 0.05), ('down*', 0.05)]
+PARTITION_NODES = 100
+
+# Made up users of squeue, sprio & sshare, each always in the same account
+FAKE_USERS = ['User.' + chr(65 + index) + str(index) for index in range(10)]
+
+
+## Functions
+def main():
+    name = os.path.basename(sys.argv[0])
+
+    if name in commands.COMMANDS:
+        answer(name, sys.argv[1:])
+    elif sys.argv[1:2] == ['--install'] and len(sys.argv) == 3:
+        install(sys.argv[2])
+    elif sys.argv[1:2] == ['--record'] and len(sys.argv) > 4 and sys.argv[3] == '--':
+        record(sys.argv[2], sys.argv[4], sys.argv[5:])
+    else:
+        usage()
+
+def usage():
+    print('fake Slurm:')
+    print('--install DIR                 -> Link every Slurm command we stand in for into DIR')
+    print('--record DIR -- COMMAND ARGS  -> Run the real COMMAND and keep its answer in DIR')
+    print('See the top of this script for the FAKE_SLURM_* settings')
+    sys.exit(0)
+
+"""
+install(directory)
+
+Links every command of commands.COMMANDS in directory back to this script.
+"""
+def install(directory):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for name in commands.COMMANDS:
+        link = os.path.join(directory, name)
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.realpath(__file__), link)
+    print('Fake Slurm installed, run with SLURM_BIN=' + directory)
+
+"""
+recording(directory, name, ARGUMENTS)
+
+@return Where the answer to name with exactly ARGUMENTS is recorded, and
+        where the default answer for name is recorded
+"""
+def recording(directory, name, ARGUMENTS):
+    key = hashlib.md5(' '.join(ARGUMENTS).encode('utf-8')).hexdigest()
+    return (os.path.join(directory, name + '.' + key), os.path.join(directory, name))
+
+"""
+record(directory, name, ARGUMENTS)
+
+Runs the real Slurm command and keeps its answer.
+"""
+def record(directory, name, ARGUMENTS):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    OUTPUT = subprocess.check_output([os.path.join(commands.DEFAULT_BIN, name)] + ARGUMENTS)
+    for path in recording(directory, name, ARGUMENTS):
+        with open(path, 'wb') as saved:
+            saved.write(OUTPUT)
+    print('Recorded ' + str(len(OUTPUT.splitlines())) + ' lines of ' + name)
+
+"""
+option(ARGUMENTS, name)
+
+@return The value of --name=VALUE (or --name VALUE) within ARGUMENTS, or None
+"""
+def option(ARGUMENTS, name):
+    for (index, argument) in enumerate(ARGUMENTS):
+        if argument.startswith(name + '='):
+            return argument[len(name) + 1:]
+        if argument == name and index + 1 < len(ARGUMENTS):
+            return ARGUMENTS[index + 1]
+    return None
+
+"""
+emit(LINES)
+
+Prints LINES, no faster than FAKE_SLURM_RATE lines per second.
+"""
+def emit(LINES):
+    rate = float(os.environ.get('FAKE_SLURM_RATE', 0))
+    started = time.time()
+    for (count, line) in enumerate(LINES):
+        if rate and count % 100 == 0:
+            ahead = (count / rate) - (time.time() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+        sys.stdout.write(line)
+    sys.stdout.flush()
+
+"""
+squeue_lines(form, STATES, seed)
+
+@param form   - squeue --format, e.g. '%i|%P|%T|%V|%C'
+@param STATES - Only jobs in these states, lower case, or None for all
+
+@return A generator of made up squeue lines
+"""
+def squeue_lines(form, STATES, seed):
+    RANDOM = random.Random(seed)
+    PARTITIONS = [name for (name, weight) in sacct_synth.parse_weights(sacct_synth.DEFAULT_PARTITIONS)]
+    now = int(time.time())
+
+    JOBS = [('RUNNING', job) for job in range(RUNNING_JOBS)] + [('PENDING', job) for job in range(RUNNING_JOBS, RUNNING_JOBS + PENDING_JOBS)]
+    for (state, job) in JOBS:
+        if STATES and state.lower() not in STATES:
+            continue
+        VALUES = {
+            '%i': str(4000000 + job),
+            '%A': str(4000000 + job),
+            '%P': RANDOM.choice(PARTITIONS),
+            '%T': state,
+            '%V': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now - RANDOM.randint(0, 86400))),
+            '%C': str(RANDOM.randint(1, 64)),
+            '%D': str(RANDOM.randint(1, 4)),
+            '%u': FAKE_USERS[job % len(FAKE_USERS)],
+            '%a': 'acct' + str(job % len(FAKE_USERS) % 3),
+            '%q': 'normal',
+            '%r': 'None' if state == 'RUNNING' else RANDOM.choice(['Priority', 'Priority', 'Resources', 'QOSMaxJobsPerUserLimit']),
+        }
+        yield '|'.join(VALUES.get(letter, '') for letter in form.split('|')) + '\n'
+
+"""
+sinfo_lines(form)
+
+@param form - sinfo --format, e.g. '%R|%T|%D'
+
+@return A generator of made up sinfo lines, one per partition & node state
+"""
+def sinfo_lines(form):
+    for (partition, weight) in sacct_synth.parse_weights(sacct_synth.DEFAULT_PARTITIONS):
+        for (state, share) in NODE_STATES:
+            VALUES = {'%R': partition, '%P': partition, '%T': state, '%D': str(int(PARTITION_NODES * share))}
+            yield '|'.join(VALUES.get(letter, '') for letter in form.split('|')) + '\n'
+
+"""
+sprio_lines(form, seed)
+
+@param form - sprio --format, e.g. '%i|%Y|%A|%F'
+
+@return A generator of made up sprio lines, one per pending squeue job
+"""
+def sprio_lines(form, seed):
+    RANDOM = random.Random(seed)
+    for job in range(RUNNING_JOBS, RUNNING_JOBS + PENDING_JOBS):
+        # Weighted roughly like our production slurm.conf
+        FACTORS = {
+            '%A': RANDOM.randint(0, 5000000),
+            '%F': int(10000000 * (job % len(FAKE_USERS)) / len(FAKE_USERS)),
+            '%J': RANDOM.randint(0, 1000),
+            '%P': 0,
+            '%Q': RANDOM.choice([0, 0, 0, 1000000000]),
+        }
+        VALUES = dict((letter, str(value)) for (letter, value) in FACTORS.items())
+        VALUES['%i'] = str(4000000 + job)
+        VALUES['%Y'] = str(sum(FACTORS.values()))
+        VALUES['%T'] = 'cpu=' + str(RANDOM.randint(0, 640000))
+        yield '|'.join(VALUES.get(letter, '') for letter in form.split('|')) + '\n'
+
+"""
+sshare_lines(form)
+
+@param form - sshare --format, e.g. 'Account,User,EffectvUsage,FairShare'
+
+@return A generator of made up sshare --parsable2 lines, each account then
+        its users
+"""
+def sshare_lines(form):
+    for account in range(3):
+        USERS = [(user, index) for (index, user) in enumerate(FAKE_USERS) if index % 3 == account]
+        ROWS = [(' acct' + str(account), '', 1.0 / 3, 0.5)]
+        ROWS.extend(('  acct' + str(account), user, index / 10.0, 1 - index / 10.0) for (user, index) in USERS)
+        for (name, user, usage, fairshare) in ROWS:
+            VALUES = {'Account': name, 'User': user, 'EffectvUsage': '%.6f' % usage, 'FairShare': '%.6f' % fairshare}
+            yield '|'.join(VALUES.get(field, '') for field in form.split(',')) + '\n'
+
+"""
+made_up(name, ARGUMENTS)
+
+@return A generator of lines answering the command when nothing was recorded
+"""
+def made_up(name, ARGUMENTS):
+    seed = int(os.environ.get('FAKE_SLURM_SEED', 1))
+
+    if name == 'sacct':
+        now = int(time.time())
+        start = columnar.parse_time(option(ARGUMENTS, '--starttime') or '') or now - 43200
+        end = columnar.parse_time(option(ARGUMENTS, '--endtime') or '') or now
+        fields = (option(ARGUMENTS, '--format') or ','.join(sacct_synth.FIELDS)).split(',')
+        per_hour = float(os.environ.get('FAKE_SLURM_JOBS', 200))
+
+        # Every cluster gets its own jobs
+        seed += sum(ord(letter) for letter in option(ARGUMENTS, '--clusters') or '')
+
+        # The same jobs whatever the window, so shards & caches overlap
+        GENERATOR = sacct_synth.SacctSynth(fields=fields, seed=seed, now=now)
+        LINES = GENERATOR.window_lines(start, end, per_hour)
+
+        STATES = option(ARGUMENTS, '--state')
+        if STATES:
+            STATE = fields.index('State')
+            return (line for line in LINES if line.split('|')[STATE] in STATES.split(','))
+        return LINES
+
+    elif name == 'squeue':
+        STATES = option(ARGUMENTS, '--state') or option(ARGUMENTS, '--states') or option(ARGUMENTS, '-t')
+        if STATES:
+            STATES = STATES.lower().split(',')
+        return squeue_lines(option(ARGUMENTS, '--format') or option(ARGUMENTS, '-o') or '%i', STATES, seed)
+
+    elif name == 'sprio':
+        return sprio_lines(option(ARGUMENTS, '--format') or '%i|%Y', seed)
+
+    elif name == 'sshare':
+        return sshare_lines(option(ARGUMENTS, '--format') or 'Account,User,EffectvUsage,FairShare')
+
+    elif name == 'sacctmgr' and 'show' in ARGUMENTS:
+        USERS = []
+        for argument in ARGUMENTS:
+            if argument.startswith('users='):
+                USERS.extend(argument[len('users='):].split(','))
+            elif argument.startswith('accounts='):
+                USERS.extend('User.' + str(index) for index in range(3))
+        return (user + '|acct0|' + str(MAX_JOBS) + '\n' for user in USERS)
+
+    elif name == 'sinfo' and option(ARGUMENTS, '--format'):
+        return sinfo_lines(option(ARGUMENTS, '--format'))
+
+    elif name == 'sinfo':
+        return iter(['PARTITION AVAIL  TIMELIMIT  NODES  STATE NODELIST\n', 'batch*       up   infinite    400   idle node[001-400]\n'])
+
+    # scontrol requeue, sacctmgr modify & the like just work
+    return iter([])
+
+"""
+answer(name, ARGUMENTS)
+
+Answers as the Slurm command name would have, from a recording if we have
+one, after FAKE_SLURM_LATENCY seconds.
+"""
+def answer(name, ARGUMENTS):
+    time.sleep(float(os.environ.get('FAKE_SLURM_LATENCY', 0)))
+
+    fail = int(os.environ.get('FAKE_SLURM_FAIL', 0))
+    if fail:
+        sys.stderr.write(name + ': error: FAKE_SLURM_FAIL is set\n')
+        sys.exit(fail)
+
+    directory = os.environ.get('FAKE_SLURM_DIR')
+    if directory:
+        for path in recording(directory, name, ARGUMENTS):
+            if os.path.exists(path):
+                with open(path) as saved:
+                    emit(saved)
+                return
+
+    emit(made_up(name, ARGUMENTS))
+
+### Call Main
+if __name__ == "__main__":
+    main()
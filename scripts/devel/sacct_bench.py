@@ -0,0 +1,198 @@
+#!/usr/local/python/3.2/bin/python3
+
+"""
+sacct_bench - Times each stage of sstats.py and node_stats.py against made up
+sacct output, so we can tell if a change made them faster or slower without
+going near slurmdbd.
+
+For each amount of jobs, sacct_synth.py writes the records the scripts would
+ask sacct for to a file.  Then, for each script, a fresh Python process
+streams that file through the script's reports and runs its calculations and
+printing, timing each stage:
+
+    read + add   -> reading & splitting every line, and every report's add()
+    finish       -> every report's finish()
+    totals       -> calculate_job_totals()
+    print        -> get_all() / get_completed(), printing to nowhere
+
+Each run is its own process so the peak RSS we show is that run's alone.
+
+    sacct_bench.py -n 10000,100000,1000000
+
+@Version 1.0
+@Author TB
+"""
+
+### Import commands
+import getopt
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import node_stats
+import sacct_synth
+import sstats
+from slurmlib import query
+from slurmlib import reports
+from slurmlib import timing
+
+# The scripts we know how to benchmark
+SCRIPTS = ['sstats', 'node_stats']
+
+
+## Functions
+def main():
+
+    ## Global Variables
+    global SIZES
+    global KEEP
+    global SYNTH_OPTIONS
+
+    SIZES = [10000, 100000, 1000000]
+    KEEP = False
+    SYNTH_OPTIONS = {}
+    RUN = None
+    DATA = None
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hkm:n:?", ["data=", "help", "jobs=", "keep", "multi=", "nodes=", "partitions=", "run=", "states="])
+    except getopt.GetoptError:
+        usage()
+    for opt, arg in opts:
+        if opt in ("-h", "help", "--help", "?", "-?"):
+            usage()
+        elif opt in ("-k", "--keep"):
+            KEEP = True
+        elif opt in ("-m", "--multi"):
+            SYNTH_OPTIONS['multi'] = float(arg)
+        elif opt in ("-n", "--jobs"):
+            SIZES = [int(size) for size in arg.split(',')]
+        elif opt == "--nodes":
+            SYNTH_OPTIONS['nodes'] = arg
+        elif opt == "--partitions":
+            SYNTH_OPTIONS['partitions'] = arg
+        elif opt == "--states":
+            SYNTH_OPTIONS['states'] = arg
+        elif opt == "--run":
+            RUN = arg
+        elif opt == "--data":
+            DATA = arg
+
+    # We are the child process running one script against one file
+    if RUN:
+        run_stages(RUN, DATA)
+    else:
+        benchmark()
+
+def usage():
+    print('sacct bench:')
+    print('Times each stage of the stats scripts against made up sacct output')
+    print('-h/?             -> Displays this help message')
+    print('-k               -> Keep the generated sacct output, and say where it is')
+    print('-m FRACTION      -> How many jobs run on more than one node.  Default: 0.1')
+    print('-n N,N,...       -> Amounts of jobs to try.  Default: 10000,100000,1000000')
+    print('--nodes=HOSTLIST -> The nodes jobs run on.  Default: ' + sacct_synth.DEFAULT_NODES)
+    print('--partitions=P   -> Partitions & their weights.  Default: ' + sacct_synth.DEFAULT_PARTITIONS)
+    print('--states=S       -> States & their weights.  Default: ' + sacct_synth.DEFAULT_STATES)
+    sys.exit(0)
+
+"""
+script_reports(script)
+
+@return The reports script feeds from its one sacct query
+"""
+def script_reports(script):
+    if script == 'sstats':
+        JOB_REPORT = reports.JobReport()
+        return [JOB_REPORT, reports.FailureReport(JOB_REPORT)]
+    return [reports.NodeReport()]
+
+"""
+run_stages(script, path)
+
+Runs every stage of script against the sacct output in path, and prints one
+tab separated line per stage for benchmark() to pick up.
+"""
+def run_stages(script, path):
+    REPORTS = script_reports(script)
+    SLURM_QUERY = query.SacctQuery(REPORTS)
+    PROFILER = timing.Profiler()
+
+    # sacct would have filtered on STATES for us, so we do it here
+    STATE = SLURM_QUERY.index['State']
+    with PROFILER.stage('read + add') as stage:
+        for record in query.stream('/bin/cat ' + path):
+            stage.records += 1
+            for report in REPORTS:
+                if not report.STATES or record[STATE] in report.STATES:
+                    report.add(record)
+
+    with PROFILER.stage('finish'):
+        for report in REPORTS:
+            report.finish()
+
+    # The scripts print as they go, so we send that nowhere
+    STDOUT = sys.stdout
+    if script == 'sstats':
+        sstats.VERBOSE = False
+        sstats.FAILURE_REPORT = REPORTS[1]
+        sstats.TOP_FAILURES = 5
+        with PROFILER.stage('totals'):
+            sstats.calculate_job_totals(REPORTS[0])
+        with PROFILER.stage('print'):
+            sys.stdout = io.StringIO()
+            sstats.get_all()
+    else:
+        node_stats.VERBOSE = False
+        with PROFILER.stage('totals'):
+            node_stats.calculate_job_totals(REPORTS[0])
+        with PROFILER.stage('print'):
+            sys.stdout = io.StringIO()
+            node_stats.get_completed()
+    sys.stdout = STDOUT
+
+    for (name, wall, cpu, rss, records) in PROFILER.stages:
+        print('\t'.join([name, str(wall), str(cpu), str(rss), str(records)]))
+
+"""
+benchmark()
+
+Generates our sacct output for every size, runs each script against it in its
+own process, and prints the results.
+"""
+def benchmark():
+    DIRECTORY = tempfile.mkdtemp(prefix='sacct_bench.')
+
+    print('Size'.rjust(9) + '  ' + 'Script'.ljust(12) + 'Stage'.ljust(12) + 'Wall s'.rjust(9) + 'CPU s'.rjust(9) + 'Peak MB'.rjust(9) + 'Rows/s'.rjust(11))
+    try:
+        for size in SIZES:
+            for script in SCRIPTS:
+                FIELDS = query.SacctQuery(script_reports(script)).fields
+                path = os.path.join(DIRECTORY, script + '.' + str(size))
+
+                GENERATOR = sacct_synth.SacctSynth(fields=FIELDS, **SYNTH_OPTIONS)
+                with open(path, 'w') as data:
+                    GENERATOR.write(data, size)
+
+                OUTPUT = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--run=' + script, '--data=' + path], universal_newlines=True)
+                for line in OUTPUT.splitlines():
+                    (name, wall, cpu, rss, records) = line.split('\t')
+                    wall = float(wall)
+                    rate = ''
+                    if int(records) and wall:
+                        rate = str(int(int(records) / wall))
+                    print(str(size).rjust(9) + '  ' + script.ljust(12) + name.ljust(12) + ('%.3f' % wall).rjust(9) + ('%.3f' % float(cpu)).rjust(9) + ('%.1f' % float(rss)).rjust(9) + rate.rjust(11))
+    finally:
+        if KEEP:
+            print('sacct output kept in ' + DIRECTORY)
+        else:
+            shutil.rmtree(DIRECTORY)
+
+### Call Main
+if __name__ == "__main__":
+    main()
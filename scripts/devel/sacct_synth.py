@@ -0,0 +1,281 @@
+#!/usr/local/python/3.2/bin/python3
+
+"""
+sacct_synth - Makes up realistic sacct --parsable2 output, so the stats
+scripts can be tried and timed without a live slurmdbd.
+
+Jobs end somewhere within the last WINDOW seconds, in whatever mix of states,
+partitions and nodes we ask for.  Multi node jobs get a compressed hostlist
+(node[001-004]) just like sacct gives us.  The same seed always makes the
+same jobs.
+
+    sacct_synth.py -n 100000 --states=COMPLETED:70,FAILED:15,CANCELLED:10,TIMEOUT:5 > jobs.txt
+
+Also used by sacct_bench.py.
+
+@Version 1.0
+@Author TB
+"""
+
+### Import commands
+import getopt
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from slurmlib import hostlist
+
+# Every field we know how to make up, and sacct's own order for them
+FIELDS = ['JobID', 'User', 'Account', 'State', 'ExitCode', 'Start', 'End', 'Submit', 'Elapsed',
+          'ElapsedRaw', 'NodeList', 'Partition', 'AllocCPUS', 'NNodes', 'QOS', 'AllocTRES', 'Priority']
+
+DEFAULT_STATES     = 'COMPLETED:70,FAILED:10,CANCELLED:6,TIMEOUT:4,RUNNING:6,PENDING:3,NODE_FAIL:1'
+DEFAULT_PARTITIONS = 'batch:60,debug:25,gpu:10,rdtn:5'
+DEFAULT_NODES      = 'node[001-400]'
+
+# Exit codes failed jobs end with, and how often
+FAILED_EXITS = [('1:0', 50), ('2:0', 15), ('7:0', 20), ('0:9', 10), ('127:0', 5)]
+
+# Longest a job of window_lines() waits in the queue and runs for, in seconds,
+# so we know how far back to look for jobs still around in a window
+MAX_WAIT    = 6 * 3600
+MAX_ELAPSED = 24 * 3600
+
+
+## Functions
+def main():
+
+    ## Global Variables
+    global JOBS
+    global SEED
+
+    JOBS = 10000
+    SEED = 1
+    OPTIONS = {}
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "f:hm:n:s:?", ["fields=", "help", "jobs=", "multi=", "nodes=", "partitions=", "seed=", "states=", "window="])
+    except getopt.GetoptError:
+        usage()
+    for opt, arg in opts:
+        if opt in ("-h", "help", "--help", "?", "-?"):
+            usage()
+        elif opt in ("-f", "--fields"):
+            OPTIONS['fields'] = arg.split(',')
+        elif opt in ("-m", "--multi"):
+            OPTIONS['multi'] = float(arg)
+        elif opt in ("-n", "--jobs"):
+            JOBS = int(arg)
+        elif opt == "--nodes":
+            OPTIONS['nodes'] = arg
+        elif opt == "--partitions":
+            OPTIONS['partitions'] = arg
+        elif opt in ("-s", "--seed"):
+            SEED = int(arg)
+        elif opt == "--states":
+            OPTIONS['states'] = arg
+        elif opt == "--window":
+            OPTIONS['window'] = int(arg)
+
+    GENERATOR = SacctSynth(seed=SEED, **OPTIONS)
+    GENERATOR.write(sys.stdout, JOBS)
+
+def usage():
+    print('sacct synth:')
+    print('Prints made up sacct --parsable2 output')
+    print('-f FIELDS        -> Comma separated sacct fields to print.  Default: ' + ','.join(FIELDS))
+    print('-h/?             -> Displays this help message')
+    print('-m FRACTION      -> How many jobs run on more than one node.  Default: 0.1')
+    print('-n N             -> How many jobs.  Default: 10000')
+    print('--nodes=HOSTLIST -> The nodes jobs run on.  Default: ' + DEFAULT_NODES)
+    print('--partitions=P   -> Partitions & their weights.  Default: ' + DEFAULT_PARTITIONS)
+    print('-s SEED          -> Random seed.  Default: 1')
+    print('--states=S       -> States & their weights.  Default: ' + DEFAULT_STATES)
+    print('--window=SECONDS -> Jobs end within this long of now.  Default: 43200')
+    sys.exit(0)
+
+"""
+parse_weights(text)
+
+@param text - e.g. 'COMPLETED:70,FAILED:10'
+
+@return List of (item, weight) tuples
+"""
+def parse_weights(text):
+    WEIGHTS = []
+    for item in text.split(','):
+        (name, _, weight) = item.rpartition(':')
+        WEIGHTS.append((name, float(weight)))
+    return WEIGHTS
+
+"""
+SacctSynth(fields, states, partitions, nodes, multi, window, seed, now)
+
+@param fields     - The sacct fields each record has, in order
+@param states     - States & weights, see parse_weights()
+@param partitions - Partitions & weights, see parse_weights()
+@param nodes      - Hostlist of the nodes jobs run on
+@param multi      - Fraction of jobs that run on 2-8 nodes
+@param window     - Jobs end within this many seconds of now
+@param seed       - Random seed
+@param now        - Epoch seconds the window ends at.  Default: now
+"""
+class SacctSynth(object):
+
+    def __init__(self, fields=FIELDS, states=DEFAULT_STATES, partitions=DEFAULT_PARTITIONS,
+                 nodes=DEFAULT_NODES, multi=0.1, window=43200, seed=1, now=None):
+        self.fields     = list(fields)
+        self.states     = parse_weights(states)
+        self.partitions = parse_weights(partitions)
+        self.nodes      = list(hostlist.expand(nodes))
+        self.multi      = multi
+        self.window     = window
+        self.seed       = seed
+        self.random     = random.Random(seed)
+        self.now        = int(now or time.time())
+        self.users      = ['User.' + chr(65 + index % 26) + str(index) for index in range(200)]
+        self.accounts   = ['acct' + str(index) for index in range(30)]
+
+    """
+    choose(WEIGHTS)
+
+    @return One item of a List of (item, weight) tuples, by weight
+    """
+    def choose(self, WEIGHTS):
+        point = self.random.uniform(0, sum(weight for (item, weight) in WEIGHTS))
+        for (item, weight) in WEIGHTS:
+            point -= weight
+            if point <= 0:
+                return item
+        return WEIGHTS[-1][0]
+
+    """
+    job(jobid)
+
+    @return Dictionary of field -> value for one made up job
+    """
+    def job(self, jobid):
+        randint = self.random.randint
+        state   = self.choose(self.states)
+        elapsed = int(self.random.expovariate(1 / 3600.0))
+        end     = self.now - randint(0, self.window)
+        start   = end - elapsed
+        submit  = start - randint(0, 1800)
+
+        return self.make(jobid, state, submit, start, end)
+
+    """
+    make(jobid, state, submit, start, end)
+
+    @return Dictionary of field -> value for one made up job, with everything
+            but its state & times made up here.  RUNNING jobs have no End and
+            PENDING jobs no Start either, just like sacct shows them.
+    """
+    def make(self, jobid, state, submit, start, end):
+        randint = self.random.randint
+        elapsed = end - start
+
+        count = 1
+        if self.random.random() < self.multi:
+            count = randint(2, 8)
+        first = randint(0, max(len(self.nodes) - count, 0))
+        NODES = self.nodes[first:first + count]
+        cpus  = randint(1, 32) * len(NODES)
+
+        exit_code = '0:0'
+        if state not in ('COMPLETED', 'RUNNING', 'PENDING', 'CANCELLED', 'TIMEOUT'):
+            exit_code = self.choose(FAILED_EXITS)
+        elif state == 'CANCELLED' and self.random.random() < 0.8:
+            state = 'CANCELLED by ' + str(randint(1000, 9999))
+            exit_code = '0:15'
+
+        JOB = {
+            'JobID'    : str(jobid),
+            'User'     : self.random.choice(self.users),
+            'Account'  : self.random.choice(self.accounts),
+            'State'    : state,
+            'ExitCode' : exit_code,
+            'Submit'   : time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(submit)),
+            'Start'    : time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(start)),
+            'End'      : time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(end)),
+            'ElapsedRaw': elapsed,
+            'NodeList' : hostlist.compress(NODES),
+            'Partition': self.choose(self.partitions),
+            'AllocCPUS': cpus,
+            'NNodes'   : len(NODES),
+            'QOS'      : 'normal',
+            'Priority' : randint(1, 100000),
+        }
+        if state == 'RUNNING':
+            JOB['End'] = 'Unknown'
+            JOB['ElapsedRaw'] = self.now - start
+        elif state == 'PENDING':
+            JOB['Start'] = JOB['End'] = 'Unknown'
+            JOB['NodeList'] = 'None assigned'
+            JOB['ElapsedRaw'] = 0
+            JOB['AllocCPUS'] = JOB['NNodes'] = 0
+
+        elapsed = JOB['ElapsedRaw']
+        JOB['Elapsed'] = '%02d:%02d:%02d' % (elapsed // 3600, (elapsed // 60) % 60, elapsed % 60)
+        JOB['AllocTRES'] = 'billing=' + str(JOB['AllocCPUS']) + ',cpu=' + str(JOB['AllocCPUS']) + ',node=' + str(JOB['NNodes'])
+        return JOB
+
+    """
+    lines(jobs, first)
+
+    @return A generator of jobs lines of sacct --parsable2 output, JobIDs
+            counting up from first
+    """
+    def lines(self, jobs, first=1000000):
+        for jobid in range(first, first + jobs):
+            JOB = self.job(jobid)
+            yield '|'.join(str(JOB.get(field, '')) for field in self.fields) + '\n'
+
+    """
+    window_lines(starttime, endtime, per_hour)
+
+    @param starttime - Epoch seconds our window starts at
+    @param endtime   - Epoch seconds our window ends at
+    @param per_hour  - How many jobs are submitted each hour
+
+    Rather than ending within our window, jobs here are submitted at a steady
+    per_hour, each hour made up from its own seed.  So any window gives back
+    the same jobs: like sacct, every job submitted by endtime that had not
+    ended by starttime.  Jobs that have not started or ended by now are
+    PENDING or RUNNING, with End=Unknown, whatever window asked for them.
+
+    @return A generator of lines of sacct --parsable2 output
+    """
+    def window_lines(self, starttime, endtime, per_hour):
+        per_hour = int(per_hour)
+        FINISHED = [(state, weight) for (state, weight) in self.states if state not in ('RUNNING', 'PENDING')]
+        endtime  = min(endtime, self.now)
+
+        for hour in range((starttime - MAX_WAIT - MAX_ELAPSED) // 3600, endtime // 3600 + 1):
+            self.random = random.Random(self.seed * 1000003 + hour)
+            for index in range(per_hour):
+                # Everything is made up before we look, so a job is the same
+                # whichever window it turns up in
+                submit  = hour * 3600 + self.random.randint(0, 3599)
+                start   = submit + min(int(self.random.expovariate(1 / 600.0)), MAX_WAIT)
+                end     = start + min(int(self.random.expovariate(1 / 3600.0)), MAX_ELAPSED)
+                state   = self.choose(FINISHED)
+                if start > self.now:
+                    state = 'PENDING'
+                elif end > self.now:
+                    state = 'RUNNING'
+                JOB = self.make(hour * per_hour + index, state, submit, start, end)
+
+                if submit <= endtime and (state in ('RUNNING', 'PENDING') or end >= starttime):
+                    yield '|'.join(str(JOB.get(field, '')) for field in self.fields) + '\n'
+
+    def write(self, stream, jobs, first=1000000):
+        for line in self.lines(jobs, first):
+            stream.write(line)
+
+### Call Main
+if __name__ == "__main__":
+    main()
@@ -1,89 +1,171 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 
 """
-shold - version written in Python to attempt to better learn the language as 
+shold - version written in Python to attempt to better learn the language as
 well to see if this language will be more robust for this kind of task.
 
-@Version 1.0
+Any number of users (or every user of an account) can be held or resumed at
+once.  They are changed with as few sacctmgr commands as we can, BATCH_SIZE
+users to a command, and each user's MaxJobs is shown before and after.
+
+@Version 1.1
 @Author TB
 """
 
 ### Import commands
 import getopt
+import os
 import re
 import subprocess
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from slurmlib import commands
+
 ## Functions
 def main():
 
     ## Global Variables
-    global HOLD_USER
-    global HOLD = False
-    global MAX_JOB_ZERO = 0
-    global MAX_JOB_DEFAULT = 50
-    global SCONTROL_CMD = '/path/to/slurm/default/bin/scontrol'
-    global SACCTMGR_CMD = '/path/to/slurm/default/bin/sacctmgr -i'
-    global VERBOSE = False
+    global HOLD_USERS
+    global HOLD_ACCOUNT
+    global RESUME
+    global MAX_JOB_ZERO
+    global MAX_JOB_DEFAULT
+    global SCONTROL_CMD
+    global SACCTMGR_CMD
+    global BATCH_SIZE
+    global VERBOSE
+
+    HOLD_USERS = []
+    HOLD_ACCOUNT = ''
+    RESUME = False
+    MAX_JOB_ZERO = 0
+    MAX_JOB_DEFAULT = 50
+    SCONTROL_CMD = commands.path('scontrol')
+    SACCTMGR_CMD = commands.path('sacctmgr') + ' -i'
+    VERBOSE = False
+
+    # Most users we put into a single sacctmgr command
+    BATCH_SIZE = 200
 
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "hru:v?", ["user=", "resume", "help", "verbose"])
-    except getopt.GetOptError:
+        opts, args = getopt.getopt(sys.argv[1:], "A:hrsu:v?", ["account=", "user=", "resume", "stdin", "help", "verbose"])
+    except getopt.GetoptError:
         usage()
     for opt, arg in opts:
         if opt in ("-h", "help", "--help", "?", "-?"):
             usage()
         elif opt in ("-u", "--user"):
-            HOLD_USER = arg
+            HOLD_USERS.extend(user for user in arg.split(",") if user)
+        elif opt in ("-s", "--stdin"):
+            HOLD_USERS.extend(sys.stdin.read().replace(",", " ").split())
+        elif opt in ("-A", "--account"):
+            HOLD_ACCOUNT = arg
         elif opt in ("-r", "--resume"):
-            HOLD = True
-        elif opt in ("-v", "--verbose")
+            RESUME = True
+        elif opt in ("-v", "--verbose"):
             VERBOSE = True
     sanity()
-    hold_user()
+    hold_users()
 
 def verbosity(text):
     if VERBOSE:
-        print str(text)
+        print(str(text))
 
 def sanity():
+    if not HOLD_USERS and not HOLD_ACCOUNT:
+        print("ERROR!  You must give at least one user or an account")
+        usage()
+
     # Handle user names that must be in Camel.Case
     userre = re.compile (r"[A-Z]{1}[a-z]*(\.*[A-Z]*)\.[A-Z]{1}[a-z]*", re.I)
-    if not userre.match (HOLD_USER):
-        print "ERROR!  Invalid user name format.  Must be Camel.Case"
-        print "You submitted: " + str(HOLD_USER)
-        usage()
+    for user in HOLD_USERS:
+        if not userre.match (user):
+            print("ERROR!  Invalid user name format.  Must be Camel.Case")
+            print("You submitted: " + str(user))
+            usage()
 
 def usage():
-    print 'Slurm Hold:'
-    print 'You must have proper Slurm priviliges in order to run this command'
-    print '-h/?             -> Displays this help message'
-    print "-r               -> Sets the script to 'Resume' a user's work, effectively setting their MaxJobs to " + str(MAX_JOB_DEFAULT)
-    print '-u First.Last    -> The user to hold.  This will effectively set their MaxJobs to ' + str(MAX_JOB_ZERO) + ".  User name must be in Camel.Case"
-    print '-v               -> Triggers verbose output.'
+    print('Slurm Hold:')
+    print('You must have proper Slurm priviliges in order to run this command')
+    print('-A account       -> Hold every user of the account')
+    print('-h/?             -> Displays this help message')
+    print("-r               -> Sets the script to 'Resume' a user's work, effectively setting their MaxJobs to " + str(MAX_JOB_DEFAULT))
+    print('-s               -> Read more users to hold from stdin, separated by spaces, commas or newlines')
+    print('-u First.Last    -> The user to hold.  This will effectively set their MaxJobs to ' + str(MAX_JOB_ZERO) + ".  User name must be in Camel.Case")
+    print('                    May be given more than once, or as a comma separated list')
+    print('-v               -> Triggers verbose output.')
     sys.exit(0)
 
-def hold_user():
-    verbosity('Working on ' + str(HOLD_USER))
-    
-    if HOLD:
-        MAX_JOB = MAX_JOB_ZERO
-        verbosity('Setting MaxJobs to ' + str(MAX_JOB_ZERO))
-    else:
+"""
+where_clauses()
+
+@return List of sacctmgr 'where' clauses covering every user (BATCH_SIZE to a
+        clause) and the account we were asked to change
+"""
+def where_clauses():
+    USERS = sorted(set(HOLD_USERS))
+    CLAUSES = ['where users=' + ','.join(USERS[index:index + BATCH_SIZE]) for index in range(0, len(USERS), BATCH_SIZE)]
+    if HOLD_ACCOUNT:
+        CLAUSES.append('where accounts=' + str(HOLD_ACCOUNT))
+    return CLAUSES
+
+"""
+show_max_jobs(CLAUSES)
+
+@return Dictionary of (user, account) -> MaxJobs for every association the
+        where clauses cover
+"""
+def show_max_jobs(CLAUSES):
+    MAX_JOBS = {}
+    for clause in CLAUSES:
+        SHOW_USER = str(SACCTMGR_CMD) + ' --noheader --parsable2 show assoc ' + clause + ' format=User,Account,MaxJobs'
+        (EXIT_CODE, SACCTMGR_OUTPUT) = subprocess.getstatusoutput(SHOW_USER)
+        if EXIT_CODE != 0:
+            verbosity('Could not show ' + clause + ': ' + SACCTMGR_OUTPUT)
+            continue
+        for line in SACCTMGR_OUTPUT.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[0]:
+                MAX_JOBS[(fields[0], fields[1])] = fields[2]
+    return MAX_JOBS
+
+def hold_users():
+    if RESUME:
         MAX_JOB = MAX_JOB_DEFAULT
         verbosity('Setting MaxJobs to ' + str(MAX_JOB_DEFAULT))
-    verbosity ('We are going to set ' + str(HOLD_USER) "'s MaxJobs to " + str(MAX_JOB))
-    
-    MODIFY_USER = str(SACCTMGR_CMD) + ' modify user ' + str(HOLD_USER) + ' set MaxJobs=' + str(MAX_JOB)
-    (EXIT_CODE, SACCTMGR_OUTPUT) = subprocess.getstatusoutput(MODIFY_USER)
-
-    if EXIT_CODE == 0:
-        print str(HOLD_USER) + ' modified successfully.  Set MaxJobs to ' + +str(MAX_JOB)
-        sys.exit(0)
-    else
-        print 'SOMETHING WENT WRONG!!!'
-        sys.exit(EXIT_CODE)
+    else:
+        MAX_JOB = MAX_JOB_ZERO
+        verbosity('Setting MaxJobs to ' + str(MAX_JOB_ZERO))
+
+    CLAUSES = where_clauses()
+    BEFORE = show_max_jobs(CLAUSES)
+
+    EXIT_STATUS = 0
+    for clause in CLAUSES:
+        verbosity('Working on ' + clause)
+        MODIFY_USER = str(SACCTMGR_CMD) + ' modify user ' + clause + ' set MaxJobs=' + str(MAX_JOB)
+        (EXIT_CODE, SACCTMGR_OUTPUT) = subprocess.getstatusoutput(MODIFY_USER)
+        if EXIT_CODE != 0:
+            print('SOMETHING WENT WRONG!!! ' + clause)
+            print(str(SACCTMGR_OUTPUT))
+            EXIT_STATUS = EXIT_CODE
+
+    AFTER = show_max_jobs(CLAUSES)
+
+    print('User'.ljust(24) + 'Account'.ljust(16) + 'MaxJobs')
+    for (user, account) in sorted(set(BEFORE) | set(AFTER)):
+        before = BEFORE.get((user, account)) or 'none'
+        after  = AFTER.get((user, account)) or 'none'
+        print(user.ljust(24) + account.ljust(16) + before + ' -> ' + after)
+
+    MISSING = sorted(set(HOLD_USERS) - set(user for (user, account) in AFTER))
+    if MISSING:
+        print('No associations found for: ' + ','.join(MISSING))
+
+    sys.exit(EXIT_STATUS)
 
 ### Call Main
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
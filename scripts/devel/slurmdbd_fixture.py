@@ -0,0 +1,126 @@
+#!/usr/local/python/3.2/bin/python3
+
+"""
+slurmdbd_fixture - Load a mysqldump of slurm_acct_db into a SQLite file, so
+sstats --slurmdbd and node_stats --slurmdbd can be tried anywhere.
+
+The dump must be made with --complete-insert so every INSERT names its
+columns, e.g.
+
+    mysqldump --complete-insert --no-create-info slurm_acct_db batch_job_table qos_table > dump.sql
+    slurmdbd_fixture.py -o fixture.sqlite dump.sql
+    sstats.py -a --slurmdbd=batch --slurmdbd-fixture=fixture.sqlite
+
+Only the INSERTs are read.  Each table is created from the columns its first
+INSERT names, which is all the stats scripts need.
+
+@Version 1.0
+@Author TB
+"""
+
+### Import commands
+import getopt
+import re
+import sqlite3
+import sys
+
+# INSERT INTO `batch_job_table` (`job_db_inx`, `mod_time`, ...) VALUES ...
+INSERT = re.compile(r"INSERT INTO `?(\w+)`? \(([^)]*)\) VALUES ")
+
+# MySQL backslash escapes, and what they stand for
+ESCAPES = {'0': '\0', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+
+
+## Functions
+def main():
+
+    ## Global Variables
+    global OUTPUT
+    global VERBOSE
+
+    OUTPUT = 'slurmdbd_fixture.sqlite'
+    VERBOSE = False
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "ho:v?", ["help", "output=", "verbose"])
+    except getopt.GetoptError:
+        usage()
+    for opt, arg in opts:
+        if opt in ("-h", "help", "--help", "?", "-?"):
+            usage()
+        elif opt in ("-o", "--output"):
+            OUTPUT = arg
+        elif opt in ("-v", "--verbose"):
+            VERBOSE = True
+
+    if args:
+        with open(args[0], errors='replace') as dump:
+            load(dump)
+    else:
+        load(sys.stdin)
+
+def verbosity(text):
+    if VERBOSE:
+        print(str(text))
+
+def usage():
+    print('slurmdbd fixture:')
+    print('Reads a mysqldump --complete-insert of slurm_acct_db from FILE or stdin')
+    print('-h/?             -> Displays this help message')
+    print('-o FILE          -> The SQLite file to write.  Default: slurmdbd_fixture.sqlite')
+    print('-v               -> Triggers verbose output.')
+    sys.exit(0)
+
+"""
+to_sqlite(values)
+
+@param values - The VALUES part of a MySQL INSERT
+
+Rewrites MySQL's backslash escaped strings the way SQLite expects them, with
+quotes doubled instead.
+
+@return values, ready for SQLite
+"""
+def to_sqlite(values):
+    TEXT = []
+    quoted = False
+    escaped = False
+    for char in values:
+        if escaped:
+            char = ESCAPES.get(char, char)
+            TEXT.append("''" if char == "'" else char)
+            escaped = False
+        elif quoted and char == '\\':
+            escaped = True
+        else:
+            if char == "'":
+                quoted = not quoted
+            TEXT.append(char)
+    return ''.join(TEXT)
+
+def load(dump):
+    DATABASE = sqlite3.connect(OUTPUT)
+    CREATED = set()
+    ROWS = 0
+
+    for line in dump:
+        match = INSERT.match(line)
+        if not match:
+            continue
+
+        (table, columns) = match.groups()
+        if table not in CREATED:
+            verbosity('Creating ' + table)
+            DATABASE.execute('CREATE TABLE IF NOT EXISTS ' + table + ' (' + columns.replace('`', '"') + ')')
+            CREATED.add(table)
+
+        STATEMENT = 'INSERT INTO ' + table + ' (' + columns.replace('`', '"') + ') VALUES ' + to_sqlite(line[match.end():].rstrip().rstrip(';'))
+        ROWS += DATABASE.execute(STATEMENT).rowcount
+
+    DATABASE.commit()
+    DATABASE.close()
+    print('Loaded ' + str(ROWS) + ' rows of ' + ', '.join(sorted(CREATED)) + ' into ' + OUTPUT)
+
+### Call Main
+if __name__ == "__main__":
+    main()
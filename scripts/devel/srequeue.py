@@ -1,139 +1,231 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 
 """
-srequeue - version written in Python to attempt to better learn the language as 
+srequeue - version written in Python to attempt to better learn the language as
 well to see if this language will be more robust for this kind of task.
 
-@Version 1.0
+Rather than one scontrol per job, job IDs are requeued in comma separated
+batches, several batches at a time.  If a batch fails, the jobs that failed
+are retried on their own so we know exactly which jobs did not make it.
+
+@Version 1.1
 @Author TB
 """
 
 ### Import commands
+import concurrent.futures
 import getopt
+import os
 import re
 import subprocess
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from slurmlib import commands
+
 ## Functions
 def main():
 
     ## Global Variables
-    global ALL = True
+    global ALL
     global REQUEUE_USER
-    global SCONTROL_CMD = '/path/to/slurm/default/bin/scontrol'
-    global SCONTROL_REQUEUE = str(SCONTROL_CMD) + " requeue"
-    global SQUEUE_CMD = '/path/to/slurm/default/bin/squeue --state=running -o %A -h'
-    global SHOLD_CMD = '/path/to/slurm/scripts/shold'
-    global SLURM_JOB_LIST = ''
-    global VERBOSE = False
-    
+    global SCONTROL_CMD
+    global SCONTROL_REQUEUE
+    global SQUEUE_CMD
+    global SQUEUE_STATE_CMD
+    global SHOLD_CMD
+    global BATCH_SIZE
+    global WORKERS
+    global VERBOSE
+
+    ALL = True
+    REQUEUE_USER = ''
+    SCONTROL_CMD = commands.path('scontrol')
+    SCONTROL_REQUEUE = str(SCONTROL_CMD) + " requeue"
+    SQUEUE_CMD = commands.path('squeue') + ' --state=running -o %A -h'
+    SQUEUE_STATE_CMD = commands.path('squeue') + ' -o %A,%T -h -j '
+    SHOLD_CMD = '/path/to/slurm/scripts/shold'
+    VERBOSE = False
+
+    # How many job IDs go into one scontrol requeue, and how many of those we
+    # run at once
+    BATCH_SIZE = 100
+    WORKERS = 4
+
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "ahu:v?", ["user=", "resume", "help", "verbose", "all"])
-    except getopt.GetOptError:
+        opts, args = getopt.getopt(sys.argv[1:], "ab:hu:vw:?", ["user=", "batch=", "help", "verbose", "all", "workers="])
+    except getopt.GetoptError:
         usage()
     for opt, arg in opts:
         if opt in ("-h", "help", "--help", "?", "-?"):
             usage()
         elif opt in ("-u", "--user"):
-            All = False
+            ALL = False
             REQUEUE_USER = arg
         elif opt in ("-a", "--all"):
-            All = True
-        elif opt in ("-v", "--verbose")
+            ALL = True
+        elif opt in ("-b", "--batch"):
+            BATCH_SIZE = int(arg)
+        elif opt in ("-w", "--workers"):
+            WORKERS = int(arg)
+        elif opt in ("-v", "--verbose"):
             VERBOSE = True
     sanity()
-    requeue()
+    warning_message()
 
 def verbosity(text):
     if VERBOSE:
-        print str(text)
+        print(str(text))
 
 def sanity():
+    if ALL:
+        return
+
     # Handle Camel.Case
     userre = re.compile (r"[A-Z]{1}[a-z]*(\.*[A-Z]*)\.[A-Z]{1}[a-z]*", re.I)
-    
+
     if not userre.match (REQUEUE_USER):
-        print "ERROR!  Invalid user name format.  Must be Camel.Case"
-        print "You submitted: " + str(REQUEUE_USER)
+        print("ERROR!  Invalid user name format.  Must be Camel.Case")
+        print("You submitted: " + str(REQUEUE_USER))
         usage()
 
 def usage():
-    print 'Slurm Requeue:'
-    print 'You must have proper Slurm priviliges in order to run this command'
-    print '-a               -> Requeue ALL running jobs in the system.'
-    print '-h/?             -> Displays this help message'
-    print '-u First.Last    -> The user whose jobs will be requeued.  User name must be in Camel.Case'
-    print '-v               -> Triggers verbose output.'
+    print('Slurm Requeue:')
+    print('You must have proper Slurm priviliges in order to run this command')
+    print('-a               -> Requeue ALL running jobs in the system.')
+    print('-b N             -> How many jobs to requeue with each scontrol.  Default: 100')
+    print('-h/?             -> Displays this help message')
+    print('-u First.Last    -> The user whose jobs will be requeued.  User name must be in Camel.Case')
+    print('-v               -> Triggers verbose output.')
+    print('-w N             -> How many scontrol commands to run at once.  Default: 4')
     sys.exit(0)
 
+"""
+job_states(JOBS)
+
+@param JOBS - List of job IDs
+
+@return Dictionary of job ID -> state, per squeue.  Jobs that have left the
+        queue are not in it.
+"""
+def job_states(JOBS):
+    STATES = {}
+    for line in subprocess.getoutput(SQUEUE_STATE_CMD + ",".join(JOBS)).split():
+        (job, _, state) = line.partition(",")
+        STATES[job] = state
+    return STATES
+
+"""
+requeue_batch(JOBS)
+
+@param JOBS - List of job IDs
+
+Requeues every job in JOBS with a single scontrol.  If that fails, scontrol
+names the jobs it could not requeue, and only those are retried on their own.
+If it did not name any of them, we ask squeue where each job is at: jobs that
+are queued again but no longer running made it, only the rest are retried.
+
+@return List of (job, succeeded, scontrol output) tuples
+"""
+def requeue_batch(JOBS):
+    REQUEUE_CMD = str(SCONTROL_REQUEUE) + " " + ",".join(JOBS)
+    (EXIT_CODE, SCONTROL_OUTPUT) = subprocess.getstatusoutput(REQUEUE_CMD)
+
+    if not EXIT_CODE:
+        return [(job, True, SCONTROL_OUTPUT) for job in JOBS]
+
+    if len(JOBS) == 1:
+        return [(JOBS[0], False, SCONTROL_OUTPUT)]
+
+    NAMED = [job for job in JOBS if re.search(r"\b" + re.escape(job) + r"\b", SCONTROL_OUTPUT)]
+    if not NAMED:
+        STATES = job_states(JOBS)
+        NAMED = [job for job in JOBS if STATES.get(job, "RUNNING") == "RUNNING"]
+
+    RESULTS = [(job, True, SCONTROL_OUTPUT) for job in JOBS if job not in NAMED]
+    for job in NAMED:
+        RESULTS.extend(requeue_batch([job]))
+    return RESULTS
+
 def requeue():
-    SLURM_JOB_LIST = subprocess.getoutput(SQUEUE_CMD)
+    if ALL:
+        LIST_CMD = SQUEUE_CMD
+    else:
+        LIST_CMD = str(SQUEUE_CMD) + " -u " + str(REQUEUE_USER)
+    SLURM_JOB_LIST = subprocess.getoutput(LIST_CMD).split()
 
-    if !SLURM_JOB_LIST:
-        print "Job list is empty, no jobs to requeue"
+    if not SLURM_JOB_LIST:
+        print("Job list is empty, no jobs to requeue")
         sys.exit(0)
-    
-    verbosity ("Requeueing jobs")
-    for job in SLURM_JOB_LIST
-        print "Attempting to requeue job " + str(job)
-        REQUEUE_CMD = str(SCONTROL_CMD) + " " + str(job)
-        (EXIT_CODE, SCONTROL_OUTPUT) = subprocess.getstatusoutput(REQUEUE_CMD)
-        if !EXIT_CODE
-            print str(job) + " has been requeued successfully!"
-            print ""
-        else
-            print "FAILURE: " + str(job) + " could not be requeueud!  Please inform user."
-            print str(SCONTROL_OUTPUT)
-
-    print "All jobs have been requeueud!"
+
+    BATCHES = [SLURM_JOB_LIST[index:index + BATCH_SIZE] for index in range(0, len(SLURM_JOB_LIST), BATCH_SIZE)]
+
+    verbosity("Requeueing " + str(len(SLURM_JOB_LIST)) + " jobs in " + str(len(BATCHES)) + " batches")
+    FAILED = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        for RESULTS in executor.map(requeue_batch, BATCHES):
+            for (job, succeeded, SCONTROL_OUTPUT) in RESULTS:
+                if succeeded:
+                    verbosity(str(job) + " has been requeued successfully!")
+                else:
+                    print("FAILURE: " + str(job) + " could not be requeueud!  Please inform user.")
+                    print(str(SCONTROL_OUTPUT))
+                    FAILED.append(job)
+
+    print("")
+    print(str(len(SLURM_JOB_LIST) - len(FAILED)) + " of " + str(len(SLURM_JOB_LIST)) + " jobs have been requeueud!")
+    if FAILED:
+        print("Failed to requeue: " + ",".join(FAILED))
+        sys.exit(1)
 
 
 def warning_message():
     if ALL:
-        print ""
-        print "#################### WARNING ####################"
-        print "# THIS WILL REQUEUE ALL CURRENTLY RUNNING JOBS  #"
-        print "#      ENSURE THAT YOU WERE DIRECTED BY AN      #"
-        print "#     ADMINISTRATOR BEFORE YOU EXECUTE THIS     #"
-        print "#    OR THAT YOU HAVE NOTICED AN ISSUE FIRST    #"
-        print "#                                               #"
-        print "#       THIS DOES NOT PAUSE THE SCHEDULER       #"
-        print "#################### WARNING ####################"
-        print ""
-        print "Did you pause the scheduler too?"
-        print ""
+        print("")
+        print("#################### WARNING ####################")
+        print("# THIS WILL REQUEUE ALL CURRENTLY RUNNING JOBS  #")
+        print("#      ENSURE THAT YOU WERE DIRECTED BY AN      #")
+        print("#     ADMINISTRATOR BEFORE YOU EXECUTE THIS     #")
+        print("#    OR THAT YOU HAVE NOTICED AN ISSUE FIRST    #")
+        print("#                                               #")
+        print("#       THIS DOES NOT PAUSE THE SCHEDULER       #")
+        print("#################### WARNING ####################")
+        print("")
+        print("Did you pause the scheduler too?")
+        print("")
         query_string="REQUEUE ALL Running work?"
     else:
-        print ""
+        print("")
         query_string="REQUEUE USER " + str(REQUEUE_USER) + "'s work?"
 
     query_yes_no(query_string)
 
 def query_yes_no(question, default="no"):
     valid = {"yes": True, "y": True, "ye": True,
-             "Y": True, "Ye": True, "YE": True, 
-             "YES": True, "NO": False, "no": False,
-             "N": False, "n": False, "No": False, "nO": False}
-    
+             "no": False, "n": False}
+
     if default is None:
         prompt = " [y/n]"
     elif default == "yes":
-        promt = " [Y/n]"
+        prompt = " [Y/n]"
     elif default == "no":
         prompt = " [y/N]"
     else:
-        raise ValueError("invalid default answer '%s'" & default)
+        raise ValueError("invalid default answer '%s'" % default)
 
     while True:
         sys.stdout.write(question + prompt)
-        choice = raw_input().lower()
+        choice = input().lower()
         if default is not None and choice == "":
             sys.exit(0)
         elif choice in valid:
-            requeue()
+            if valid[choice]:
+                requeue()
+            sys.exit(0)
         else:
-            sys.stdout.write("Please enter either yes or no")
+            sys.stdout.write("Please enter either yes or no\n")
 
 ### Call Main
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -21,17 +21,27 @@ TODO - Implement -t
 """
 
 ### Import commands
+import cProfile
 import getopt
-import subprocess
 import sys
-import datetime
+
+from slurmlib import archive
+from slurmlib import cache
+from slurmlib import commands
+from slurmlib import columnar
+from slurmlib import histogram
+from slurmlib import jobcomp
+from slurmlib import output
+from slurmlib import query
+from slurmlib import reports
+from slurmlib import slurmdbd
+from slurmlib import timing
 
 
 # Functions
 def main():
 
     # Global Variables
-    global SACCT_CMD
     global VERBOSE
     global DATE_STRING
     global LAST_WEEK
@@ -40,10 +50,20 @@ def main():
     global GET_ALL
     global GET_COMPLETED
     global GET_FAILED
-
-    # The command that is the cornerstone of the data for this script.
-    SACCT_CMD = '/apps/slurm/default/bin/sacct --format=JobID,User,Account,State,ExitCode,Start,End,Elapsed,NodeList,ElapsedRaw,Partition --allusers --allocations --noheader --state=COMPLETED --parsable2 --starttime='
-    
+    global BUCKET_EDGES
+    global USE_CACHE
+    global CACHE_DIR
+    global SHARDS
+    global SLURMDBD
+    global SLURMDBD_FIXTURE
+    global JOBCOMP_LOG
+    global ARCHIVE_DIR
+    global FROM_ARCHIVE
+    global FORMAT
+    global TEXTFILE_DIR
+    global PROFILE
+    global PROFILE_DUMP
+    global PROFILER
 
         # Initiate our global values
     GET_ALL         = False
@@ -53,10 +73,24 @@ def main():
     YESTERDAY       = False
     LAST_WEEK       = False
     SPECIFIC        = False
+    BUCKET_EDGES    = histogram.DEFAULT_EDGES
+    USE_CACHE       = False
+    CACHE_DIR       = cache.DEFAULT_DIR
+    SHARDS          = 1
+    SLURMDBD        = None
+    SLURMDBD_FIXTURE = None
+    JOBCOMP_LOG     = None
+    ARCHIVE_DIR     = None
+    FROM_ARCHIVE    = None
+    FORMAT          = 'text'
+    TEXTFILE_DIR    = None
+    PROFILE         = False
+    PROFILE_DUMP    = None
+    PROFILER        = timing.Profiler()
 
     # Parse the command line arguments
     try:
-        opts, args = getopt.getopt(sys.argv[1:], 'acdfhtvw?', ['all', 'completed', 'day', 'failed', 'help', 'time', 'verbose', 'week'])
+        opts, args = getopt.getopt(sys.argv[1:], 'ab:Ccdfhs:tvw?', ['all', 'archive=', 'buckets=', 'cache', 'cache-dir=', 'completed', 'day', 'days=', 'failed', 'format=', 'from-archive=', 'help', 'jobcomp=', 'profile', 'profile-dump=', 'shards=', 'slurmdbd=', 'slurmdbd-fixture=', 'textfile-dir=', 'time', 'verbose', 'week'])
     except getopt.GetoptError:
         print('Non-existant option....')
         print('')
@@ -66,12 +100,49 @@ def main():
             usage()
         elif opt in ('-a', '--all'):
             GET_ALL = True
+        elif opt in ('-b', '--buckets'):
+            try:
+                BUCKET_EDGES = histogram.parse_edges(arg)
+            except ValueError:
+                BUCKET_EDGES = []
+            if not BUCKET_EDGES:
+                print('Invalid buckets: ' + arg)
+                usage()
+        elif opt == '--archive':
+            ARCHIVE_DIR = arg
+        elif opt in ('-C', '--cache'):
+            USE_CACHE = True
+        elif opt == '--cache-dir':
+            USE_CACHE = True
+            CACHE_DIR = arg
         elif opt in ('-c', '--completed'):
             GET_COMPLETED = True
         elif opt in ('-d', '--day'):
             YESTERDAY = True
+        elif opt == '--days':
+            SPECIFIC = True
+            DATE_STRING = query.construct_date(DAYS=int(arg))
+        elif opt == '--from-archive':
+            FROM_ARCHIVE = arg
         elif opt in ('-f', '--failed'):
             GET_FAILED = True
+        elif opt == '--format':
+            FORMAT = arg
+        elif opt in ('-s', '--shards'):
+            SHARDS = int(arg)
+        elif opt == '--profile':
+            PROFILE = True
+        elif opt == '--profile-dump':
+            PROFILE_DUMP = arg
+        elif opt == '--jobcomp':
+            JOBCOMP_LOG = arg
+        elif opt == '--slurmdbd':
+            SLURMDBD = arg
+        elif opt == '--slurmdbd-fixture':
+            SLURMDBD = SLURMDBD or slurmdbd.DEFAULT_CLUSTER
+            SLURMDBD_FIXTURE = arg
+        elif opt == '--textfile-dir':
+            TEXTFILE_DIR = arg
         elif opt in ('-t', '--time'): #NYI
             SPECIFIC = True
             DATE_STRING = arg
@@ -83,8 +154,23 @@ def main():
     # Do a sanity check on items we assume should be
     sanity()
 
-    # Run the script.
-    get_requested_data()
+    # Run the script, under cProfile if we want every call it made
+    try:
+        if PROFILE_DUMP:
+            PROFILE_RUN = cProfile.Profile()
+            PROFILE_RUN.runcall(get_requested_data)
+            PROFILE_RUN.dump_stats(PROFILE_DUMP)
+            verbosity('cProfile stats written to ' + str(PROFILE_DUMP) + ', read them with python -m pstats')
+        else:
+            get_requested_data()
+    except query.SacctError as error:
+        print(str(error))
+        print('FAILURE: Unable to get Job Status')
+        sys.exit(error.code)
+
+    # Our own output may be json etc., so the summary goes to stderr
+    if PROFILE:
+        PROFILER.summary(sys.stderr)
 
 """
 verbosity(text)
@@ -118,11 +204,18 @@ def sanity():
         print('You must specify either, All, Completed, or Failed jobs')
         usage()
 
+    if FORMAT not in output.FORMATS:
+        print('Unknown format: ' + str(FORMAT))
+        usage()
+
+    # Reading slurmdbd, the jobcomp log or the archive does not need any Slurm commands
+    if SLURMDBD or JOBCOMP_LOG or FROM_ARCHIVE:
+        return
+
     # Check to see we have valid access to Slurm commands
-    (SLURM_VERIFY_CODE, STATE_INFO) = subprocess.getstatusoutput('/usr/bin/which /apps/slurm/default/bin/sinfo')
-    if SLURM_VERIFY_CODE:
-        verbosity("Slurm check exit code: " + str(SLURM_VERIFY_CODE))
-        print('No Slurm commands found.  Check PATH &/or Modules')
+    if not commands.available('sinfo'):
+        verbosity('Slurm check failed for: ' + commands.path('sinfo'))
+        print('No Slurm commands found.  Check PATH, Modules &/or SLURM_BIN')
         usage()
 
 
@@ -139,10 +232,24 @@ def usage():
     print ('Slurm Stats:')
     print ('Any valid Slurm user should be able to run this command')
     print ('-a/--all         -> Displays all stats that this script gathers')
+    print ('--archive=DIR    -> Also add every finished job we read to the history archive in DIR, e.g. ' + str(archive.DEFAULT_DIR))
+    print ('-b/--buckets     -> Job duration buckets, e.g. 1m,30m,1h,4h,1d (default)')
+    print ('-C/--cache       -> Only query Slurm for jobs since the last cached run')
+    print ('--cache-dir=DIR  -> Where to keep the cache.  Default: ' + str(cache.DEFAULT_DIR))
     print ('-c/--completed   -> Displays information on Completed jobs')
     print ('-d/--day         -> Get stats for the past 24 hours')
+    print ('--days=N         -> Get stats for the past N days.  Best used with --from-archive')
     print ('-f/--failed      -> Displays information on Failed jobs')
+    print ('--format=FORMAT  -> text, json, csv or prometheus.  Default: text')
+    print ('--from-archive=DIR -> Read finished jobs from the history archive in DIR, rather than sacct')
     print ('-h/?             -> Displays this help message')
+    print ('--jobcomp=FILE   -> Read finished jobs from the jobcomp/filetxt log FILE, rather than sacct, e.g. ' + jobcomp.DEFAULT_LOG)
+    print ('--profile        -> Afterwards, print how long each stage took, to stderr')
+    print ('--profile-dump=F -> Write cProfile stats of the whole run to F, for python -m pstats')
+    print ('-s/--shards N    -> Split the window into N sacct queries that run at the same time')
+    print ('--slurmdbd=NAME  -> Read the job table of cluster NAME straight from the slurmdbd MySQL, rather than sacct')
+    print ('--slurmdbd-fixture=FILE -> With --slurmdbd, read a SQLite copy of slurm_acct_db instead')
+    print ('--textfile-dir=D -> Also write our stats for the node_exporter textfile collector in D')
     print ('-t/--time        -> !!! NYI !!! Select a specific time interval.  Must use valid Slurm time format')
     print ('-v/--verbose     -> Triggers verbose output.')
     print ('-w/--week        -> Get stats for the past 7 days !!! This could take a while !!!')
@@ -154,210 +261,104 @@ def usage():
 def get_requested_data():
 
     if not SPECIFIC:
-        DATE = construct_date()
+        DATE = query.construct_date(LAST_WEEK, YESTERDAY)
     else:
         DATE = DATE_STRING
 
-    global SLURM_INFO
-    SLURM_INFO = run_slurm(DATE)
+    NODE_REPORT = reports.NodeReport(BUCKET_EDGES, columnar.parse_time(DATE) or None)
+    run_slurm(DATE, [NODE_REPORT])
 
     verbosity("calculating Job information")
-    calculate_job_totals(SLURM_INFO)
-
-    if GET_ALL:
-        get_all()
-    elif GET_COMPLETED:
-        get_completed()
-    elif GET_FAILED:
-        get_failed()
+    with PROFILER.stage('totals'):
+        calculate_job_totals(NODE_REPORT)
+
+    with PROFILER.stage('output'):
+        if FORMAT != 'text' or TEXTFILE_DIR:
+            METRICS = output.Metrics({'window': DATE_STRING if SPECIFIC else query.window_name(LAST_WEEK, YESTERDAY)})
+            collect_metrics(METRICS)
+
+            if TEXTFILE_DIR:
+                verbosity('Writing ' + str(TEXTFILE_DIR) + '/node_stats.prom')
+                METRICS.write_textfile(TEXTFILE_DIR, 'node_stats')
+            if FORMAT != 'text':
+                METRICS.write(sys.stdout, FORMAT)
+                return
+
+        if GET_ALL:
+            get_all()
+        elif GET_COMPLETED:
+            get_completed()
+        elif GET_FAILED:
+            get_failed()
 
 """
-run_slurm(starttime)
+run_slurm(starttime, REPORTS)
 
 @param starttime
+@param REPORTS - The reports (from slurmlib.reports) we want to feed
 
 Our function that actually performs the Slurm command.  At this point we've
 verified that we indeed have a valid Slurm path.
 
-Within this function, we run our Slurm command, verify the output, and then
-loop over the data, separating different parts out into relevant Dictionary
-fields.  This should allow us to parse the data we just obtained.
+Within this function, we ask Slurm once for every field that any of our
+reports need, and stream the output to each of them one record at a time.
 
 This is done so that Slurm commands are only done once, and we work off the
 dataset that was obtained, rather than many many many Slurm commands
 """
-def run_slurm(starttime):
+def run_slurm(starttime, REPORTS):
 
-    # Finalize our constructed command
-    GET_JOB_INFO = str(SACCT_CMD) + str(starttime) + ' --endtime=now'
+    # The archive is just one more report riding along on our query
+    if ARCHIVE_DIR:
+        verbosity('Adding finished jobs to the archive in ' + str(ARCHIVE_DIR))
+        REPORTS = list(REPORTS) + [archive.ArchiveReport(ARCHIVE_DIR)]
 
-    print('Requested time interval: ' + str(starttime))
+    # Build our query from what each report needs
+    SLURM_QUERY = query.SacctQuery(REPORTS)
+
+    # Machine readable output gets nothing but itself on stdout
+    if FORMAT == 'text':
+        print('Requested time interval: ' + str(starttime))
 
     verbosity("What does our Slurm command look like?")
-    verbosity(str(GET_JOB_INFO))
-
-    # Run our Slurm command
-    print('Querying Slurm....')
-    (EXIT_CODE_RUN, STATE_INFO) = subprocess.getstatusoutput(GET_JOB_INFO)
-
-    if EXIT_CODE_RUN == 0:
-        verbosity('Slurm command success')
-        verbosity('Successfully gathered State information')
-
-        # Set up local Lists to contain data as we loop through our results
-        verbosity('Setting up blank local Lists for parsing')
-        jobids      = []
-        users       = []
-        groups      = []
-        states      = []
-        exits       = []
-        starts      = []
-        ends        = []
-        elapsed     = []
-        nodes       = []
-        elapsed_raw = []
-        partitions  = []
-
-        # Loop through our results, storing relevant data within each List
-        verbosity('Looping through our results and placing into appropriate Lists')
-        for line in STATE_INFO.split("\n"):
-            jobids.append(line.split("|")[0])
-            users.append(line.split("|")[1])
-            groups.append(line.split("|")[2])
-            states.append(line.split("|")[3])
-            exits.append(line.split("|")[4])
-            starts.append(line.split("|")[5])
-            ends.append(line.split("|")[6])
-            elapsed.append(line.split("|")[7])
-            nodes.append(line.split("|")[8])
-            elapsed_raw.append(line.split("|")[9])
-            partitions.append(line.split("|")[10])
-        # Take the final results of the Lists and store them within a Dictionary
-        verbosity('Constructing data Dictionary')
-        RESULT = {
-            'JOBID'       : jobids,
-            'USERS'       : users,
-            'GROUPS'      : groups,
-            'STATE'       : states,
-            'EXIT'        : exits,
-            'START'       : starts,
-            'END'         : ends,
-            'ELAPSED'     : elapsed,
-            'NODES'       : nodes,
-            'ELAPSED_RAW' : elapsed_raw,
-            'PARTITIONS'  : partitions, 
-        }
-        return RESULT
+    verbosity(SLURM_QUERY.command() + str(starttime) + ' --endtime=now')
+
+    if FORMAT == 'text':
+        print('Querying Slurm....')
+    SOURCE = None
+    if FROM_ARCHIVE:
+        verbosity('Reading the archive in ' + str(FROM_ARCHIVE) + ' rather than running sacct')
+        SOURCE = archive.ArchiveReader(FROM_ARCHIVE)
+    elif SLURMDBD:
+        verbosity('Reading ' + str(SLURMDBD) + '_job_table rather than running sacct')
+        SOURCE = slurmdbd.JobDatabase(slurmdbd.connect(SLURMDBD_FIXTURE), SLURMDBD)
+    elif JOBCOMP_LOG:
+        verbosity('Reading ' + str(JOBCOMP_LOG) + ' rather than running sacct')
+        SOURCE = jobcomp.JobCompLog(JOBCOMP_LOG)
+
+    # Timing every record costs a little, so only when we will print it
+    RUN_PROFILER = PROFILER if PROFILE else None
+
+    if USE_CACHE:
+        verbosity('Using the cache in ' + str(CACHE_DIR))
+        RECORDS = SLURM_QUERY.run(starttime, CACHE_DIR, SHARDS, SOURCE, RUN_PROFILER)
     else:
-        print('FAILURE: Unable to get Job Status')
-        sys.exit(EXIT_CODE_RUN)
-
+        RECORDS = SLURM_QUERY.run(starttime, None, SHARDS, SOURCE, RUN_PROFILER)
 
-"""
-most_frequent(LIST)
-
-Taken from online.  A way to find the most common ocurrence of an item in a List
+    verbosity('Slurm command success')
+    verbosity('Successfully gathered State information for ' + str(RECORDS) + ' jobs')
 
-@param LIST - The List we want to examine.
 
-@return common - The most common item
 """
-def most_frequent(LIST):
-    counter = 0
-    common = LIST[0]
-
-    for item in LIST:
-        current_count = LIST.count(item)
-        if(current_count > counter):
-            counter = current_count
-            common = item
-
-    return common
-
-"""
-unique_nodes(LIST)
-
-Taken from online & modified for my needs.
-
-Takes in a list and creates a new list of each unique item in the parameter list.
+calculate_job_totals(STATE_INFO)
 
-@param LIST - The List we want to examine
+@param STATE_INFO - The finished NodeReport
 
-@return node_list - The list of unique nodes
-"""
-def unique_nodes(LIST):
-    node_list = []
-
-    for node in LIST:
-        if node not in node_list:
-            node_list.append(node)
-
-    return node_list
-
-
-""" unique_partitions(LIST)
-
-Taken from online and copied from above so probably should generalize
-
-Takes in a list and creates a new list of each unique item in the parameter list.
-
-@param LIST - The List we want to examine
-
-@return partition_list - The list of unique partitions
-"""
-def unique_partitions(LIST):
-    partition_list = []
-
-    for partition in LIST:
-        if partition not in partition_list:
-            partition_list.append(partition)
-
-    return partition_list
-
-"""
-construct_date()
-
-@return DATE_STRING
-
-Our way of taking canned date parameters and formatting it so that Slurm can
-accept.
-
-We are offering:
-7d -> 24h -> 12h
-"""
-def construct_date():
-
-    # 7 days.
-    verbosity("Are we looking for last week?")
-    if LAST_WEEK:
-        verbosity("Setting timestamp to last week")
-        timestamp = datetime.datetime.now() - datetime.timedelta(days = 7)
-
-    # 24 hours.
-    elif YESTERDAY:
-        verbosity("No, are we looking for Yesterday?")
-        verbosity("Setting timestamp to Yesterday")
-        timestamp = datetime.datetime.now() - datetime.timedelta(days = 1)
-
-    # Default is 12 hours.
-    else:
-        verbosity("No, we must want the default")
-        verbosity("Setting timestamp to 12 hours ago (DEFAULT)")
-        timestamp = datetime.datetime.now() - datetime.timedelta(hours = 12)
-
-    verbosity("Construct our DATE_STRING")
-    DATE_STRING = timestamp.strftime("%Y-%m-%dT%H:%M:%S")
-
-    return DATE_STRING
-
-
-"""
+Pulls the totals we print out of the report.
 """
 def calculate_job_totals(STATE_INFO):
     verbosity('Obtaining Job Completion Stats...')
 
-    # Actual calculations here
-
     # Job state variables
     global FAILED
     global COMPLETED
@@ -382,63 +383,112 @@ def calculate_job_totals(STATE_INFO):
     global UNDER_HOUR
     global LONG_JOBS
     global MOST_NODE
+    global LEAST_NODE
+    global MOST_HOURS_NODE
 
     # Total amount of jobs based on each newline
 
-    TOTAL = len(STATE_INFO.get('JOBID'))
+    global NODE_REPORT
+    global DURATIONS
+
+    NODE_REPORT = STATE_INFO
+    TOTAL = len(STATE_INFO.jobs)
     verbosity('TOTAL = ' + str(TOTAL))
 
+    # Every state, user, node etc. was counted in the one pass made by run_slurm()
+    TALLY = STATE_INFO.tally
+    STATE_TOTALS = TALLY.state_totals()
+
     # Amount of running jobs
-    RUNNING = STATE_INFO.get('STATE').count('RUNNING')
+    RUNNING = STATE_TOTALS['RUNNING']
 
     # Amount of eligible jobs
-    ELIGIBLE = STATE_INFO.get('STATE').count('PENDING')
+    ELIGIBLE = STATE_TOTALS['PENDING']
 
     # Amount of completed jobs
-    COMPLETED = STATE_INFO.get('STATE').count('COMPLETED')
+    COMPLETED = STATE_TOTALS['COMPLETED']
 
     # Amount of cancelled jobs
-    CANCELLED = STATE_INFO.get('STATE').count('CANCELLED')
+    CANCELLED = STATE_TOTALS['CANCELLED']
 
-    TIMEOUT = STATE_INFO.get('STATE').count('TIMEOUT')
+    TIMEOUT = STATE_TOTALS['TIMEOUT']
 
     # Failed amount of jobs based on MANY criteria
-    FAILED = TOTAL - COMPLETED - RUNNING - ELIGIBLE - CANCELLED - TIMEOUT
+    FAILED = STATE_TOTALS['FAILED']
 
     # We want to compare rates based on the sum of total jobs
     COMPARISON_TOTAL = FAILED + COMPLETED
-    FAIL_RATE = (FAILED/COMPARISON_TOTAL)*100
-    COMP_RATE = (COMPLETED/COMPARISON_TOTAL)*100
-    USER_FAIL = most_frequent(STATE_INFO.get('USERS'))
-    GROUP_FAIL = most_frequent(STATE_INFO.get('GROUPS'))
-    EXIT_FAIL = most_frequent(STATE_INFO.get('EXIT'))
-    E1_FAIL = STATE_INFO.get('EXIT').count('1:0')
-    E7_FAIL = STATE_INFO.get('EXIT').count('7:0')
-
-    MOST_NODE = most_frequent(STATE_INFO.get('NODES'))
-    UNDER_HOUR = 0
-    for time in STATE_INFO.get('ELAPSED'):
-        if "00:" in time:
-            UNDER_HOUR += 1
-
-    UNDER_THIRTY_MINUTES = 0
-    for job in STATE_INFO.get('ELAPSED_RAW'):
-        if int(job) < 1800:
-            UNDER_THIRTY_MINUTES += 1
-
-    UNDER_MINUTE = 0
-    for job in STATE_INFO.get('ELAPSED_RAW'):
-        if int(job) < 60:
-            UNDER_MINUTE += 1
+    FAIL_RATE = reports.rate(FAILED, COMPARISON_TOTAL)
+    COMP_RATE = reports.rate(COMPLETED, COMPARISON_TOTAL)
+    USER_FAIL = TALLY.most_frequent('USERS')
+    GROUP_FAIL = TALLY.most_frequent('GROUPS')
+    EXIT_FAIL = TALLY.most_frequent('EXIT')
+    E1_FAIL = TALLY.count('EXIT', '1:0')
+    E7_FAIL = TALLY.count('EXIT', '7:0')
+
+    # Every job is credited to each node it ran on, see NodeIndex
+    MOST_NODE = ''
+    LEAST_NODE = ''
+    MOST_HOURS_NODE = ''
+    if STATE_INFO.nodes.rows:
+        MOST_NODE = STATE_INFO.nodes.busiest(1)[0][0]
+        LEAST_NODE = STATE_INFO.nodes.idlest(1)[0][0]
+        MOST_HOURS_NODE = STATE_INFO.nodes.busiest_hours(1)[0][0]
+
+    # Every job was bucketed by its ElapsedRaw once, overall, per node & per partition
+    DURATIONS = STATE_INFO.durations
+
+    UNDER_HOUR = DURATIONS.under(3600)
+    UNDER_THIRTY_MINUTES = DURATIONS.under(1800)
+    UNDER_MINUTE = DURATIONS.under(60)
 
     verbosity('UNDER_HOUR: ' + str(UNDER_HOUR))
     verbosity('UNDER_THIRTY_MINUTES: ' + str(UNDER_THIRTY_MINUTES))
     verbosity('UNDER_MINUTE: ' + str(UNDER_MINUTE))
 
-    LONG_JOBS = TOTAL - UNDER_HOUR
+    LONG_JOBS = DURATIONS.over(3600)
     verbosity('LONG JOBS: ' + str(LONG_JOBS))
 
 
+"""
+collect_metrics(METRICS)
+
+@param METRICS - The output.Metrics to add our numbers to
+
+Per node and per partition job counts, duration buckets and utilization, as
+metrics.
+"""
+def collect_metrics(METRICS):
+    NODE_INDEX = NODE_REPORT.nodes
+    USAGE = NODE_REPORT.usage
+
+    METRICS.describe('slurm_node_jobs', 'Completed jobs that ran on each node')
+    METRICS.describe('slurm_node_busy_hours', 'Hours at least one job was running on each node')
+    METRICS.describe('slurm_node_cpu_hours', 'CPU-hours used on each node')
+    METRICS.describe('slurm_node_utilization_percent', 'Percentage of the window each node was busy')
+    for node in NODE_INDEX.nodes():
+        METRICS.add('slurm_node_jobs', NODE_INDEX.count(node), {'node': node})
+    for node in USAGE.nodes():
+        METRICS.add('slurm_node_busy_hours', USAGE.node_hours(node), {'node': node})
+        METRICS.add('slurm_node_cpu_hours', USAGE.cpu_hours(node), {'node': node})
+        METRICS.add('slurm_node_utilization_percent', USAGE.percent(node), {'node': node})
+
+    METRICS.describe('slurm_partition_completed_jobs', 'Completed jobs within each partition')
+    METRICS.describe('slurm_partition_busy_hours', 'Node-hours at least one job of the partition was running')
+    METRICS.describe('slurm_partition_cpu_hours', 'CPU-hours used by each partition')
+    METRICS.describe('slurm_partition_utilization_percent', 'Percentage of the node-hours of each partition that were busy')
+    for partition in NODE_REPORT.tally.unique('PARTITIONS'):
+        METRICS.add('slurm_partition_completed_jobs', NODE_REPORT.tally.count('PARTITIONS', partition), {'partition': partition})
+    for partition in USAGE.partitions():
+        METRICS.add('slurm_partition_busy_hours', USAGE.partition_node_hours(partition), {'partition': partition})
+        METRICS.add('slurm_partition_cpu_hours', USAGE.partition_cpu_hours(partition), {'partition': partition})
+        METRICS.add('slurm_partition_utilization_percent', USAGE.partition_percent(partition), {'partition': partition})
+
+    METRICS.describe('slurm_completed_jobs_by_duration', 'Completed jobs by how long they ran')
+    for (label, count) in zip(DURATIONS.labels(), DURATIONS.totals):
+        METRICS.add('slurm_completed_jobs_by_duration', count, {'duration': label})
+
+
 """
 get_all()
 
@@ -473,39 +523,44 @@ def get_completed():
 
     # Actual calculations here
 
-    LIST_OF_PARTITIONS = unique_partitions(SLURM_INFO.get('PARTITIONS'))
-    LIST_OF_PARTITIONS.sort()
+    TALLY = NODE_REPORT.tally
 
     print ('############################################')
     print ('Job count by partition')
     print ('If count is zero, partition will not appear in this list')
     print ('____________________________________________')
     
-    for partition in LIST_OF_PARTITIONS:
-        partition_job_count = SLURM_INFO.get('PARTITIONS').count(partition)
+    for partition in TALLY.unique('PARTITIONS'):
+        partition_job_count = TALLY.count('PARTITIONS', partition)
 
         print (str(partition) + '      ' + str(partition_job_count))
 
-    LIST_OF_NODES = unique_nodes(SLURM_INFO.get('NODES'))
-    LIST_OF_NODES.sort()
+    NODE_INDEX = NODE_REPORT.nodes
+    LIST_OF_NODES = NODE_INDEX.nodes()
 
     print ('')
     print ('############################################')
     print ('Job count by node')
     print ('If count is zero, node will not appear in this list')
+    print ('Multi node jobs count towards every node they ran on')
     print ('____________________________________________')
+    print ('Node'.ljust(16) + 'Jobs'.rjust(8) + 'Job-hrs'.rjust(10))
 
     job_count = 0
     for node in LIST_OF_NODES:
-        jobs = SLURM_INFO.get('NODES').count(node)
+        jobs = NODE_INDEX.count(node)
 
-        print (str(node) + '    ' + str(jobs))
+        print (str(node).ljust(16) + str(jobs).rjust(8) + str(int(NODE_INDEX.hours(node))).rjust(10))
         job_count = job_count + jobs
-    average = job_count/len(LIST_OF_NODES)
+    average = 0
+    if LIST_OF_NODES:
+        average = job_count/len(LIST_OF_NODES)
     print ('Number of nodes: ' + str(len(LIST_OF_NODES)))
     print ('____________________________________________')
-    print ('Total jobs:            ' + str(job_count))
+    print ('Total jobs:            ' + str(TOTAL))
     print ('Most used node:        ' + str(MOST_NODE))
+    print ('Least used node:       ' + str(LEAST_NODE))
+    print ('Most job-hours:        ' + str(MOST_HOURS_NODE))
     print ('Average jobs per node: ' + str(int(average)))
     print ('Amount of jobs <1min:  ' + str(UNDER_MINUTE))
     print ('Amount of jobs <30min: ' + str(UNDER_THIRTY_MINUTES))
@@ -513,6 +568,67 @@ def get_completed():
     print ('Amount of jobs >1hr:   ' + str(LONG_JOBS))
     print ('')
 
+    get_durations('PARTITIONS', 'Partition')
+    get_durations('NODES', 'Node')
+    get_utilization()
+
+
+"""
+get_durations(GROUP, TITLE)
+
+@param GROUP - The column to break the job durations down by
+@param TITLE - What to call that column in our header
+
+Prints a table of how many jobs fell into each duration bucket, for each
+partition or node.
+"""
+def get_durations(GROUP, TITLE):
+    LABELS = DURATIONS.labels()
+
+    print ('############################################')
+    print ('Job count by duration per ' + TITLE.lower())
+    print ('____________________________________________')
+    print (TITLE.ljust(16) + ''.join(label.rjust(8) for label in LABELS))
+
+    # Nodes come from the NodeIndex, so multi node jobs count on each node
+    if GROUP == 'NODES':
+        for node in NODE_REPORT.nodes.nodes():
+            counts = DURATIONS.row_counts(NODE_REPORT.nodes.rows[node])
+            print (str(node).ljust(16) + ''.join(str(count).rjust(8) for count in counts))
+    else:
+        for item in NODE_REPORT.tally.unique(GROUP):
+            counts = DURATIONS.group_counts(GROUP, item)
+            print (str(item).ljust(16) + ''.join(str(count).rjust(8) for count in counts))
+
+    print ('____________________________________________')
+    print ('Total'.ljust(16) + ''.join(str(count).rjust(8) for count in DURATIONS.totals))
+    print ('')
+
+
+"""
+get_utilization()
+
+Prints how busy each partition and node was over our window.  Node-hrs is
+the time at least one job was running, CPU-hrs weights each job by its CPUs.
+Unlike the Job-hrs of get_completed(), jobs of every state count here, and
+jobs sharing a node are not counted twice.
+"""
+def get_utilization():
+    USAGE = NODE_REPORT.usage
+
+    print ('############################################')
+    print ('Utilization over ' + str(int(USAGE.window / 3600)) + ' hours')
+    print ('____________________________________________')
+    print ('Partition'.ljust(16) + 'Node-hrs'.rjust(10) + 'CPU-hrs'.rjust(10) + 'Util %'.rjust(8))
+    for partition in USAGE.partitions():
+        print (str(partition).ljust(16) + str(int(USAGE.partition_node_hours(partition))).rjust(10) + str(int(USAGE.partition_cpu_hours(partition))).rjust(10) + str(int(USAGE.partition_percent(partition))).rjust(8))
+
+    print ('')
+    print ('Node'.ljust(16) + 'Node-hrs'.rjust(10) + 'CPU-hrs'.rjust(10) + 'Util %'.rjust(8))
+    for node in USAGE.nodes():
+        print (str(node).ljust(16) + str(int(USAGE.node_hours(node))).rjust(10) + str(int(USAGE.cpu_hours(node))).rjust(10) + str(int(USAGE.percent(node))).rjust(8))
+    print ('')
+
 
 """
 """
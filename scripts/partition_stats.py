@@ -0,0 +1,269 @@
+#!/usr/local/python/3.2/bin/python3
+
+"""
+partition_stats - A way to get a summary of what each partition handles in the
+past amount of time specified by options.
+
+At this point we're only really worried about overall throughput of each
+partition.  Breakdown of jobs is already handled for us in a separate script.
+
+The numbers themselves come from slurmlib.reports.PartitionReport, so the same
+report can also ride along on an sstats query with sstats -p.
+
+@Version 1.0
+@Author tyler
+"""
+
+### Import commands
+import getopt
+import sys
+
+from slurmlib import cache
+from slurmlib import commands
+from slurmlib import query
+from slurmlib import reports
+
+
+# Functions
+def main():
+
+    # Global Variables
+    global VERBOSE
+    global DATE_STRING
+    global LAST_WEEK
+    global YESTERDAY
+    global SPECIFIC
+    global GET_ALL
+    global GET_COMPLETED
+    global GET_FAILED
+    global USE_CACHE
+    global CACHE_DIR
+    global SHARDS
+
+    # Initiate our global values
+    GET_ALL         = False
+    GET_COMPLETED   = False
+    GET_FAILED      = False
+    VERBOSE         = False
+    YESTERDAY       = False
+    LAST_WEEK       = False
+    SPECIFIC        = False
+    USE_CACHE       = False
+    CACHE_DIR       = cache.DEFAULT_DIR
+    SHARDS          = 1
+
+    # Parse the command line arguments
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'aCcdfhs:tvw?', ['all', 'cache', 'cache-dir=', 'completed', 'day', 'failed', 'help', 'shards=', 'time', 'verbose', 'week'])
+    except getopt.GetoptError:
+        print('Non-existant option....')
+        print('')
+        usage()
+    for opt, arg in opts:
+        if opt in ('-h', 'help', '--help', '?', '-?'):
+            usage()
+        elif opt in ('-a', '--all'):
+            GET_ALL = True
+        elif opt in ('-C', '--cache'):
+            USE_CACHE = True
+        elif opt == '--cache-dir':
+            USE_CACHE = True
+            CACHE_DIR = arg
+        elif opt in ('-c', '--completed'):
+            GET_COMPLETED = True
+        elif opt in ('-d', '--day'):
+            YESTERDAY = True
+        elif opt in ('-f', '--failed'):
+            GET_FAILED = True
+        elif opt in ('-s', '--shards'):
+            SHARDS = int(arg)
+        elif opt in ('-t', '--time'): #NYI
+            SPECIFIC = True
+            DATE_STRING = arg
+        elif opt in ('-v', '--verbose'):
+            VERBOSE = True
+        elif opt in ('-w', '--week'):
+            LAST_WEEK = True
+
+    # Do a sanity check on items we assume should be
+    sanity()
+
+    # Run the script.
+    try:
+        get_requested_data()
+    except query.SacctError as error:
+        print(str(error))
+        print('FAILURE: Unable to get Job Status')
+        sys.exit(error.code)
+
+
+"""
+verbosity(text)
+
+@param text
+
+Takes text as an input, checks if we want to be verbose, and then prints the
+string.  A way of pushing out useful information in each function as long as
+some output is defined.
+"""
+def verbosity(text):
+    if VERBOSE:
+        print(str(text))
+
+
+"""
+sanity()
+
+Checks that the user defined what class of data they want, and that we can
+get to the Slurm commands at all.
+"""
+def sanity():
+
+    # Ensure we have *some* value set for what we're trying to get.
+    if not GET_ALL and not GET_COMPLETED and not GET_FAILED:
+        verbosity('You did not specify what class of information you wanted.')
+        print('You must specify either, All, Completed, or Failed jobs')
+        usage()
+
+    # Check to see we have valid access to Slurm commands
+    if not commands.available('sinfo'):
+        verbosity('Slurm check failed for: ' + commands.path('sinfo'))
+        print('No Slurm commands found.  Check PATH, Modules &/or SLURM_BIN')
+        usage()
+
+
+"""
+usage()
+
+Prints out information on how to use the script and exits the script.
+"""
+def usage():
+
+    # Print our usage statement
+    print('')
+    print ('Partition Stats:')
+    print ('Any valid Slurm user should be able to run this command')
+    print ('-a/--all         -> Displays all stats that this script gathers')
+    print ('-C/--cache       -> Only query Slurm for jobs since the last cached run')
+    print ('--cache-dir=DIR  -> Where to keep the cache.  Default: ' + str(cache.DEFAULT_DIR))
+    print ('-c/--completed   -> Displays throughput of each partition')
+    print ('-d/--day         -> Get stats for the past 24 hours')
+    print ('-f/--failed      -> Displays failures within each partition')
+    print ('-h/?             -> Displays this help message')
+    print ('-s/--shards N    -> Split the window into N sacct queries that run at the same time')
+    print ('-t/--time        -> !!! NYI !!! Select a specific time interval.  Must use valid Slurm time format')
+    print ('-v/--verbose     -> Triggers verbose output.')
+    print ('-w/--week        -> Get stats for the past 7 days')
+    print('')
+
+    # Exit the program
+    sys.exit(0)
+
+
+"""
+get_requested_data()
+
+Centralized way of actually selecting which data we want based on our flags.
+"""
+def get_requested_data():
+
+    if not SPECIFIC:
+        DATE = query.construct_date(LAST_WEEK, YESTERDAY)
+    else:
+        DATE = DATE_STRING
+
+    PARTITION_REPORT = reports.PartitionReport()
+
+    # Build our query from what the report needs
+    SLURM_QUERY = query.SacctQuery([PARTITION_REPORT])
+
+    verbosity("What does our Slurm command look like?")
+    verbosity(SLURM_QUERY.command() + str(DATE) + ' --endtime=now')
+
+    if USE_CACHE:
+        verbosity('Using the cache in ' + str(CACHE_DIR))
+        SLURM_QUERY.run(DATE, CACHE_DIR, SHARDS)
+    else:
+        SLURM_QUERY.run(DATE, None, SHARDS)
+
+    if GET_ALL:
+        get_completed(PARTITION_REPORT)
+        get_failed(PARTITION_REPORT)
+    elif GET_COMPLETED:
+        get_completed(PARTITION_REPORT)
+    elif GET_FAILED:
+        get_failed(PARTITION_REPORT)
+
+
+"""
+collect_metrics(METRICS, PARTITION_REPORT)
+
+@param METRICS          - The output.Metrics to add our numbers to
+@param PARTITION_REPORT - The finished PartitionReport
+
+Throughput and failures of each partition, as metrics.
+"""
+def collect_metrics(METRICS, PARTITION_REPORT):
+    METRICS.describe('slurm_partition_jobs', 'Jobs within each partition by state')
+    METRICS.describe('slurm_partition_hours', 'Wall clock hours used by jobs within each partition')
+    for partition in PARTITION_REPORT.partitions:
+        TOTALS = PARTITION_REPORT.state_totals(partition)
+        for state in ('COMPLETED', 'FAILED', 'CANCELLED', 'TIMEOUT'):
+            METRICS.add('slurm_partition_jobs', TOTALS[state], {'partition': partition, 'state': state.lower()})
+        METRICS.add('slurm_partition_hours', PARTITION_REPORT.hours(partition), {'partition': partition})
+
+
+"""
+get_completed(PARTITION_REPORT)
+
+@param PARTITION_REPORT - The finished PartitionReport
+
+Prints how many jobs went through each partition, and how much wall time they
+used.
+"""
+def get_completed(PARTITION_REPORT):
+    verbosity('Obtaining Partition Throughput Stats...')
+
+    print ('############################################')
+    print ('Throughput by partition')
+    print ('____________________________________________')
+    print ('Partition'.ljust(16) + 'Jobs'.rjust(10) + 'Completed'.rjust(10) + 'Hours'.rjust(10) + 'Avg min'.rjust(10))
+
+    for partition in PARTITION_REPORT.partitions:
+        TOTALS  = PARTITION_REPORT.state_totals(partition)
+        jobs    = PARTITION_REPORT.jobs[partition]
+        hours   = PARTITION_REPORT.hours(partition)
+        average = (hours * 60) / jobs
+
+        print (str(partition).ljust(16) + str(jobs).rjust(10) + str(TOTALS['COMPLETED']).rjust(10) + str(int(hours)).rjust(10) + str(int(average)).rjust(10))
+
+    print ('')
+
+
+"""
+get_failed(PARTITION_REPORT)
+
+@param PARTITION_REPORT - The finished PartitionReport
+
+Prints how many jobs failed, were cancelled or timed out within each partition.
+"""
+def get_failed(PARTITION_REPORT):
+    verbosity('Obtaining Partition Failure Stats...')
+
+    print ('############################################')
+    print ('Failures by partition')
+    print ('____________________________________________')
+    print ('Partition'.ljust(16) + 'Failed'.rjust(10) + 'Cancelled'.rjust(10) + 'Timeout'.rjust(10) + 'Fail %'.rjust(10))
+
+    for partition in PARTITION_REPORT.partitions:
+        TOTALS    = PARTITION_REPORT.state_totals(partition)
+        fail_rate = reports.rate(TOTALS['FAILED'], TOTALS['FAILED'] + TOTALS['COMPLETED'])
+
+        print (str(partition).ljust(16) + str(TOTALS['FAILED']).rjust(10) + str(TOTALS['CANCELLED']).rjust(10) + str(TOTALS['TIMEOUT']).rjust(10) + str(int(fail_rate)).rjust(10))
+
+    print ('')
+
+
+### Call Main
+if __name__ == "__main__":
+    main()
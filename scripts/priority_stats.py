@@ -0,0 +1,300 @@
+#!/usr/local/python/3.2/bin/python3
+
+"""
+priority_stats - Why are my jobs pending?  A breakdown of pending job priority
+by user and account.
+
+We run priority/multifactor with heavy fair-share & QOS weights and a 14 day
+decay, so a job's place in the queue is mostly down to who is asking.  This
+pulls sprio & sshare once, joins them to every pending job, and ranks who is
+furthest back and which priority factor is carrying (or not carrying) them.
+
+The numbers themselves come from slurmlib.priority.PriorityReport.
+
+@Version 1.0
+@Author tyler
+"""
+
+### Import commands
+import getopt
+import sys
+
+from slurmlib import commands
+from slurmlib import output
+from slurmlib import priority
+from slurmlib import query
+from slurmlib import timing
+
+
+# Functions
+def main():
+
+    # Global Variables
+    global VERBOSE
+    global GET_USERS
+    global GET_GROUPS
+    global TOP
+    global FORMAT
+    global TEXTFILE_DIR
+    global PROFILE
+    global PROFILER
+
+    # Initiate our global values
+    GET_USERS       = False
+    GET_GROUPS      = False
+    VERBOSE         = False
+    TOP             = 10
+    FORMAT          = 'text'
+    TEXTFILE_DIR    = None
+    PROFILE         = False
+    PROFILER        = timing.Profiler()
+
+    # Parse the command line arguments
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'aghn:uv?', ['all', 'format=', 'groups', 'help', 'profile', 'textfile-dir=', 'top=', 'users', 'verbose'])
+    except getopt.GetoptError:
+        print('Non-existant option....')
+        print('')
+        usage()
+    for opt, arg in opts:
+        if opt in ('-h', 'help', '--help', '?', '-?'):
+            usage()
+        elif opt in ('-a', '--all'):
+            GET_USERS = True
+            GET_GROUPS = True
+        elif opt == '--format':
+            FORMAT = arg
+        elif opt in ('-g', '--groups'):
+            GET_GROUPS = True
+        elif opt in ('-n', '--top'):
+            TOP = int(arg)
+        elif opt == '--profile':
+            PROFILE = True
+        elif opt == '--textfile-dir':
+            TEXTFILE_DIR = arg
+        elif opt in ('-u', '--users'):
+            GET_USERS = True
+        elif opt in ('-v', '--verbose'):
+            VERBOSE = True
+
+    # Do a sanity check on items we assume should be
+    sanity()
+
+    # Run the script.
+    try:
+        get_requested_data()
+    except query.SacctError as error:
+        print(str(error))
+        print('FAILURE: Unable to get Job Status')
+        sys.exit(error.code)
+
+    # Our own output may be json etc., so the summary goes to stderr
+    if PROFILE:
+        PROFILER.summary(sys.stderr)
+
+
+"""
+verbosity(text)
+
+@param text
+
+Takes text as an input, checks if we want to be verbose, and then prints the
+string.  A way of pushing out useful information in each function as long as
+some output is defined.
+"""
+def verbosity(text):
+    if VERBOSE:
+        print(str(text))
+
+
+"""
+sanity()
+
+Checks that the user defined what class of data they want, and that we can
+get to the Slurm commands at all.
+"""
+def sanity():
+
+    # Ensure we have *some* value set for what we're trying to get.
+    if not GET_USERS and not GET_GROUPS:
+        verbosity('You did not specify what class of information you wanted.')
+        print('You must specify either, All, Users, or Groups')
+        usage()
+
+    if FORMAT not in output.FORMATS:
+        print('Unknown format: ' + str(FORMAT))
+        usage()
+
+    # Check to see we have valid access to Slurm commands
+    if not commands.available('sprio'):
+        verbosity('Slurm check failed for: ' + commands.path('sprio'))
+        print('No Slurm commands found.  Check PATH, Modules &/or SLURM_BIN')
+        usage()
+
+
+"""
+usage()
+
+Prints out information on how to use the script and exits the script.
+"""
+def usage():
+
+    # Print our usage statement
+    print('')
+    print ('Priority Stats:')
+    print ('Any valid Slurm user should be able to run this command')
+    print ('-a/--all         -> Displays both users and groups')
+    print ('--format=FORMAT  -> text, json, csv or prometheus.  Default: text')
+    print ('-g/--groups      -> Displays the priority of each account\'s pending jobs')
+    print ('-h/?             -> Displays this help message')
+    print ('-n/--top N       -> How many users or accounts to list, furthest back first.  Default: 10')
+    print ('--profile        -> Afterwards, print how long each stage took, to stderr')
+    print ('--textfile-dir=D -> Also write our stats for the node_exporter textfile collector in D')
+    print ('-u/--users       -> Displays the priority of each user\'s pending jobs')
+    print ('-v/--verbose     -> Triggers verbose output.')
+    print('')
+
+    # Exit the program
+    sys.exit(0)
+
+
+"""
+get_requested_data()
+
+Centralized way of actually selecting which data we want based on our flags.
+"""
+def get_requested_data():
+    PRIORITY_REPORT = priority.PriorityReport()
+
+    verbosity("What do our Slurm commands look like?")
+    verbosity(PRIORITY_REPORT.squeue_command())
+    verbosity(PRIORITY_REPORT.sshare_command())
+    verbosity(PRIORITY_REPORT.sprio_command())
+
+    with PROFILER.stage('squeue + sshare + sprio') as stage:
+        stage.records = PRIORITY_REPORT.take()
+    verbosity('Joined ' + str(PRIORITY_REPORT.joined) + ' pending jobs to sprio, ' + str(PRIORITY_REPORT.unjoined) + ' sprio lines had no pending job')
+
+    with PROFILER.stage('output'):
+        if FORMAT != 'text' or TEXTFILE_DIR:
+            METRICS = output.Metrics()
+            collect_metrics(METRICS, PRIORITY_REPORT)
+
+            if TEXTFILE_DIR:
+                verbosity('Writing ' + str(TEXTFILE_DIR) + '/priority_stats.prom')
+                METRICS.write_textfile(TEXTFILE_DIR, 'priority_stats')
+            if FORMAT != 'text':
+                METRICS.write(sys.stdout, FORMAT)
+                return
+
+        get_summary(PRIORITY_REPORT)
+        if GET_USERS:
+            get_users(PRIORITY_REPORT)
+        if GET_GROUPS:
+            get_groups(PRIORITY_REPORT)
+
+
+"""
+collect_metrics(METRICS, PRIORITY_REPORT)
+
+@param METRICS         - The output.Metrics to add our numbers to
+@param PRIORITY_REPORT - The PriorityReport we took
+
+Pending jobs, average priority, and each factor's share of it, per user and
+per account, as metrics.
+"""
+def collect_metrics(METRICS, PRIORITY_REPORT):
+    METRICS.describe('slurm_pending_jobs_by_reason', 'Pending jobs by the reason squeue gives')
+    for (reason, count) in PRIORITY_REPORT.reasons.most_common():
+        METRICS.add('slurm_pending_jobs_by_reason', count, {'reason': reason})
+
+    METRICS.describe('slurm_pending_jobs', 'Pending jobs with a priority')
+    METRICS.describe('slurm_pending_priority_average', 'Average priority of pending jobs')
+    METRICS.describe('slurm_pending_priority_factor_percent', 'Percentage of pending job priority made up by each factor')
+    METRICS.describe('slurm_fairshare', 'FairShare from sshare')
+
+    ROWS = []
+    if GET_USERS:
+        ROWS.extend(({'user': user, 'account': account}, TOTALS, PRIORITY_REPORT.fairshare(account, user)) for ((user, account), TOTALS) in PRIORITY_REPORT.ranked('users'))
+    if GET_GROUPS:
+        ROWS.extend(({'account': account}, TOTALS, PRIORITY_REPORT.fairshare(account)) for (account, TOTALS) in PRIORITY_REPORT.ranked('accounts'))
+
+    for (LABELS, TOTALS, SHARE) in ROWS:
+        METRICS.add('slurm_pending_jobs', TOTALS.jobs, LABELS)
+        METRICS.add('slurm_pending_priority_average', int(TOTALS.average()), LABELS)
+        METRICS.add('slurm_fairshare', SHARE[1], LABELS)
+        SHARES = TOTALS.shares()
+        for factor in priority.FACTORS:
+            FACTOR_LABELS = dict(LABELS)
+            FACTOR_LABELS['factor'] = factor
+            METRICS.add('slurm_pending_priority_factor_percent', round(SHARES[factor], 1), FACTOR_LABELS)
+
+
+"""
+get_summary(PRIORITY_REPORT)
+
+@param PRIORITY_REPORT - The PriorityReport we took
+
+Prints how many jobs are pending, and why squeue says they are.
+"""
+def get_summary(PRIORITY_REPORT):
+    print ('____________________________________________')
+    print ('########## PENDING JOB PRIORITY ############')
+    print ('Pending jobs:    ' + str(sum(PRIORITY_REPORT.reasons.values())))
+    for (reason, count) in PRIORITY_REPORT.reasons.most_common(5):
+        print ('    ' + str(reason).ljust(25) + str(count).rjust(8))
+    print ('____________________________________________')
+
+
+"""
+factor_columns(TOTALS)
+
+@return The header, or each factor's share of TOTALS' priority, as columns
+"""
+def factor_columns(TOTALS=None):
+    if TOTALS is None:
+        return ''.join(factor[:6].rjust(7) for factor in priority.FACTORS)
+    SHARES = TOTALS.shares()
+    return ''.join(str(int(round(SHARES[factor]))).rjust(7) for factor in priority.FACTORS)
+
+
+"""
+get_users(PRIORITY_REPORT)
+
+@param PRIORITY_REPORT - The PriorityReport we took
+
+Prints the TOP users furthest back in the queue, their fair-share, the factor
+that makes up most of their priority, and each factor's share of it in %.
+"""
+def get_users(PRIORITY_REPORT):
+    verbosity('Obtaining User Priority Stats...')
+
+    print ('Users furthest back in the queue, factors in % of priority')
+    print ('User'.ljust(16) + 'Account'.ljust(12) + 'Jobs'.rjust(7) + 'Avg prio'.rjust(12) + 'FairShare'.rjust(10) + '  Main'.ljust(11) + factor_columns())
+    for ((user, account), TOTALS) in PRIORITY_REPORT.ranked('users')[:TOP]:
+        fairshare = PRIORITY_REPORT.fairshare(account, user)[1]
+        print (str(user).ljust(16) + str(account).ljust(12) + str(TOTALS.jobs).rjust(7) + str(int(TOTALS.average())).rjust(12) + ('%.3f' % fairshare).rjust(10) + ('  ' + TOTALS.main_factor()).ljust(11) + factor_columns(TOTALS))
+    print ('____________________________________________')
+
+
+"""
+get_groups(PRIORITY_REPORT)
+
+@param PRIORITY_REPORT - The PriorityReport we took
+
+The same as get_users(), per account.
+"""
+def get_groups(PRIORITY_REPORT):
+    verbosity('Obtaining Account Priority Stats...')
+
+    print ('Accounts furthest back in the queue, factors in % of priority')
+    print ('Account'.ljust(28) + 'Jobs'.rjust(7) + 'Avg prio'.rjust(12) + 'FairShare'.rjust(10) + '  Main'.ljust(11) + factor_columns())
+    for (account, TOTALS) in PRIORITY_REPORT.ranked('accounts')[:TOP]:
+        fairshare = PRIORITY_REPORT.fairshare(account)[1]
+        print (str(account).ljust(28) + str(TOTALS.jobs).rjust(7) + str(int(TOTALS.average())).rjust(12) + ('%.3f' % fairshare).rjust(10) + ('  ' + TOTALS.main_factor()).ljust(11) + factor_columns(TOTALS))
+    print ('____________________________________________')
+
+
+### Call Main
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+slurmlib - Shared pieces of the Slurm stats scripts.
+
+sstats.py and node_stats.py both import from here so that the same work is not
+written (and fixed) twice.
+"""
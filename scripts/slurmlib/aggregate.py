@@ -0,0 +1,176 @@
+"""
+aggregate - Tally every dimension of a sacct dataset in a single pass.
+
+Rather than calling List.count() once per item (or once per state), each
+record is handed to a JobTally exactly once and every column we care about is
+counted in a hash table as it goes by.  Reports are then just lookups, so the
+cost of a report grows linearly with the amount of jobs.
+
+@Version 1.0
+"""
+
+### Import commands
+import collections
+
+
+# States that sacct reports that we do not consider a failure.  Anything that
+# is not one of these (FAILED, NODE_FAIL, OUT_OF_MEMORY, ...) is a failure.
+NON_FAILED_STATES = ('RUNNING', 'PENDING', 'COMPLETED', 'CANCELLED', 'TIMEOUT')
+
+
+"""
+is_failed(state)
+
+@return True if state counts as a failure, the same way state_totals() works
+        it out
+"""
+def is_failed(state):
+    return state not in NON_FAILED_STATES and not state.startswith('CANCELLED by')
+
+
+"""
+JobTally(COLUMNS, FAILURES)
+
+@param COLUMNS  - Dictionary of dimension name -> index of that field within a
+                  parsed sacct record.  e.g. {'USERS': 1, 'STATE': 3}
+@param FAILURES - Dimensions to also count for failed jobs only, the same
+                  way.  Counted as 'FAILED_<name>'.  Needs a STATE column.
+
+Holds one Counter per dimension plus the total amount of records seen.
+"""
+class JobTally(object):
+
+    def __init__(self, COLUMNS, FAILURES=None):
+        FAILURES = FAILURES or {}
+        self.columns  = sorted(COLUMNS.items())
+        self.failures = sorted(('FAILED_' + name, index) for (name, index) in FAILURES.items())
+        self.counts   = dict((name, collections.Counter()) for name in list(COLUMNS) + [name for (name, index) in self.failures])
+        self.total    = 0
+        self.state    = COLUMNS.get('STATE')
+        self.failed   = {}
+
+    """
+    spawn()
+
+    @return A new, empty JobTally counting the same dimensions
+    """
+    def spawn(self):
+        return JobTally(dict(self.columns), dict((name[len('FAILED_'):], index) for (name, index) in self.failures))
+
+    """
+    failure_columns(record)
+
+    @return The failure only dimensions to count record in, none unless it
+            failed.  Whether a state failed is only worked out once.
+    """
+    def failure_columns(self, record):
+        if not self.failures:
+            return ()
+        state = record[self.state]
+        failed = self.failed.get(state)
+        if failed is None:
+            failed = self.failed[state] = is_failed(state)
+        if failed:
+            return self.failures
+        return ()
+
+    """
+    add(record)
+
+    @param record - A single sacct record, already split on '|'
+
+    Count every dimension of the record.
+    """
+    def add(self, record):
+        self.total += 1
+        for (name, index) in self.columns:
+            self.counts[name][record[index]] += 1
+        for (name, index) in self.failure_columns(record):
+            self.counts[name][record[index]] += 1
+
+    """
+    remove(record)
+
+    @param record - A record that was add()ed before
+
+    Stops counting the record.  Used by rolling windows, as jobs age out.
+    """
+    def remove(self, record):
+        self.total -= 1
+        for (name, index) in self.columns + list(self.failure_columns(record)):
+            counts = self.counts[name]
+            counts[record[index]] -= 1
+            if counts[record[index]] <= 0:
+                del counts[record[index]]
+
+    """
+    update(other)
+
+    @param other - Another JobTally with the same COLUMNS & FAILURES
+
+    Adds every count of other into this tally.
+    """
+    def update(self, other):
+        self.total += other.total
+        for name in self.counts:
+            self.counts[name].update(other.counts[name])
+
+    """
+    count(dimension, item)
+
+    @return The amount of records where dimension was item
+    """
+    def count(self, dimension, item):
+        return self.counts[dimension][item]
+
+    """
+    top(dimension, k)
+
+    @param dimension - The dimension to look at
+    @param k         - How many of the most common items we want
+
+    Counter.most_common(k) keeps a heap of only k items, so this is
+    O(n log k) however many items there are.
+
+    @return List of (item, count) tuples, most common first
+    """
+    def top(self, dimension, k=1):
+        return self.counts[dimension].most_common(k)
+
+    """
+    most_frequent(dimension)
+
+    @return The most common item of dimension, or '' if we saw no records
+    """
+    def most_frequent(self, dimension):
+        common = self.top(dimension, 1)
+        if common:
+            return common[0][0]
+        return ''
+
+    """
+    unique(dimension)
+
+    @return Sorted List of every distinct item seen for dimension
+    """
+    def unique(self, dimension):
+        return sorted(self.counts[dimension])
+
+    """
+    state_totals(dimension)
+
+    @param dimension - The dimension holding the job State
+
+    Works out the amount of jobs in each state we report on.  CANCELLED also
+    picks up 'CANCELLED by <uid>', and FAILED is everything that is left over.
+
+    @return Dictionary of state -> amount of jobs
+    """
+    def state_totals(self, dimension='STATE'):
+        states = self.counts[dimension]
+
+        TOTALS = dict((state, states[state]) for state in NON_FAILED_STATES)
+        TOTALS['CANCELLED'] += sum(count for (state, count) in states.items() if state.startswith('CANCELLED by'))
+        TOTALS['FAILED'] = self.total - sum(TOTALS.values())
+
+        return TOTALS
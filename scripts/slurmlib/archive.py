@@ -0,0 +1,227 @@
+"""
+archive - A long term, columnar history of finished jobs on local disk.
+
+The cache only keeps the last week.  For anything longer, a month of failures
+or a quarter of node usage, we would have to pull the raw sacct text again.
+Instead every run can add the jobs it read to an archive, laid out as
+
+    <directory>/2024-01-31/JobID.gz
+    <directory>/2024-01-31/State.gz
+    ...
+
+One directory per day a job ended on, and within it one gzipped file per
+sacct field holding that field for every job, one per line, all in the same
+order.  Reading a month only opens the days within it (partition pruning),
+and only the fields the reports asked for (column projection).
+
+Jobs that have not finished are never archived, a later run picks them up.
+We do not have a Parquet library on our Python, hence our own simple format.
+
+@Version 1.0
+"""
+
+### Import commands
+import collections
+import fcntl
+import gzip
+import os
+import shutil
+import time
+
+from slurmlib import columnar
+
+
+# Where the archive lives unless told otherwise
+DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'slurm_stats', 'archive')
+
+# The fields we archive for every job.  Anything a report may ask for.
+FIELDS = ['JobID', 'User', 'Account', 'State', 'ExitCode', 'Submit', 'Start', 'End',
+          'ElapsedRaw', 'NodeList', 'Partition', 'AllocCPUS', 'NNodes', 'QOS']
+
+# Format of each day's directory name
+DAY_FORMAT = '%Y-%m-%d'
+
+
+"""
+day_of(epoch)
+
+@return The name of the day directory a job that ended at epoch goes in
+"""
+def day_of(epoch):
+    return time.strftime(DAY_FORMAT, time.localtime(epoch))
+
+
+"""
+read_column(path)
+
+@return List of every value in a column file
+"""
+def read_column(path):
+    with gzip.open(path, 'rb') as column_file:
+        text = column_file.read().decode('utf-8')
+    if not text:
+        return []
+    return text.split('\n')
+
+
+"""
+write_column(path, VALUES)
+
+Writes VALUES, one per line, to a gzipped column file.
+"""
+def write_column(path, VALUES):
+    with gzip.open(path, 'wb') as column_file:
+        column_file.write('\n'.join(VALUES).encode('utf-8'))
+
+
+"""
+ArchiveReport(directory)
+
+@param directory - Where the archive lives
+
+A report (see reports.py) that writes every finished job it is given into
+the archive.  Added to a SacctQuery alongside the others, so archiving costs
+no extra query.
+"""
+class ArchiveReport(object):
+
+    FIELDS = FIELDS
+    STATES = None
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+
+    def bind(self, INDEX):
+        self.indexes = [INDEX[field] for field in FIELDS]
+        self.end     = INDEX['End']
+        self.days    = collections.defaultdict(list)
+
+    def add(self, record):
+        end = columnar.parse_time(record[self.end])
+        if end:
+            self.days[day_of(end)].append([record[index] for index in self.indexes])
+
+    def finish(self):
+        self.written = 0
+        for (day, RECORDS) in self.days.items():
+            self.write_day(day, RECORDS)
+            self.written += len(RECORDS)
+
+    """
+    write_day(day, RECORDS)
+
+    Merges RECORDS into whatever the archive already holds for day, newer
+    records winning by JobID, and swaps the whole day into place at once.
+    Writers of the same day (cron and the daemon, say) take turns on a lock,
+    the same way the cache does, so neither loses the other's merge.
+    """
+    def write_day(self, day, RECORDS):
+        path = os.path.join(self.directory, day)
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        with open(path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            JOBS = collections.OrderedDict()
+            if os.path.isdir(path):
+                for record in ArchiveReader(self.directory).read_day(day, FIELDS):
+                    JOBS[record[0]] = record
+            for record in RECORDS:
+                JOBS[record[0]] = record
+
+            temporary = path + '.new.' + str(os.getpid())
+            os.makedirs(temporary)
+            for (index, field) in enumerate(FIELDS):
+                write_column(os.path.join(temporary, field + '.gz'), [record[index] for record in JOBS.values()])
+
+            if os.path.isdir(path):
+                old = path + '.old.' + str(os.getpid())
+                os.rename(path, old)
+                os.rename(temporary, path)
+                shutil.rmtree(old)
+            else:
+                os.rename(temporary, path)
+
+
+"""
+ArchiveReader(directory)
+
+@param directory - Where the archive lives
+
+Reads jobs back out of the archive.  Has the same records() as
+slurmdbd.JobDatabase, so a SacctQuery can be fed from it instead of sacct.
+"""
+class ArchiveReader(object):
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+
+    """
+    key()
+
+    @return What tells our jobs apart from those of any other source, for the
+            cache
+    """
+    def key(self):
+        return 'archive ' + os.path.abspath(self.directory)
+
+    """
+    days(starttime)
+
+    @return Sorted List of the days held in the archive on or after the day
+            of starttime
+    """
+    def days(self, starttime=0):
+        if not os.path.isdir(self.directory):
+            return []
+        first = day_of(starttime)
+        return sorted(day for day in os.listdir(self.directory) if len(day) == 10 and day >= first)
+
+    """
+    read_day(day, fields)
+
+    Only opens the column files of fields.  Fields we never archived come
+    back empty.
+
+    @return A generator of records for one day, in the order of fields
+    """
+    def read_day(self, day, fields):
+        COLUMNS = []
+        rows = 0
+        for field in fields:
+            path = os.path.join(self.directory, day, field + '.gz')
+            if os.path.exists(path):
+                COLUMNS.append(read_column(path))
+                rows = max(rows, len(COLUMNS[-1]))
+            else:
+                COLUMNS.append(None)
+
+        COLUMNS = [column or [''] * rows for column in COLUMNS]
+        for row in range(rows):
+            yield [column[row] for column in COLUMNS]
+
+    """
+    records(fields, WANTED, starttime)
+
+    @param fields    - The sacct fields we want, in order
+    @param WANTED    - Only jobs in these states, or None for every job
+    @param starttime - Epoch seconds our window starts at
+
+    @return A generator of records, Lists of strings in the order of fields,
+            just like query.stream() gives back
+    """
+    def records(self, fields, WANTED, starttime):
+        # We need End and State to filter on, even if nobody asked for them
+        READ = list(fields) + [field for field in ('End', 'State') if field not in fields]
+        END = READ.index('End')
+        STATE = READ.index('State')
+
+        for day in self.days(starttime):
+            for record in self.read_day(day, READ):
+                if columnar.parse_time(record[END]) < starttime:
+                    continue
+                if WANTED and record[STATE] not in WANTED:
+                    continue
+                yield record[:len(fields)]
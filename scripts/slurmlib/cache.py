@@ -0,0 +1,183 @@
+"""
+cache - An on-disk cache of finished sacct records.
+
+The stats scripts are run from cron every few minutes, and each run used to
+ask slurmdbd for the whole 12h/24h/7d window again.  A job that has finished
+never changes, so we keep those records locally, keyed by JobID, and only ask
+sacct for what happened since the last run (the high-water mark).
+
+Jobs that have not finished yet (no End time) are never cached, they are
+fetched fresh on every run.
+
+Each distinct sacct command (format & filters, not the start time) gets its
+own cache file, so sstats and node_stats never see each other's records.
+
+@Version 1.0
+"""
+
+### Import commands
+import fcntl
+import hashlib
+import os
+import time
+
+from slurmlib import columnar
+
+
+# Where we keep our cache files unless told otherwise
+DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'slurm_stats')
+
+# How far back past the high-water mark we re-query, to pick up jobs that
+# slurmdbd had not written yet when we last asked
+OVERLAP = 300
+
+# Finished jobs older than this are dropped.  Our longest window is 7 days.
+MAX_AGE = 8 * 86400
+
+# First line of every cache file, followed by the high-water mark and how far
+# back the cache is complete
+HEADER = '# slurm_stats cache v1 '
+
+
+"""
+slurm_time(epoch)
+
+@return epoch seconds formatted as a Slurm timestamp, YYYY-mm-ddTHH:MM:SS
+"""
+def slurm_time(epoch):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(epoch))
+
+
+"""
+SacctCache(directory, command, JOBID, END)
+
+@param directory - Where the cache file lives
+@param command   - The sacct command, without its --starttime, and where our
+                   jobs come from if that is not sacct.  Our file is named
+                   after it.
+@param JOBID     - Index of JobID within a record of command
+@param END       - Index of End within a record of command
+"""
+class SacctCache(object):
+
+    def __init__(self, directory, command, JOBID, END):
+        self.jobid_index = JOBID
+        self.end_index   = END
+        self.high_water  = 0
+        self.low_water   = 0
+        self.records     = {}
+
+        key = hashlib.md5(command.encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(directory, key + '.cache')
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    """
+    load()
+
+    Reads the cache file, if we have one.  A file we do not understand is
+    treated the same as no file at all.
+    """
+    def load(self):
+        self.high_water = 0
+        self.low_water  = 0
+        self.records    = {}
+
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path) as cache_file:
+            header = cache_file.readline()
+            if not header.startswith(HEADER):
+                return
+            (high_water, low_water) = header[len(HEADER):].split()
+            self.high_water = int(high_water)
+            self.low_water  = int(low_water)
+
+            for line in cache_file:
+                record = line.rstrip('\n').split('|')
+                self.records[record[self.jobid_index]] = (columnar.parse_time(record[self.end_index]), record)
+
+    """
+    save()
+
+    Writes the cache back out.  We write a new file and rename it over the old
+    one, so a reader never sees half a cache.
+    """
+    def save(self):
+        temp_path = self.path + '.' + str(os.getpid())
+
+        with open(temp_path, 'w') as cache_file:
+            cache_file.write(HEADER + str(int(self.high_water)) + ' ' + str(int(self.low_water)) + '\n')
+            for (end, record) in self.records.values():
+                cache_file.write('|'.join(record) + '\n')
+
+        os.rename(temp_path, self.path)
+
+    """
+    merge(record)
+
+    @param record - A sacct record, split on '|'
+
+    @return True if the job has finished and is now cached, False if it is
+            still pending or running
+    """
+    def merge(self, record):
+        end = columnar.parse_time(record[self.end_index])
+        if not end:
+            return False
+
+        jobid  = record[self.jobid_index]
+        cached = self.records.get(jobid)
+        if cached is None or cached[0] <= end:
+            self.records[jobid] = (end, record)
+        return True
+
+    """
+    prune(oldest)
+
+    Drops every cached job that finished before oldest.
+    """
+    def prune(self, oldest):
+        self.low_water = max(self.low_water, oldest)
+        for jobid in [jobid for (jobid, (end, record)) in self.records.items() if end < oldest]:
+            del self.records[jobid]
+
+    """
+    fetch(starttime, run_query)
+
+    @param starttime - Epoch seconds of the start of our window
+    @param run_query - Called with a Slurm timestamp, returns the records sacct
+                       has from then until now
+
+    Brings the cache up to date and hands back every record within our window.
+    Only the time since the high-water mark (less OVERLAP) is asked of sacct,
+    unless the cache does not reach back far enough (the low-water mark) or is
+    too stale to cover our window at all.
+
+    @return List of records, finished jobs first, then unfinished ones
+    """
+    def fetch(self, starttime, run_query):
+        with open(self.path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            self.load()
+            if self.low_water <= starttime < self.high_water - OVERLAP:
+                query_start = self.high_water - OVERLAP
+            else:
+                query_start    = starttime
+                self.low_water = starttime
+
+            now = time.time()
+            unfinished = []
+            for record in run_query(slurm_time(query_start)):
+                if not self.merge(record):
+                    unfinished.append(record)
+
+            self.high_water = now
+            self.prune(min(starttime, now - MAX_AGE))
+            self.save()
+
+        finished = [record for (end, record) in self.records.values() if end >= starttime]
+        return finished + unfinished
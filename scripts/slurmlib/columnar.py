@@ -0,0 +1,226 @@
+"""
+columnar - A compact, column oriented store for parsed sacct records.
+
+Keeping eleven Python Lists of strings around for every job gets expensive on
+a 500k job window.  A JobStore instead keeps one typed buffer per field:
+
+    INT      -> array of machine ints (ElapsedRaw, ...)
+    TIME     -> array of epoch seconds, parsed once (Start, End, ...)
+    EXIT     -> array of packed 'code:signal' exit codes
+    CATEGORY -> array of small ints, dictionary encoded (State, User, ...)
+    TEXT     -> plain List of strings, for fields that are unique per job
+
+Numeric columns are real numbers once stored, so later stages never have to
+call int() on the same field twice.
+
+@Version 1.0
+"""
+
+### Import commands
+import array
+import time
+
+
+# Kinds of column a JobStore understands
+INT      = 'int'
+TIME     = 'time'
+EXIT     = 'exit'
+CATEGORY = 'category'
+TEXT     = 'text'
+
+# array typecodes.  'l' is 64 bits on the Linux hosts we run on.
+INT_TYPE      = 'l'
+CATEGORY_TYPE = 'H'
+CATEGORY_WIDE = 'L'
+
+# Cache of 'YYYY-mm-ddTHH' -> epoch seconds, see parse_time()
+HOUR_CACHE = {}
+
+
+"""
+parse_int(text)
+
+@param text - The text sacct gave us
+
+@return The text as an int, or 0 when sacct left the field blank
+"""
+def parse_int(text):
+    try:
+        return int(text)
+    except ValueError:
+        return 0
+
+
+"""
+parse_time(text)
+
+@param text - A sacct timestamp, YYYY-mm-ddTHH:MM:SS
+
+Converts the timestamp into epoch seconds.  time.strptime() is far too slow to
+call for every job, so the hour part is converted once and cached, and the
+minutes and seconds are simply added on.
+
+@return Epoch seconds, or 0 for 'Unknown', 'None' and blank fields
+"""
+def parse_time(text):
+    if len(text) != 19:
+        return 0
+
+    hour = text[:13]
+    base = HOUR_CACHE.get(hour)
+    if base is None:
+        try:
+            base = int(time.mktime((int(text[0:4]), int(text[5:7]), int(text[8:10]), int(text[11:13]), 0, 0, 0, 0, -1)))
+        except ValueError:
+            return 0
+        HOUR_CACHE[hour] = base
+
+    return base + int(text[14:16]) * 60 + int(text[17:19])
+
+
+"""
+parse_exit(text)
+
+@param text - A sacct exit code, 'code:signal'
+
+@return The exit code packed into a single int, code in the high byte
+"""
+def parse_exit(text):
+    (code, _, signal) = text.partition(':')
+    return (parse_int(code) << 8) | parse_int(signal)
+
+
+"""
+format_exit(value)
+
+@return A packed exit code back in sacct's 'code:signal' format
+"""
+def format_exit(value):
+    return str(value >> 8) + ':' + str(value & 0xff)
+
+
+PARSERS = {
+    INT  : parse_int,
+    TIME : parse_time,
+    EXIT : parse_exit,
+}
+
+
+"""
+JobStore(SCHEMA)
+
+@param SCHEMA - List of (name, index, kind) tuples.  index is where the field
+                lives within a parsed sacct record, kind is one of INT, TIME,
+                EXIT, CATEGORY or TEXT.
+"""
+class JobStore(object):
+
+    def __init__(self, SCHEMA):
+        self.schema  = list(SCHEMA)
+        self.kinds   = dict((name, kind) for (name, index, kind) in self.schema)
+        self.columns = {}
+        self.labels  = {}
+        self.codes   = {}
+        self.rows    = 0
+
+        for (name, index, kind) in self.schema:
+            if kind == TEXT:
+                self.columns[name] = []
+            elif kind == CATEGORY:
+                self.columns[name] = array.array(CATEGORY_TYPE)
+                self.labels[name]  = []
+                self.codes[name]   = {}
+            else:
+                self.columns[name] = array.array(INT_TYPE)
+
+    def __len__(self):
+        return self.rows
+
+    """
+    add(record)
+
+    @param record - A single sacct record, already split on '|'
+
+    Appends the record to every column, converting each field to its type.
+    """
+    def add(self, record):
+        for (name, index, kind) in self.schema:
+            field = record[index]
+            if kind == TEXT:
+                self.columns[name].append(field)
+            elif kind == CATEGORY:
+                # encode() may swap in a wider column, so look it up after
+                code = self.encode(name, field)
+                self.columns[name].append(code)
+            else:
+                self.columns[name].append(PARSERS[kind](field))
+        self.rows += 1
+
+    """
+    encode(name, label)
+
+    Looks up (or hands out) the small int that stands in for label.  The
+    column is widened the first time it runs out of codes.
+    """
+    def encode(self, name, label):
+        codes = self.codes[name]
+        code  = codes.get(label)
+        if code is None:
+            code = len(codes)
+            codes[label] = code
+            self.labels[name].append(label)
+            column = self.columns[name]
+            if column.typecode == CATEGORY_TYPE and code > 0xffff:
+                self.columns[name] = array.array(CATEGORY_WIDE, column)
+        return code
+
+    """
+    column(name)
+
+    @return The raw buffer behind a column.  CATEGORY columns hold codes, see
+            label() and code().
+    """
+    def column(self, name):
+        return self.columns[name]
+
+    """
+    label(name, code)
+
+    @return The original string a CATEGORY code stands in for
+    """
+    def label(self, name, code):
+        return self.labels[name][code]
+
+    """
+    code(name, label)
+
+    @return The code for label within a CATEGORY column, or None if unseen
+    """
+    def code(self, name, label):
+        return self.codes[name].get(label)
+
+    """
+    value(name, row)
+
+    @return A single field of a single job, decoded back to a string for
+            CATEGORY columns
+    """
+    def value(self, name, row):
+        value = self.columns[name][row]
+        if self.kinds[name] == CATEGORY:
+            return self.labels[name][value]
+        return value
+
+    """
+    nbytes()
+
+    @return Roughly how many bytes the column buffers take up
+    """
+    def nbytes(self):
+        total = 0
+        for (name, column) in self.columns.items():
+            if isinstance(column, array.array):
+                total += column.itemsize * len(column)
+            else:
+                total += sum(len(item) for item in column)
+        return total
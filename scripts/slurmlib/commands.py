@@ -0,0 +1,48 @@
+"""
+commands - Where the Slurm commands we run live.
+
+Every script used to have /apps/slurm/default/bin baked in, so nothing could
+run anywhere but on the cluster.  Now every Slurm command is found through
+path(), which looks in SLURM_BIN.  Point the SLURM_BIN environment variable
+at another directory and every script runs those commands instead, e.g. the
+stand-ins from devel/fake_slurm.py, which replay recorded or made up output
+with whatever latency we ask for:
+
+    devel/fake_slurm.py --install /tmp/fake_slurm
+    SLURM_BIN=/tmp/fake_slurm ./sstats.py -a
+
+@Version 1.0
+"""
+
+### Import commands
+import os
+
+
+# Where our Slurm commands live on the cluster
+DEFAULT_BIN = '/apps/slurm/default/bin'
+
+# Where we run them from.  Anything else we are told to use wins.
+SLURM_BIN = os.environ.get('SLURM_BIN', DEFAULT_BIN)
+
+# The Slurm commands our scripts use
+COMMANDS = ('sacct', 'sacctmgr', 'scontrol', 'sinfo', 'sprio', 'squeue', 'sshare')
+
+
+"""
+path(name)
+
+@param name - A Slurm command, e.g. 'sacct'
+
+@return The full path of the command we should run
+"""
+def path(name):
+    return os.path.join(SLURM_BIN, name)
+
+
+"""
+available(name)
+
+@return True if we can run the Slurm command name
+"""
+def available(name='sinfo'):
+    return os.access(path(name), os.X_OK)
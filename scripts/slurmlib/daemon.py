@@ -0,0 +1,271 @@
+"""
+daemon - Keep sstats' rolling 12h/24h/7d reports in memory and serve them.
+
+Every run of sstats pays for interpreter start up, a sanity() fork and a full
+sacct query.  The daemon instead asks sacct only for what changed since its
+last refresh (a small delta, every INTERVAL seconds), keeps a JobTally per
+window up to date as jobs finish and age out, and renders every report ahead
+of time.  Answering a request over the Unix socket is then just handing back
+some text.
+
+The protocol is one line in, text back:
+
+    <window> <report>        e.g. 'day all', '12h failed', 'week completed'
+
+Anything we can not answer gets back a line starting with 'ERROR'.
+
+@Version 1.0
+"""
+
+### Import commands
+import heapq
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from slurmlib import cache
+from slurmlib import columnar
+from slurmlib import query
+
+
+# Where the daemon listens unless told otherwise
+SOCKET_PATH = '/var/run/slurm/sstats.sock'
+
+# Who may ask the daemon, the owner & group of the socket unless told otherwise
+SOCKET_MODE = 0o660
+
+# How often we ask sacct for what changed, in seconds
+INTERVAL = 60
+
+# The windows we keep, matching construct_date()
+WINDOWS = {
+    '12h'  : 12 * 3600,
+    'day'  : 24 * 3600,
+    'week' : 7 * 24 * 3600,
+}
+
+# The reports we render for each window
+REPORTS = ('all', 'completed', 'failed')
+
+# How long a client waits on the daemon before giving up, in seconds
+CLIENT_TIMEOUT = 5
+
+
+"""
+RollingWindow(seconds, TALLY)
+
+@param seconds - How far back from now the window reaches
+@param TALLY   - An empty JobTally to count our jobs in
+
+Tallies every finished job that ended within the window.  Jobs are kept in a
+heap by End time so that aging them out is cheap.
+"""
+class RollingWindow(object):
+
+    def __init__(self, seconds, TALLY):
+        self.seconds = seconds
+        self.tally   = TALLY
+        self.jobs    = {}
+        self.heap    = []
+
+    """
+    add(jobid, end, record)
+
+    Counts a finished job, replacing any record we already had for its JobID.
+    """
+    def add(self, jobid, end, record):
+        cached = self.jobs.get(jobid)
+        if cached is not None:
+            if cached[0] == end:
+                return
+            self.tally.remove(cached[1])
+
+        self.jobs[jobid] = (end, record)
+        self.tally.add(record)
+        heapq.heappush(self.heap, (end, jobid))
+
+    """
+    expire(now)
+
+    Stops counting every job that ended before the window now starts.
+    """
+    def expire(self, now):
+        oldest = now - self.seconds
+        while self.heap and self.heap[0][0] < oldest:
+            (end, jobid) = heapq.heappop(self.heap)
+            cached = self.jobs.get(jobid)
+            if cached is not None and cached[0] == end:
+                self.tally.remove(cached[1])
+                del self.jobs[jobid]
+
+
+"""
+StatsDaemon(REPORTS, render, SHARDS)
+
+@param REPORTS - A JobReport, whose tally each window keeps, then any reports
+                 that read from that tally, e.g. a FailureReport.  Used for
+                 their fields and bound to our records.
+@param render  - Called with the finished REPORTS & report name, returns the
+                 text for that report
+@param SHARDS  - Passed on to sharded_stream() for our first, full, query
+"""
+class StatsDaemon(object):
+
+    def __init__(self, REPORTS, render, SHARDS=1):
+        REPORT = REPORTS[0]
+        self.reports = list(REPORTS)
+        self.report  = REPORT
+        self.render  = render
+        self.shards  = SHARDS
+        self.query   = query.SacctQuery(REPORTS)
+        self.jobid   = self.query.index['JobID']
+        self.end     = self.query.index['End']
+        self.windows = dict((name, RollingWindow(seconds, REPORT.tally.spawn())) for (name, seconds) in WINDOWS.items())
+        self.high_water = 0
+        self.rendered   = {}
+
+    """
+    refresh()
+
+    Asks sacct for everything since our high-water mark (or the whole week on
+    our first go), folds finished jobs into each window, recounts unfinished
+    jobs from scratch and re-renders every report.
+    """
+    def refresh(self):
+        now = time.time()
+        if self.high_water:
+            RECORDS = query.stream(self.query.command() + cache.slurm_time(self.high_water - cache.OVERLAP) + ' --endtime=now')
+        elif self.shards > 1:
+            RECORDS = query.sharded_stream(self.query.command(), now - WINDOWS['week'], self.shards, self.jobid, self.end)
+        else:
+            RECORDS = query.stream(self.query.command() + cache.slurm_time(now - WINDOWS['week']) + ' --endtime=now')
+
+        unfinished = self.report.tally.spawn()
+        for record in RECORDS:
+            end = columnar.parse_time(record[self.end])
+            if not end:
+                unfinished.add(record)
+                continue
+            for window in self.windows.values():
+                if end >= now - window.seconds:
+                    window.add(record[self.jobid], end, record)
+
+        self.high_water = now
+
+        rendered = {}
+        for (name, window) in self.windows.items():
+            window.expire(now)
+
+            tally = unfinished.spawn()
+            tally.update(window.tally)
+            tally.update(unfinished)
+
+            self.report.tally = tally
+            for report in self.reports:
+                report.finish()
+            for which in REPORTS:
+                rendered[(name, which)] = self.render(self.reports, which)
+
+        # Swapped in whole, so a request never sees half a refresh
+        self.rendered = rendered
+
+    """
+    answer(line)
+
+    @param line - A request, '<window> <report>'
+
+    @return The pre-rendered text for the request
+    """
+    def answer(self, line):
+        text = self.rendered.get(tuple(line.split()))
+        if text is None:
+            return 'ERROR: Unknown request ' + line + '\n'
+        return text
+
+    """
+    refresh_forever()
+
+    Keeps refreshing every INTERVAL seconds.  A failed refresh leaves the last
+    good reports in place, and we try again next time around.
+    """
+    def refresh_forever(self):
+        while True:
+            time.sleep(INTERVAL)
+            try:
+                self.refresh()
+            except Exception as error:
+                print('Refresh failed: ' + str(error))
+
+    """
+    serve(socket_path, mode)
+
+    @param socket_path - Where to put our Unix socket
+    @param mode        - The permissions of our socket
+
+    Does our first refresh, then serves requests forever while a background
+    thread keeps refreshing.
+    """
+    def serve(self, socket_path=SOCKET_PATH, mode=SOCKET_MODE):
+        self.refresh()
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline().decode('utf-8').strip()
+                self.wfile.write(daemon.answer(line).encode('utf-8'))
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        server = Server(socket_path, Handler)
+        os.chmod(socket_path, mode)
+
+        refresher = threading.Thread(target=self.refresh_forever)
+        refresher.daemon = True
+        refresher.start()
+
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            os.unlink(socket_path)
+
+
+"""
+ask(socket_path, window, report)
+
+@param socket_path - Where the daemon is listening
+@param window      - One of WINDOWS
+@param report      - One of REPORTS
+
+@return The daemon's text for the report, or None if we could not get an
+        answer from it
+"""
+def ask(socket_path, window, report):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(CLIENT_TIMEOUT)
+
+    try:
+        client.connect(socket_path)
+        client.sendall((window + ' ' + report + '\n').encode('utf-8'))
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except (socket.error, socket.timeout):
+        return None
+    finally:
+        client.close()
+
+    text = b''.join(chunks).decode('utf-8')
+    if text.startswith('ERROR'):
+        return None
+    return text
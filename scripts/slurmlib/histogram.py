@@ -0,0 +1,169 @@
+"""
+histogram - Bin job durations into configurable buckets in one pass.
+
+ElapsedRaw is already an int column within a JobStore, so every job is put in
+its bucket with a single bisect, mapped over the whole column at C speed.  The
+per node and per partition counts are then just a Counter over (code, bucket)
+pairs, so nothing ever loops over the jobs in Python more than once.
+
+Buckets are described by their upper edges in seconds.  Edges of
+[60, 1800, 3600] give the buckets <1m, <30m, <1h and >=1h.
+
+@Version 1.0
+"""
+
+### Import commands
+import array
+import bisect
+import collections
+import functools
+
+
+# 1m, 30m, 1h, 4h, 1d
+DEFAULT_EDGES = [60, 1800, 3600, 14400, 86400]
+
+# Suffixes we accept for bucket edges, and the seconds they are worth
+UNITS = [
+    ('d', 86400),
+    ('h', 3600),
+    ('m', 60),
+    ('s', 1),
+]
+
+
+"""
+parse_edges(text)
+
+@param text - Comma separated edges, e.g. '1m,30m,1h,4h,1d'
+
+Edges without a suffix are taken as seconds.
+
+@return Sorted List of unique edges in seconds
+"""
+def parse_edges(text):
+    edges = set()
+
+    for edge in text.split(','):
+        edge = edge.strip()
+        if not edge:
+            continue
+        multiplier = 1
+        for (suffix, seconds) in UNITS:
+            if edge.endswith(suffix):
+                edge = edge[:-1]
+                multiplier = seconds
+                break
+        edges.add(int(edge) * multiplier)
+
+    return sorted(edges)
+
+
+"""
+format_duration(seconds)
+
+@return seconds in the largest unit that divides it evenly, e.g. 1800 -> '30m'
+"""
+def format_duration(seconds):
+    for (suffix, size) in UNITS:
+        if seconds and seconds % size == 0:
+            return str(seconds // size) + suffix
+    return str(seconds) + 's'
+
+
+"""
+format_elapsed(seconds)
+
+@return seconds the way sacct prints Elapsed, [D-]HH:MM:SS
+"""
+def format_elapsed(seconds):
+    (days, seconds) = divmod(seconds, 86400)
+    text = '%02d:%02d:%02d' % (seconds // 3600, (seconds // 60) % 60, seconds % 60)
+    if days:
+        text = str(days) + '-' + text
+    return text
+
+
+"""
+DurationHistogram(JOBS, edges, GROUPS, column)
+
+@param JOBS   - The JobStore holding our jobs
+@param edges  - Upper edges of each bucket in seconds
+@param GROUPS - CATEGORY columns we also want the buckets broken down by
+@param column - The INT column holding each job's duration
+
+Buckets every job once and keeps the overall, and per group, counts.
+"""
+class DurationHistogram(object):
+
+    def __init__(self, JOBS, edges=DEFAULT_EDGES, GROUPS=('NODES', 'PARTITIONS'), column='ELAPSED_RAW'):
+        self.jobs   = JOBS
+        self.edges  = sorted(set(edges))
+        self.groups = {}
+
+        # Which bucket each job falls into.  There are never more than 255 edges.
+        self.buckets = array.array('B', map(functools.partial(bisect.bisect_right, self.edges), JOBS.column(column)))
+
+        self.totals = [0] * (len(self.edges) + 1)
+        for (bucket, count) in collections.Counter(self.buckets).items():
+            self.totals[bucket] = count
+
+        for name in GROUPS:
+            self.groups[name] = collections.Counter(zip(JOBS.column(name), self.buckets))
+
+    """
+    labels()
+
+    @return A label for each bucket, e.g. ['<1m', '<30m', '>=30m']
+    """
+    def labels(self):
+        labels = ['<' + format_duration(edge) for edge in self.edges]
+        if self.edges:
+            labels.append('>=' + format_duration(self.edges[-1]))
+        else:
+            labels.append('all')
+        return labels
+
+    """
+    under(seconds)
+
+    @param seconds - One of our edges
+
+    @return The amount of jobs that ran for less than seconds
+    """
+    def under(self, seconds):
+        return sum(self.totals[:self.edges.index(seconds) + 1])
+
+    """
+    over(seconds)
+
+    @return The amount of jobs that ran for seconds or longer
+    """
+    def over(self, seconds):
+        return sum(self.totals[self.edges.index(seconds) + 1:])
+
+    """
+    row_counts(ROWS)
+
+    @param ROWS - Rows of the jobs we want the buckets of, e.g. from a NodeIndex
+
+    @return List of the amount of those jobs in each bucket
+    """
+    def row_counts(self, ROWS):
+        counts = [0] * len(self.totals)
+        buckets = self.buckets
+        for row in ROWS:
+            counts[buckets[row]] += 1
+        return counts
+
+    """
+    group_counts(name, label)
+
+    @param name  - One of the GROUPS we were built with, e.g. 'PARTITIONS'
+    @param label - The node, partition, etc. we want the buckets of
+
+    @return List of the amount of jobs in each bucket
+    """
+    def group_counts(self, name, label):
+        code   = self.jobs.code(name, label)
+        counts = self.groups[name]
+        return [counts[(code, bucket)] for bucket in range(len(self.totals))]
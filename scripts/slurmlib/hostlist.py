@@ -0,0 +1,241 @@
+"""
+hostlist - Expand and compress Slurm hostlists, e.g. node[001-003,007].
+
+sacct hands back NodeList as a compressed hostlist.  To credit a multi node
+job to every node it ran on we have to expand it, and the same few ranges come
+up over and over again, so expansions are cached.
+
+@Version 1.0
+"""
+
+### Import commands
+import array
+import functools
+import heapq
+import operator
+import re
+
+
+# A run of digits at the end of a host name, and what comes before it
+NUMBERED = re.compile(r'^(.*?)(\d+)$')
+
+# How many distinct hostlists we remember the expansion of
+CACHE_SIZE = 65536
+
+
+"""
+split_top(text)
+
+Splits a hostlist on the commas that are not inside brackets.
+
+@return List of hostlist pieces
+"""
+def split_top(text):
+    pieces = []
+    depth = 0
+    start = 0
+
+    for (index, char) in enumerate(text):
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            pieces.append(text[start:index])
+            start = index + 1
+    pieces.append(text[start:])
+
+    return [piece for piece in pieces if piece]
+
+
+"""
+expand_range(text)
+
+@param text - What is inside a pair of brackets, e.g. '001-003,007'
+
+Zero padding of the start of each range is kept.
+
+@return List of the strings the brackets stand for
+"""
+def expand_range(text):
+    values = []
+
+    for part in text.split(','):
+        (low, _, high) = part.partition('-')
+        if not high:
+            values.append(low)
+            continue
+        width = len(low)
+        for number in range(int(low), int(high) + 1):
+            values.append(str(number).zfill(width))
+
+    return values
+
+
+"""
+expand_piece(piece)
+
+@param piece - A hostlist with no top level commas, e.g. 'rack[1-2]-n[01-02]'
+
+@return List of every host name piece stands for
+"""
+def expand_piece(piece):
+    bracket = piece.find('[')
+    if bracket < 0:
+        return [piece]
+
+    close  = piece.index(']', bracket)
+    prefix = piece[:bracket]
+    rest   = expand_piece(piece[close + 1:])
+
+    return [prefix + value + suffix for value in expand_range(piece[bracket + 1:close]) for suffix in rest]
+
+
+"""
+expand(hostlist)
+
+@param hostlist - A Slurm hostlist, e.g. 'node[001-003,007],gpu01'
+
+Results are cached, so expanding the same hostlist again costs a lookup.
+'None assigned' (pending jobs) and blank hostlists expand to nothing.
+
+@return Tuple of host names
+"""
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def expand(hostlist):
+    if not hostlist or hostlist.startswith('None'):
+        return ()
+
+    names = []
+    for piece in split_top(hostlist):
+        names.extend(expand_piece(piece))
+
+    return tuple(names)
+
+
+"""
+compress(names)
+
+@param names - Iterable of host names
+
+Groups names by everything before their trailing number (and the width of a
+zero padded number), and turns each run of consecutive numbers into a range.
+
+@return A Slurm hostlist, e.g. 'gpu01,node[001-003,007]'
+"""
+def compress(names):
+    groups = {}
+    plain  = set()
+
+    for name in set(names):
+        match = NUMBERED.match(name)
+        if match is None:
+            plain.add(name)
+            continue
+        (prefix, digits) = match.groups()
+
+        # Zero padded numbers only group with numbers of the same width
+        if digits.startswith('0'):
+            width = len(digits)
+        else:
+            width = 0
+        groups.setdefault((prefix, width), []).append(int(digits))
+
+    pieces = sorted(plain)
+    for ((prefix, width), numbers) in sorted(groups.items()):
+        numbers.sort()
+        ranges = []
+        start = previous = numbers[0]
+        for number in numbers[1:] + [None]:
+            if number is not None and number == previous + 1:
+                previous = number
+                continue
+            if start == previous:
+                ranges.append(str(start).zfill(width))
+            else:
+                ranges.append(str(start).zfill(width) + '-' + str(previous).zfill(width))
+            start = previous = number
+
+        if len(numbers) == 1:
+            pieces.append(prefix + ranges[0])
+        else:
+            pieces.append(prefix + '[' + ','.join(ranges) + ']')
+
+    return ','.join(sorted(pieces))
+
+
+"""
+NodeIndex(JOBS, column, ELAPSED)
+
+@param JOBS    - The JobStore holding our jobs
+@param column  - The CATEGORY column holding each job's NodeList
+@param ELAPSED - The INT column holding each job's duration in seconds
+
+An inverted index from each node to the rows of every job that ran on it.
+Each distinct NodeList is only expanded once, and each job is credited to all
+of its nodes, along with its node-seconds, in a single pass.
+"""
+class NodeIndex(object):
+
+    def __init__(self, JOBS, column='NODES', ELAPSED='ELAPSED_RAW'):
+        self.rows    = {}
+        self.seconds = {}
+
+        EXPANDED = [expand(label) for label in JOBS.labels[column]]
+        DURATION = JOBS.column(ELAPSED)
+
+        for (row, code) in enumerate(JOBS.column(column)):
+            for node in EXPANDED[code]:
+                rows = self.rows.get(node)
+                if rows is None:
+                    rows = self.rows[node] = array.array('l')
+                    self.seconds[node] = 0
+                rows.append(row)
+                self.seconds[node] += DURATION[row]
+
+    """
+    nodes()
+
+    @return Sorted List of every node that ran at least one job
+    """
+    def nodes(self):
+        return sorted(self.rows)
+
+    """
+    count(node)
+
+    @return The amount of jobs that ran on node
+    """
+    def count(self, node):
+        return len(self.rows.get(node, ()))
+
+    """
+    hours(node)
+
+    @return The job-hours run on node, the wall time of each job summed.  Jobs
+            sharing the node each count, see utilization for busy hours.
+    """
+    def hours(self, node):
+        return self.seconds.get(node, 0) / 3600
+
+    """
+    busiest(k) / idlest(k)
+
+    Only nodes that ran at least one job are known to us, so an idle node that
+    ran nothing at all will never show up as the idlest.
+
+    @return List of (node, jobs) tuples
+    """
+    def busiest(self, k=1):
+        return heapq.nlargest(k, ((node, len(rows)) for (node, rows) in self.rows.items()), key=operator.itemgetter(1))
+
+    def idlest(self, k=1):
+        return heapq.nsmallest(k, ((node, len(rows)) for (node, rows) in self.rows.items()), key=operator.itemgetter(1))
+
+    """
+    busiest_hours(k)
+
+    @return List of (node, job-hours) tuples
+    """
+    def busiest_hours(self, k=1):
+        return [(node, seconds / 3600) for (node, seconds) in heapq.nlargest(k, self.seconds.items(), key=operator.itemgetter(1))]
@@ -0,0 +1,187 @@
+"""
+jobcomp - Read jobs from the jobcomp/filetxt log rather than slurmdbd.
+
+slurm.conf has JobCompType=jobcomp/filetxt, so slurmctld appends a line for
+every job as it finishes:
+
+    JobId=1234 UserId=First.Last(5001) GroupId=... JobState=COMPLETED Partition=batch ...
+
+Lines are written as jobs end, so the file is in EndTime order.  A JobCompLog
+memory maps the file, binary searches it for the first job that ended within
+our window, and only parses from there on.  Months of history can be looked
+at without asking slurmdbd for anything.
+
+Only finished jobs are ever written, so nothing read from here is RUNNING or
+PENDING.
+
+@Version 1.0
+"""
+
+### Import commands
+import mmap
+import os
+import re
+import time
+
+from slurmlib import columnar
+from slurmlib import histogram
+
+
+# Where slurmctld writes the log when JobCompLoc is not set
+DEFAULT_LOG = '/var/log/slurm_jobcomp.log'
+
+# Splits a line on the spaces in front of each Key=
+KEYS = re.compile(r' (?=\w+=)')
+
+# The jobcomp key behind each sacct field, for the ones that map straight over
+FIELDS = {
+    'JobID'    : 'JobId',
+    'Account'  : 'Account',
+    'State'    : 'JobState',
+    'ExitCode' : 'ExitCode',
+    'Submit'   : 'SubmitTime',
+    'Start'    : 'StartTime',
+    'End'      : 'EndTime',
+    'NodeList' : 'NodeList',
+    'Partition': 'Partition',
+    'AllocCPUS': 'ProcCnt',
+    'NNodes'   : 'NodeCnt',
+    'QOS'      : 'QOS',
+    'AllocTRES': 'Tres',
+}
+
+
+"""
+parse(line)
+
+@param line - A single line of the log, as bytes
+
+@return Dictionary of key -> value
+"""
+def parse(line):
+    ENTRY = {}
+    for item in KEYS.split(line.decode('utf-8', 'replace').rstrip('\n')):
+        (key, _, value) = item.partition('=')
+        ENTRY[key] = value
+    return ENTRY
+
+
+"""
+JobCompLog(path)
+
+@param path - The jobcomp/filetxt log, JobCompLoc in slurm.conf
+"""
+class JobCompLog(object):
+
+    def __init__(self, path=DEFAULT_LOG):
+        self.path = path
+
+    """
+    key()
+
+    @return What tells our jobs apart from those of any other source, for the
+            cache
+    """
+    def key(self):
+        return 'jobcomp ' + os.path.abspath(self.path)
+
+    """
+    line_start(log, position)
+
+    @return Where the first line starting at or after position begins
+    """
+    def line_start(self, log, position):
+        if position == 0:
+            return 0
+        newline = log.find(b'\n', position - 1)
+        if newline < 0:
+            return len(log)
+        return newline + 1
+
+    """
+    ended_by(log, position, starttime)
+
+    @return True if the first line at or after position ended at or after
+            starttime, or there is no such line
+    """
+    def ended_by(self, log, position, starttime):
+        start = self.line_start(log, position)
+        if start >= len(log):
+            return True
+        end = log.find(b'\n', start)
+        if end < 0:
+            end = len(log)
+        ENTRY = parse(log[start:end])
+        return columnar.parse_time(ENTRY.get('EndTime', '')) >= starttime
+
+    """
+    offset(log, starttime)
+
+    Binary searches the byte offsets of log for the first line that ended at or
+    after starttime.  Only O(log n) lines are ever parsed to find it.
+
+    @return The offset of that line
+    """
+    def offset(self, log, starttime):
+        low = 0
+        high = len(log)
+        while low < high:
+            middle = (low + high) // 2
+            if self.ended_by(log, middle, starttime):
+                high = middle
+            else:
+                low = middle + 1
+        return self.line_start(log, low)
+
+    """
+    format(field, ENTRY, now)
+
+    @return A field of a parsed line, the way sacct --parsable2 prints it
+    """
+    def format(self, field, ENTRY, now):
+        if field in FIELDS:
+            return ENTRY.get(FIELDS[field], '')
+        elif field == 'User':
+            return ENTRY.get('UserId', '').partition('(')[0]
+        elif field in ('Elapsed', 'ElapsedRaw'):
+            start = columnar.parse_time(ENTRY.get('StartTime', ''))
+            end = columnar.parse_time(ENTRY.get('EndTime', '')) or now
+            elapsed = 0
+            if start:
+                elapsed = max(end - start, 0)
+            if field == 'Elapsed':
+                return histogram.format_elapsed(elapsed)
+            return str(elapsed)
+        return ''
+
+    """
+    records(fields, WANTED, starttime)
+
+    @param fields    - The sacct fields we want, in order
+    @param WANTED    - Only jobs in these states, or None for every job
+    @param starttime - Epoch seconds our window starts at
+
+    @return A generator of records, Lists of strings in the order of fields,
+            just like query.stream() gives back
+    """
+    def records(self, fields, WANTED, starttime):
+        now = int(time.time())
+
+        with open(self.path, 'rb') as log_file:
+            # mmap will not map an empty file
+            log_file.seek(0, 2)
+            if not log_file.tell():
+                return
+
+            log = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                log.seek(self.offset(log, starttime))
+                for line in iter(log.readline, b''):
+                    if not line.strip():
+                        continue
+                    ENTRY = parse(line)
+                    if WANTED and ENTRY.get('JobState') not in WANTED:
+                        continue
+                    yield [self.format(field, ENTRY, now) for field in fields]
+            finally:
+                log.close()
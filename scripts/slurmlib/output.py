@@ -0,0 +1,136 @@
+"""
+output - Machine readable output for the stats scripts.
+
+Our monitoring used to run the scripts a second time and scrape what they
+printed.  Instead each script can now put its numbers into a Metrics, which
+writes them as JSON, CSV, or the Prometheus text format.  The Prometheus text
+can also be dropped into a node_exporter textfile directory, so one run feeds
+the dashboards, the alerts and the emailed report.
+
+Every sample is a metric name, a set of labels, and a value:
+
+    slurm_jobs{state="failed",window="12h"} 265
+
+@Version 1.0
+"""
+
+### Import commands
+import collections
+import csv
+import json
+import os
+
+
+# Formats our scripts accept.  'text' is our usual printed report.
+FORMATS = ('text', 'json', 'csv', 'prometheus')
+
+
+"""
+escape(value)
+
+@return value made safe to sit between the quotes of a Prometheus label
+"""
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+"""
+Metrics(LABELS)
+
+@param LABELS - Dictionary of labels every sample gets, e.g. {'window': '12h'}
+
+Collects samples in the order they were added.
+"""
+class Metrics(object):
+
+    def __init__(self, LABELS=None):
+        self.labels  = sorted((LABELS or {}).items())
+        self.samples = []
+        self.help    = collections.OrderedDict()
+
+    """
+    describe(name, text)
+
+    Sets the HELP line Prometheus shows for name.
+    """
+    def describe(self, name, text):
+        self.help[name] = text
+
+    """
+    set_labels(LABELS)
+
+    @param LABELS - Dictionary of labels every sample added from now on gets,
+                    in place of those we were made with
+
+    Lets one Metrics hold e.g. a set of samples per cluster.
+    """
+    def set_labels(self, LABELS):
+        self.labels = sorted(LABELS.items())
+
+    """
+    add(name, value, LABELS)
+
+    @param name   - The metric name, e.g. 'slurm_jobs'
+    @param value  - An int or float
+    @param LABELS - Dictionary of labels for this sample only
+    """
+    def add(self, name, value, LABELS=None):
+        if name not in self.help:
+            self.help[name] = name
+        self.samples.append((name, sorted((LABELS or {}).items()) + self.labels, value))
+
+    """
+    write(stream, form)
+
+    @param stream - Where to write, e.g. sys.stdout
+    @param form   - 'json', 'csv' or 'prometheus'
+    """
+    def write(self, stream, form):
+        if form == 'json':
+            json.dump([collections.OrderedDict([('metric', name), ('labels', collections.OrderedDict(LABELS)), ('value', value)]) for (name, LABELS, value) in self.samples], stream, indent=1)
+            stream.write('\n')
+        elif form == 'csv':
+            WRITER = csv.writer(stream, lineterminator='\n')
+            WRITER.writerow(['metric', 'labels', 'value'])
+            for (name, LABELS, value) in self.samples:
+                WRITER.writerow([name, ';'.join(key + '=' + str(label) for (key, label) in LABELS), value])
+        else:
+            self.write_prometheus(stream)
+
+    """
+    write_prometheus(stream)
+
+    Writes every sample in the Prometheus text exposition format, grouped by
+    metric name.
+    """
+    def write_prometheus(self, stream):
+        GROUPED = collections.defaultdict(list)
+        for (name, LABELS, value) in self.samples:
+            GROUPED[name].append((LABELS, value))
+
+        for name in self.help:
+            if name not in GROUPED:
+                continue
+            stream.write('# HELP ' + name + ' ' + self.help[name] + '\n')
+            stream.write('# TYPE ' + name + ' gauge\n')
+            for (LABELS, value) in GROUPED[name]:
+                text = ','.join(key + '="' + escape(label) + '"' for (key, label) in LABELS)
+                if text:
+                    text = '{' + text + '}'
+                stream.write(name + text + ' ' + str(value) + '\n')
+
+    """
+    write_textfile(directory, name)
+
+    @param directory - node_exporter's textfile collector directory
+    @param name      - File name, without the .prom
+
+    Writes to a temporary file first, then renames it into place, so
+    node_exporter never reads half a file.
+    """
+    def write_textfile(self, directory, name):
+        path = os.path.join(directory, name + '.prom')
+        temporary = path + '.' + str(os.getpid())
+        with open(temporary, 'w') as stream:
+            self.write_prometheus(stream)
+        os.rename(temporary, path)
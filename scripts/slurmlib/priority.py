@@ -0,0 +1,207 @@
+"""
+priority - Why pending jobs are still pending, from sprio and sshare.
+
+We run priority/multifactor, so a pending job's priority is the sum of its
+weighted age, fair-share, job size, partition, QOS and TRES factors.  sprio
+gives us those per job and sshare gives us each user's fair-share, but
+neither says which factor is holding a user back.
+
+A PriorityReport runs each of squeue, sprio and sshare once:
+
+    squeue --all --noheader --states=PENDING --format=%i|%u|%a|%P|%q|%r
+    sprio --noheader --format=%i|%Y|%A|%F|%J|%P|%Q|%T
+    sshare --all --noheader --parsable2 --format=Account,User,EffectvUsage,FairShare
+
+Pending jobs are kept in a dictionary by JobID and sshare rows by (account,
+user), so every sprio line is joined to its job & share in O(1) as it is
+streamed by.  Nothing but the pending jobs' owners is ever held in memory.
+
+@Version 1.0
+"""
+
+### Import commands
+import collections
+
+from slurmlib import commands
+from slurmlib import query
+
+
+# The priority factors sprio breaks a job's priority into, in its own order
+FACTORS = ['age', 'fairshare', 'jobsize', 'partition', 'qos', 'tres']
+
+# The squeue, sprio & sshare columns we ask for
+SQUEUE_FORMAT = '%i|%u|%a|%P|%q|%r'
+SPRIO_FORMAT  = '%i|%Y|%A|%F|%J|%P|%Q|%T'
+SSHARE_FORMAT = 'Account,User,EffectvUsage,FairShare'
+
+
+"""
+weight(text)
+
+@param text - A weighted factor as sprio prints it.  TRES comes as e.g.
+              'cpu=120,mem=4', which we add up.
+
+@return The factor as a float
+"""
+def weight(text):
+    if '=' in text:
+        return sum(weight(item.partition('=')[2]) for item in text.split(','))
+    try:
+        return float(text)
+    except ValueError:
+        return 0.0
+
+
+"""
+PriorityTotals()
+
+What we add up for each user or account: how many pending jobs, their
+priority & every factor summed, and how many jobs each factor dominated.
+"""
+class PriorityTotals(object):
+
+    def __init__(self):
+        self.jobs      = 0
+        self.priority  = 0.0
+        self.factors   = [0.0] * len(FACTORS)
+        self.dominant  = collections.Counter()
+
+    def add(self, priority, FACTOR_WEIGHTS):
+        self.jobs += 1
+        self.priority += priority
+        for (index, value) in enumerate(FACTOR_WEIGHTS):
+            self.factors[index] += value
+        self.dominant[FACTORS[FACTOR_WEIGHTS.index(max(FACTOR_WEIGHTS))]] += 1
+
+    def average(self):
+        if not self.jobs:
+            return 0.0
+        return self.priority / self.jobs
+
+    """
+    shares()
+
+    @return Dictionary of factor -> percentage of the priority it made up
+    """
+    def shares(self):
+        total = sum(self.factors)
+        return dict((factor, 100.0 * value / total if total else 0.0) for (factor, value) in zip(FACTORS, self.factors))
+
+    """
+    main_factor()
+
+    @return The factor that made up the most priority across every job
+    """
+    def main_factor(self):
+        return FACTORS[self.factors.index(max(self.factors))]
+
+
+"""
+PriorityReport()
+
+Add pending jobs, shares and priorities with add_job(), add_share() and
+add_priority(), in that order, or have take() run all three.  Users are
+totalled per (user, account), the associations sshare reports on.
+"""
+class PriorityReport(object):
+
+    def __init__(self):
+        self.pending  = {}
+        self.shares   = {}
+        self.users    = collections.defaultdict(PriorityTotals)
+        self.accounts = collections.defaultdict(PriorityTotals)
+        self.reasons  = collections.Counter()
+        self.joined   = 0
+        self.unjoined = 0
+
+    def squeue_command(self):
+        return commands.path('squeue') + ' --all --noheader --states=PENDING --format=' + SQUEUE_FORMAT
+
+    def sprio_command(self):
+        return commands.path('sprio') + ' --noheader --format=' + SPRIO_FORMAT
+
+    def sshare_command(self):
+        return commands.path('sshare') + ' --all --noheader --parsable2 --format=' + SSHARE_FORMAT
+
+    """
+    add_job(record)
+
+    @param record - [JobID, User, Account, Partition, QOS, Reason] from squeue
+    """
+    def add_job(self, record):
+        (jobid, user, account, partition, qos, reason) = record
+        self.pending[jobid] = (user, account)
+        self.reasons[reason] += 1
+
+    """
+    add_share(record)
+
+    @param record - [Account, User, EffectvUsage, FairShare] from sshare.
+                    Account rows have no User.
+    """
+    def add_share(self, record):
+        (account, user, usage, fairshare) = record
+        self.shares[(account.strip(), user)] = (weight(usage), weight(fairshare))
+
+    """
+    add_priority(record)
+
+    @param record - [JobID, Priority, FACTORS...] from sprio
+
+    A job pending in several partitions gets a line for each, we count the
+    first.  Jobs that are no longer pending are skipped.
+    """
+    def add_priority(self, record):
+        OWNER = self.pending.pop(record[0], None)
+        if OWNER is None:
+            self.unjoined += 1
+            return
+
+        self.joined += 1
+        FACTOR_WEIGHTS = [weight(value) for value in record[2:]]
+        priority = weight(record[1])
+        self.users[OWNER].add(priority, FACTOR_WEIGHTS)
+        self.accounts[OWNER[1]].add(priority, FACTOR_WEIGHTS)
+
+    """
+    take()
+
+    Runs squeue, sshare & sprio once each, adding everything they print.
+
+    @return The amount of lines we read
+    """
+    def take(self):
+        count = 0
+        for record in query.stream(self.squeue_command()):
+            count += 1
+            self.add_job(record)
+        for record in query.stream(self.sshare_command()):
+            count += 1
+            self.add_share(record)
+        for record in query.stream(self.sprio_command()):
+            count += 1
+            self.add_priority(record)
+        return count
+
+    """
+    fairshare(account, user)
+
+    @return (EffectvUsage, FairShare) from sshare, of the user within account,
+            or of the account itself without a user.  (0, 0) if sshare did not
+            list them.
+    """
+    def fairshare(self, account, user=''):
+        return self.shares.get((account, user), (0.0, 0.0))
+
+    """
+    ranked(dimension)
+
+    @param dimension - 'users' or 'accounts'
+
+    @return List of (name, PriorityTotals) tuples, lowest average priority,
+            the furthest back in the queue, first.  Users are named by
+            (user, account).
+    """
+    def ranked(self, dimension):
+        TOTALS = getattr(self, dimension)
+        return sorted(TOTALS.items(), key=lambda item: (item[1].average(), item[0]))
@@ -0,0 +1,328 @@
+"""
+query - Running sacct and the other Slurm commands for the stats scripts.
+
+A SacctQuery takes any number of reports (see reports.py), asks sacct once for
+the union of the fields they need, and fans every record out to each of them.
+
+@Version 1.0
+"""
+
+### Import commands
+import concurrent.futures
+import datetime
+import queue
+import shlex
+import subprocess
+import threading
+import time
+
+from slurmlib import cache
+from slurmlib import columnar
+from slurmlib import commands
+
+
+# Where sacct lives, see commands.py
+SACCT_BIN = commands.path('sacct')
+
+# Options every one of our sacct queries uses
+SACCT_OPTIONS = '--allusers --allocations --noheader --parsable2'
+
+# Fields every query asks for, so any query can be cached
+KEY_FIELDS = ['JobID', 'End']
+
+# Most sacct processes we will ever have running at once for a sharded fetch,
+# so we do not swamp slurmdbd
+MAX_WORKERS = 4
+
+# Most records each of those sacct processes may get ahead of us by
+SHARD_QUEUE = 1000
+
+
+"""
+SacctError(message, code)
+
+@param message - What went wrong
+@param code    - The exit code the Slurm command gave, or 127 if it could not
+                 be started
+
+Raised when a Slurm command we stream from fails.  The scripts print it and
+exit with code, the daemon lives to try again.
+"""
+class SacctError(Exception):
+
+    def __init__(self, message, code):
+        Exception.__init__(self, message)
+        self.code = code
+
+
+"""
+stream(command)
+
+@param command - The full Slurm command we want to run
+
+Runs our Slurm command through a pipe and hands back each record as soon as it
+is read, split once on the '|' delimiter.  Only a single line of output is ever
+held in memory at a time.
+
+If the command can not be started, or exits non-zero, a SacctError is raised.
+If we are closed before the end, the command is killed and waited on.
+"""
+def stream(command):
+    try:
+        process = subprocess.Popen(shlex.split(command), stdout=subprocess.PIPE, universal_newlines=True)
+    except OSError as error:
+        raise SacctError(str(error), 127)
+
+    # Should whoever reads us stop early, the command is not left behind
+    EXHAUSTED = False
+    try:
+        for line in process.stdout:
+            line = line.rstrip('\n')
+            if line:
+                yield line.split('|')
+        EXHAUSTED = True
+    finally:
+        process.stdout.close()
+        if not EXHAUSTED:
+            process.kill()
+        EXIT_CODE_RUN = process.wait()
+
+    if EXIT_CODE_RUN != 0:
+        raise SacctError(shlex.split(command)[0] + ' exited with ' + str(EXIT_CODE_RUN), EXIT_CODE_RUN)
+
+
+"""
+sharded_stream(command, starttime, SHARDS, JOBID, END)
+
+@param command   - Our sacct command, up to and including --starttime=
+@param starttime - Epoch seconds of the start of our window
+@param SHARDS    - How many pieces to split the window into
+@param JOBID     - Index of JobID within a record
+@param END       - Index of End within a record
+
+Splits the window from starttime until now into SHARDS equal pieces and runs a
+sacct for each of them at the same time, at most MAX_WORKERS at once.  Each
+sacct feeds a queue of at most SHARD_QUEUE records, which we hand back from in
+the order of the pieces, oldest first.  A sacct that gets ahead of us blocks
+on its pipe, so only those queues are ever held in memory, never a whole piece.
+
+A job that was around for more than one piece comes back more than once, so we
+only hand back the first record we see for each JobID.  Only a job that was
+still running at the edge of a piece can come back again, so only those are
+remembered, and forgotten once we are past the piece they ended in.
+
+@return A generator of records, split on '|'
+"""
+def sharded_stream(command, starttime, SHARDS, JOBID, END):
+    now   = int(time.time())
+    width = max(1, (now - int(starttime)) // SHARDS)
+
+    # The edges of each shard.  The last one always runs until now.
+    EDGES = [int(starttime) + (width * shard) for shard in range(SHARDS)] + [now]
+    ENDS  = [cache.slurm_time(edge) for edge in EDGES[1:-1]] + ['now']
+
+    QUEUES = [queue.Queue(SHARD_QUEUE) for shard in range(SHARDS)]
+    STOP   = threading.Event()
+
+    def run_shard(shard):
+        records = stream(command + cache.slurm_time(EDGES[shard]) + ' --endtime=' + ENDS[shard])
+        try:
+            for record in records:
+                if STOP.is_set():
+                    break
+                QUEUES[shard].put(record)
+        finally:
+            records.close()
+            QUEUES[shard].put(None)
+
+    # JobID -> End of every job we handed back that could come back again
+    seen = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(SHARDS, MAX_WORKERS)) as executor:
+        FUTURES = [executor.submit(run_shard, shard) for shard in range(SHARDS)]
+        try:
+            for shard in range(SHARDS):
+                # Jobs that ended before this piece started can not be in it
+                for jobid in [jobid for (jobid, end) in seen.items() if end and end < EDGES[shard]]:
+                    del seen[jobid]
+
+                edge = EDGES[shard + 1]
+                for record in iter(QUEUES[shard].get, None):
+                    jobid = record[JOBID]
+                    if jobid in seen:
+                        continue
+                    end = columnar.parse_time(record[END])
+                    if not end or end >= edge:
+                        seen[jobid] = end
+                    yield record
+
+                # Raises whatever went wrong running this piece
+                FUTURES[shard].result()
+        finally:
+            # Let every sacct still running finish up, should we stop early
+            STOP.set()
+            for future in FUTURES:
+                future.cancel()
+            for SHARD_RECORDS in QUEUES:
+                while not SHARD_RECORDS.empty():
+                    SHARD_RECORDS.get_nowait()
+
+
+"""
+construct_date(LAST_WEEK, YESTERDAY, DAYS)
+
+@param LAST_WEEK - Do we want the past 7 days
+@param YESTERDAY - Do we want the past 24 hours
+@param DAYS      - Or any other amount of days
+
+Our way of taking canned date parameters and formatting it so that Slurm can
+accept.  Without either, we want the past 12 hours.
+
+@return DATE_STRING
+"""
+def construct_date(LAST_WEEK=False, YESTERDAY=False, DAYS=None):
+    if DAYS:
+        timestamp = datetime.datetime.now() - datetime.timedelta(days = DAYS)
+    elif LAST_WEEK:
+        timestamp = datetime.datetime.now() - datetime.timedelta(days = 7)
+    elif YESTERDAY:
+        timestamp = datetime.datetime.now() - datetime.timedelta(days = 1)
+    else:
+        timestamp = datetime.datetime.now() - datetime.timedelta(hours = 12)
+
+    return timestamp.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+"""
+window_name(LAST_WEEK, YESTERDAY)
+
+@return What to call the canned window construct_date() works out, 'week',
+        'day' or '12h'
+"""
+def window_name(LAST_WEEK=False, YESTERDAY=False):
+    if LAST_WEEK:
+        return 'week'
+    elif YESTERDAY:
+        return 'day'
+    return '12h'
+
+
+"""
+SacctQuery(REPORTS, cluster)
+
+@param REPORTS - The reports we want to feed from a single sacct query
+@param cluster - Ask sacct -M about this cluster, rather than our own
+
+Works out the union of every report's FIELDS, and binds each report to where
+its fields are within a record.  If every report only wants the same STATES,
+sacct filters on them for us, otherwise the filtering is done per report.
+"""
+class SacctQuery(object):
+
+    def __init__(self, REPORTS, cluster=None):
+        self.reports = list(REPORTS)
+        self.cluster = cluster
+
+        self.fields = list(KEY_FIELDS)
+        for report in self.reports:
+            for field in report.FIELDS:
+                if field not in self.fields:
+                    self.fields.append(field)
+        if 'State' not in self.fields:
+            self.fields.append('State')
+        self.index = dict((field, index) for (index, field) in enumerate(self.fields))
+
+        STATES = set(report.STATES for report in self.reports)
+        if len(STATES) == 1:
+            self.states = STATES.pop()
+        else:
+            self.states = None
+
+        for report in self.reports:
+            report.bind(self.index)
+
+    """
+    command()
+
+    @return Our sacct command, up to and including --starttime=
+    """
+    def command(self):
+        COMMAND = SACCT_BIN + ' ' + SACCT_OPTIONS
+        if self.cluster:
+            COMMAND += ' --clusters=' + self.cluster
+        COMMAND += ' --format=' + ','.join(self.fields)
+        if self.states:
+            COMMAND += ' --state=' + ','.join(self.states)
+        return COMMAND + ' --starttime='
+
+    """
+    records(starttime, CACHE_DIR, SHARDS, SOURCE)
+
+    @param starttime - Start of our window, as given to sacct
+    @param CACHE_DIR - Directory of the cache to use, or None to always ask
+                       sacct for the whole window
+    @param SHARDS    - Split whatever we ask sacct for into this many
+                       concurrent queries, see sharded_stream()
+    @param SOURCE    - A slurmdbd.JobDatabase, jobcomp.JobCompLog or
+                       archive.ArchiveReader to read instead of running sacct
+
+    @return An iterable of records, split on '|'
+    """
+    def records(self, starttime, CACHE_DIR=None, SHARDS=1, SOURCE=None):
+        COMMAND = self.command()
+        STARTTIME_EPOCH = columnar.parse_time(starttime)
+
+        def run_query(query_start):
+            if SOURCE is not None:
+                return SOURCE.records(self.fields, self.states, columnar.parse_time(query_start))
+            if SHARDS > 1 and STARTTIME_EPOCH:
+                return sharded_stream(COMMAND, columnar.parse_time(query_start), SHARDS, self.index['JobID'], self.index['End'])
+            return stream(COMMAND + str(query_start) + ' --endtime=now')
+
+        if CACHE_DIR is None or not STARTTIME_EPOCH:
+            return run_query(starttime)
+
+        # Each source keeps its own cache, even for the same fields
+        KEY = COMMAND
+        if SOURCE is not None:
+            KEY += ' ' + SOURCE.key()
+
+        SACCT_CACHE = cache.SacctCache(CACHE_DIR, KEY, self.index['JobID'], self.index['End'])
+
+        return SACCT_CACHE.fetch(STARTTIME_EPOCH, run_query)
+
+    """
+    run(starttime, CACHE_DIR, SHARDS, SOURCE, PROFILER)
+
+    Fetches our records and fans each one out to every report that wants it,
+    then lets every report finish up.  Given a timing.Profiler, each of those
+    is timed as its own stage.
+
+    @return The amount of records we read
+    """
+    def run(self, starttime, CACHE_DIR=None, SHARDS=1, SOURCE=None, PROFILER=None):
+        STATE = self.index['State']
+        FILTERED = [report for report in self.reports if report.STATES and report.STATES != self.states]
+        UNFILTERED = [report for report in self.reports if report not in FILTERED]
+
+        RECORDS = self.records(starttime, CACHE_DIR, SHARDS, SOURCE)
+        if PROFILER is not None:
+            RECORDS = PROFILER.split(RECORDS, 'sacct + parse', 'reports add')
+
+        count = 0
+        for record in RECORDS:
+            count += 1
+            for report in UNFILTERED:
+                report.add(record)
+            for report in FILTERED:
+                if record[STATE] in report.STATES:
+                    report.add(record)
+
+        if PROFILER is not None:
+            with PROFILER.stage('reports finish', count):
+                for report in self.reports:
+                    report.finish()
+        else:
+            for report in self.reports:
+                report.finish()
+
+        return count
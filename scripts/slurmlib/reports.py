@@ -0,0 +1,468 @@
+"""
+reports - The calculations behind each of the stats scripts.
+
+Each report names the sacct fields it needs (FIELDS), and optionally the only
+job states it cares about (STATES).  A SacctQuery asks sacct for the union of
+every report's fields once, binds each report to where its fields landed, and
+hands every record to every report.  So sstats, node_stats and partition_stats
+can all be answered from one trip to slurmdbd.
+
+Every report has the same life cycle:
+
+    bind(INDEX)   -> INDEX is field name -> position within a record
+    add(record)   -> called once per record
+    finish()      -> called once all records have been added
+
+@Version 1.0
+"""
+
+### Import commands
+import collections
+import heapq
+import operator
+import time
+
+from slurmlib import aggregate
+from slurmlib import columnar
+from slurmlib import histogram
+from slurmlib import hostlist
+from slurmlib import series
+from slurmlib import sketch
+from slurmlib import utilization
+
+
+"""
+rate(part, whole)
+
+@return part as a percentage of whole, or 0 when whole is 0
+"""
+def rate(part, whole):
+    if not whole:
+        return 0
+    return (part / whole) * 100
+
+
+"""
+JobReport()
+
+Job state totals, success/failure rates and the most common user, group and
+exit code.  What sstats reports on.
+"""
+class JobReport(object):
+
+    FIELDS = ['JobID', 'User', 'Account', 'State', 'ExitCode']
+    STATES = None
+
+    def __init__(self):
+        # Dimension -> sacct field, counted over failed jobs only
+        self.failures = {
+            'USERS' : 'User',
+            'GROUPS': 'Account',
+            'EXIT'  : 'ExitCode'
+        }
+
+    """
+    count_failures(FAILURES)
+
+    @param FAILURES - Dictionary of dimension -> sacct field
+
+    Also counts these dimensions over failed jobs, as 'FAILED_<name>' in our
+    tally.  Must be called before we are bound.
+    """
+    def count_failures(self, FAILURES):
+        self.failures.update(FAILURES)
+
+    def bind(self, INDEX):
+        COLUMNS = {
+            'USERS' : INDEX['User'],
+            'GROUPS': INDEX['Account'],
+            'STATE' : INDEX['State'],
+            'EXIT'  : INDEX['ExitCode']
+        }
+
+        # Who & what failed the most is only counted over failed jobs
+        self.tally = aggregate.JobTally(COLUMNS, dict((name, INDEX[field]) for (name, field) in self.failures.items()))
+
+    def add(self, record):
+        self.tally.add(record)
+
+    """
+    update(other)
+
+    Adds in everything another bound JobReport counted, e.g. another
+    cluster's, before we finish().
+    """
+    def update(self, other):
+        self.tally.update(other.tally)
+
+    def finish(self):
+        TOTALS = self.tally.state_totals()
+
+        self.total      = self.tally.total
+        self.running    = TOTALS['RUNNING']
+        self.eligible   = TOTALS['PENDING']
+        self.completed  = TOTALS['COMPLETED']
+        self.cancelled  = TOTALS['CANCELLED']
+        self.timeout    = TOTALS['TIMEOUT']
+        self.failed     = TOTALS['FAILED']
+
+        # We want to compare rates based on the sum of finished jobs
+        self.comparison_total = self.failed + self.completed
+        self.fail_rate  = rate(self.failed, self.comparison_total)
+        self.comp_rate  = rate(self.completed, self.comparison_total)
+
+        self.user_fail  = self.tally.most_frequent('FAILED_USERS')
+        self.group_fail = self.tally.most_frequent('FAILED_GROUPS')
+        self.exit_fail  = self.tally.most_frequent('FAILED_EXIT')
+        self.e1_fail    = self.tally.count('EXIT', '1:0')
+        self.e7_fail    = self.tally.count('EXIT', '7:0')
+
+
+"""
+FailureReport(JOB_REPORT)
+
+@param JOB_REPORT - The JobReport fed from the same query, whose tally we read
+
+Drills into failed jobs only: which users, accounts, exit codes, nodes and
+partitions they came from.  We count nothing ourselves, but have JOB_REPORT
+count nodes & partitions of failed jobs along with its failed users, accounts
+and exit codes.  The top-k tables themselves are only worked out when asked
+for, with a heap of k items.  What sstats -f adds.
+"""
+class FailureReport(object):
+
+    FIELDS = ['NodeList', 'Partition']
+    STATES = None
+
+    # What each dimension is called when we print it
+    DIMENSIONS = [
+        ('USERS',      'User'),
+        ('GROUPS',     'Account'),
+        ('EXIT',       'Exit code'),
+        ('NODES',      'Node'),
+        ('PARTITIONS', 'Partition'),
+    ]
+
+    def __init__(self, JOB_REPORT):
+        self.job_report = JOB_REPORT
+        JOB_REPORT.count_failures({
+            'NODES'      : 'NodeList',
+            'PARTITIONS' : 'Partition'
+        })
+
+    def bind(self, INDEX):
+        pass
+
+    def add(self, record):
+        pass
+
+    """
+    update(other)
+
+    Our JobReport adds in the other's counts, so there is nothing left for us.
+    """
+    def update(self, other):
+        pass
+
+    def finish(self):
+        self.tally = self.job_report.tally
+        self.total = self.tally.state_totals()['FAILED']
+        self.tops  = {}
+
+    """
+    top(dimension, k)
+
+    @param dimension - One of DIMENSIONS
+    @param k         - How many we want
+
+    Nodes are counted per NodeList, and only expanded here, so a multi node
+    job counts against each of its nodes.
+
+    @return List of (item, failed jobs) tuples, most failures first
+    """
+    def top(self, dimension, k=5):
+        if (dimension, k) not in self.tops:
+            if dimension == 'NODES':
+                COUNTS = collections.Counter()
+                for (nodelist, count) in self.tally.counts['FAILED_NODES'].items():
+                    for node in hostlist.expand(nodelist):
+                        COUNTS[node] += count
+                self.tops[(dimension, k)] = heapq.nlargest(k, COUNTS.items(), key=operator.itemgetter(1))
+            else:
+                self.tops[(dimension, k)] = self.tally.top('FAILED_' + dimension, k)
+        return self.tops[(dimension, k)]
+
+
+"""
+NodeReport(edges)
+
+@param edges        - Upper edges of the job duration buckets, in seconds.
+                      The SUMMARY_EDGES are always added.
+@param window_start - Epoch seconds our window starts at, for utilization
+
+Per node and per partition job counts and durations of completed jobs.  Multi
+node jobs are credited to every node they ran on.  Utilization is worked out
+from every job that started, whatever its state, so a node busy with jobs
+that failed or are still running does not look idle.  What node_stats reports
+on.
+"""
+class NodeReport(object):
+
+    FIELDS = ['JobID', 'User', 'Account', 'State', 'ExitCode', 'Start', 'End', 'NodeList', 'ElapsedRaw', 'Partition', 'AllocCPUS']
+    STATES = None
+
+    # The jobs our counts & durations are of
+    COMPLETED = 'COMPLETED'
+
+    # Buckets node_stats always reports on, <1min, <30min & <1hr
+    SUMMARY_EDGES = [60, 1800, 3600]
+
+    def __init__(self, edges=histogram.DEFAULT_EDGES, window_start=None):
+        self.edges = list(edges) + self.SUMMARY_EDGES
+        self.window_start = window_start
+
+    def bind(self, INDEX):
+        self.jobs = columnar.JobStore([
+            ('JOBID',       INDEX['JobID'],      columnar.TEXT),
+            ('USERS',       INDEX['User'],       columnar.CATEGORY),
+            ('GROUPS',      INDEX['Account'],    columnar.CATEGORY),
+            ('STATE',       INDEX['State'],      columnar.CATEGORY),
+            ('EXIT',        INDEX['ExitCode'],   columnar.EXIT),
+            ('START',       INDEX['Start'],      columnar.TIME),
+            ('END',         INDEX['End'],        columnar.TIME),
+            ('NODES',       INDEX['NodeList'],   columnar.CATEGORY),
+            ('ELAPSED_RAW', INDEX['ElapsedRaw'], columnar.INT),
+            ('PARTITIONS',  INDEX['Partition'],  columnar.CATEGORY),
+            ('CPUS',        INDEX['AllocCPUS'],  columnar.INT),
+        ])
+        self.tally = aggregate.JobTally({
+            'USERS'      : INDEX['User'],
+            'GROUPS'     : INDEX['Account'],
+            'STATE'      : INDEX['State'],
+            'EXIT'       : INDEX['ExitCode'],
+            'NODES'      : INDEX['NodeList'],
+            'PARTITIONS' : INDEX['Partition']
+        })
+
+        # Every job that started, for utilization only
+        self.started = columnar.JobStore([
+            ('START',       INDEX['Start'],      columnar.TIME),
+            ('END',         INDEX['End'],        columnar.TIME),
+            ('NODES',       INDEX['NodeList'],   columnar.CATEGORY),
+            ('PARTITIONS',  INDEX['Partition'],  columnar.CATEGORY),
+            ('CPUS',        INDEX['AllocCPUS'],  columnar.INT),
+        ])
+        self.state_index = INDEX['State']
+        self.start_index = INDEX['Start']
+
+    def add(self, record):
+        if record[self.state_index] == self.COMPLETED:
+            self.jobs.add(record)
+            self.tally.add(record)
+        if columnar.parse_time(record[self.start_index]):
+            self.started.add(record)
+
+    def finish(self):
+        self.durations = histogram.DurationHistogram(self.jobs, self.edges)
+        self.nodes     = hostlist.NodeIndex(self.jobs)
+        self.usage     = utilization.Utilization(self.started, self.window_start, time.time())
+
+
+"""
+PartitionReport()
+
+Throughput of each partition: how many jobs finished, how many of those
+completed or failed, and how many hours of wall time went through it.  What
+partition_stats reports on.
+"""
+class PartitionReport(object):
+
+    FIELDS = ['State', 'ElapsedRaw', 'Partition']
+    STATES = None
+
+    def bind(self, INDEX):
+        self.state_index     = INDEX['State']
+        self.elapsed_index   = INDEX['ElapsedRaw']
+        self.partition_index = INDEX['Partition']
+        self.states  = collections.Counter()
+        self.elapsed = collections.Counter()
+        self.jobs    = collections.Counter()
+
+    def add(self, record):
+        partition = record[self.partition_index]
+        self.jobs[partition] += 1
+        self.states[(partition, record[self.state_index])] += 1
+        self.elapsed[partition] += columnar.parse_int(record[self.elapsed_index])
+
+    def finish(self):
+        self.partitions = sorted(self.jobs)
+
+    """
+    state_totals(partition)
+
+    @return Dictionary of state -> amount of jobs within partition, the same
+            way JobTally.state_totals() works them out
+    """
+    def state_totals(self, partition):
+        TOTALS = dict((state, self.states[(partition, state)]) for state in aggregate.NON_FAILED_STATES)
+        TOTALS['CANCELLED'] += sum(count for ((name, state), count) in self.states.items() if name == partition and state.startswith('CANCELLED by'))
+        TOTALS['FAILED'] = self.jobs[partition] - sum(TOTALS.values())
+        return TOTALS
+
+    """
+    hours(partition)
+
+    @return Wall clock hours used by jobs within partition
+    """
+    def hours(self, partition):
+        return self.elapsed[partition] / 3600
+
+
+"""
+SeriesReport(width, window_start)
+
+@param width        - Seconds per bucket
+@param window_start - Epoch seconds our window starts at.  If None, the
+                      earliest Submit is used.
+
+Jobs submitted, started, completed, failed and running in each bucket of our
+window.  What sstats --series reports on.
+"""
+class SeriesReport(object):
+
+    FIELDS = ['JobID', 'State', 'Submit', 'Start', 'End']
+    STATES = None
+
+    def __init__(self, width=3600, window_start=None):
+        self.width = width
+        self.window_start = window_start
+
+    def bind(self, INDEX):
+        self.jobs = columnar.JobStore([
+            ('STATE',  INDEX['State'],  columnar.CATEGORY),
+            ('SUBMIT', INDEX['Submit'], columnar.TIME),
+            ('START',  INDEX['Start'],  columnar.TIME),
+            ('END',    INDEX['End'],    columnar.TIME),
+        ])
+
+    def add(self, record):
+        self.jobs.add(record)
+
+    def finish(self):
+        window_start = self.window_start
+        if window_start is None:
+            window_start = min([submit for submit in self.jobs.column('SUBMIT') if submit] or [int(time.time())])
+        self.series = series.ThroughputSeries(self.jobs, window_start, int(time.time()), self.width)
+
+
+"""
+WaitReport(accuracy)
+
+@param accuracy - Relative accuracy of every percentile, see sketch.py
+
+Queue wait, Start minus Submit, of every job that has started, as a
+QuantileSketch for all jobs and for each partition, QOS, account and job size.
+Memory stays the same however many jobs we read, and reports of several
+clusters or shards combine exactly with update().  What sstats --wait reports
+on.
+"""
+class WaitReport(object):
+
+    FIELDS = ['JobID', 'Submit', 'Start', 'Partition', 'QOS', 'Account', 'AllocCPUS']
+    STATES = None
+
+    # What each dimension is called when we print it
+    DIMENSIONS = [
+        ('PARTITIONS', 'Partition'),
+        ('QOS',        'QOS'),
+        ('ACCOUNTS',   'Account'),
+        ('SIZES',      'Job size (CPUs)'),
+    ]
+
+    # The percentiles we report
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    # Upper edges of each job size, in CPUs
+    SIZE_EDGES = [1, 16, 128, 1024]
+
+    def __init__(self, accuracy=sketch.DEFAULT_ACCURACY):
+        self.accuracy = accuracy
+
+        self.size_labels = []
+        lower = 1
+        for edge in self.SIZE_EDGES:
+            self.size_labels.append(str(edge) if edge == lower else str(lower) + '-' + str(edge))
+            lower = edge + 1
+        self.size_labels.append('>' + str(self.SIZE_EDGES[-1]))
+
+    def bind(self, INDEX):
+        self.submit_index = INDEX['Submit']
+        self.start_index  = INDEX['Start']
+        self.cpus_index   = INDEX['AllocCPUS']
+        self.columns = [
+            ('PARTITIONS', INDEX['Partition']),
+            ('QOS',        INDEX['QOS']),
+            ('ACCOUNTS',   INDEX['Account']),
+        ]
+        self.all = sketch.QuantileSketch(self.accuracy)
+        self.sketches = dict((dimension, collections.defaultdict(self.new_sketch)) for (dimension, title) in self.DIMENSIONS)
+
+    def new_sketch(self):
+        return sketch.QuantileSketch(self.accuracy)
+
+    """
+    size(cpus)
+
+    @return The job size label cpus falls into, e.g. '17-128'
+    """
+    def size(self, cpus):
+        for (index, edge) in enumerate(self.SIZE_EDGES):
+            if cpus <= edge:
+                return self.size_labels[index]
+        return self.size_labels[-1]
+
+    def add(self, record):
+        start = columnar.parse_time(record[self.start_index])
+        submit = columnar.parse_time(record[self.submit_index])
+        if not start or not submit:
+            return
+
+        wait = max(start - submit, 0)
+        self.all.add(wait)
+        for (dimension, index) in self.columns:
+            self.sketches[dimension][record[index]].add(wait)
+        self.sketches['SIZES'][self.size(int(record[self.cpus_index] or 0))].add(wait)
+
+    """
+    update(other)
+
+    Adds in every wait another bound WaitReport counted, e.g. another
+    cluster's, before we finish().
+    """
+    def update(self, other):
+        self.all.update(other.all)
+        for (dimension, SKETCHES) in other.sketches.items():
+            for (item, other_sketch) in SKETCHES.items():
+                self.sketches[dimension][item].update(other_sketch)
+
+    def finish(self):
+        self.total = self.all.count
+
+    """
+    percentiles(dimension)
+
+    @param dimension - One of DIMENSIONS, or None for all jobs
+
+    @return List of (item, jobs, [wait at each of QUANTILES]) tuples, job sizes
+            smallest first and everything else by name
+    """
+    def percentiles(self, dimension=None):
+        if dimension is None:
+            return [('all', self.all.count, [self.all.quantile(q) for q in self.QUANTILES])]
+
+        SKETCHES = self.sketches[dimension]
+        if dimension == 'SIZES':
+            ITEMS = [label for label in self.size_labels if label in SKETCHES]
+        else:
+            ITEMS = sorted(SKETCHES)
+        return [(item, SKETCHES[item].count, [SKETCHES[item].quantile(q) for q in self.QUANTILES]) for item in ITEMS]
@@ -0,0 +1,133 @@
+"""
+series - Job throughput over time, in fixed width buckets.
+
+Window wide totals tell us how many jobs failed, not when.  Here the window is
+cut into buckets (5m, 1h, 1d, ...) and for each bucket we count the jobs that
+were submitted, started, completed, failed, and running within it.
+
+Every job lands in its Submit, Start and End bucket with a single integer
+division, so the jobs are walked once no matter how many buckets there are.
+Running jobs are then one sweep over the buckets: what was running when the
+bucket began, plus whatever started during it.
+
+The series is written as CSV or JSON so it can go straight into our graphs.
+
+@Version 1.0
+"""
+
+### Import commands
+import array
+import collections
+import csv
+import json
+import time
+
+from slurmlib import aggregate
+
+
+# What each bucket reports, in the order the columns are written
+COLUMNS = ['bucket', 'submitted', 'started', 'completed', 'failed', 'running']
+
+# Formats write() knows about
+FORMATS = ('csv', 'json')
+
+
+"""
+ThroughputSeries(JOBS, window_start, window_end, width)
+
+@param JOBS         - The JobStore holding our jobs.  Needs STATE, SUBMIT,
+                      START and END columns.
+@param window_start - Epoch seconds our window starts at
+@param window_end   - Epoch seconds our window ends at
+@param width        - Seconds per bucket
+
+Buckets are lined up on multiples of width, so hourly buckets start on the
+hour no matter when we were run.
+"""
+class ThroughputSeries(object):
+
+    def __init__(self, JOBS, window_start, window_end, width):
+        self.width  = width
+        self.origin = window_start - (window_start % width)
+        self.size   = max(((window_end - self.origin) // width) + 1, 1)
+
+        self.submitted = array.array('l', [0]) * self.size
+        self.started   = array.array('l', [0]) * self.size
+        self.completed = array.array('l', [0]) * self.size
+        self.failed    = array.array('l', [0]) * self.size
+        self.ended     = array.array('l', [0]) * self.size
+        self.running   = array.array('l', [0]) * self.size
+
+        COMPLETED = JOBS.code('STATE', 'COMPLETED')
+        FAILED    = set(code for (code, state) in enumerate(JOBS.labels['STATE']) if aggregate.is_failed(state))
+
+        # Jobs that were already running when our first bucket began
+        already = 0
+
+        STATES = JOBS.column('STATE')
+        STARTS = JOBS.column('START')
+        ENDS   = JOBS.column('END')
+        for (row, submit) in enumerate(JOBS.column('SUBMIT')):
+            self.count(self.submitted, submit)
+            start = STARTS[row]
+            end   = ENDS[row]
+
+            if start:
+                if start < self.origin:
+                    if not end or end >= self.origin:
+                        already += 1
+                else:
+                    self.count(self.started, start)
+
+            if end:
+                if STATES[row] == COMPLETED:
+                    self.count(self.completed, end)
+                elif STATES[row] in FAILED:
+                    self.count(self.failed, end)
+                if start and end >= self.origin:
+                    self.count(self.ended, end)
+
+        # Running within a bucket is whatever was running as it began, plus
+        # whatever started during it
+        active = already
+        for bucket in range(self.size):
+            self.running[bucket] = active + self.started[bucket]
+            active += self.started[bucket] - self.ended[bucket]
+
+    """
+    count(COUNTS, when)
+
+    Adds one to the bucket when falls into, if it is inside our window.
+    """
+    def count(self, COUNTS, when):
+        bucket = (when - self.origin) // self.width
+        if 0 <= bucket < self.size:
+            COUNTS[bucket] += 1
+
+    """
+    rows()
+
+    @return List of Lists, one per bucket, in the order of COLUMNS.  Each
+            bucket is named by the local time it begins at.
+    """
+    def rows(self):
+        ROWS = []
+        for bucket in range(self.size):
+            begins = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.origin + bucket * self.width))
+            ROWS.append([begins, self.submitted[bucket], self.started[bucket], self.completed[bucket], self.failed[bucket], self.running[bucket]])
+        return ROWS
+
+    """
+    write(stream, form)
+
+    @param stream - Where to write the series, e.g. sys.stdout
+    @param form   - 'csv' or 'json'
+    """
+    def write(self, stream, form='csv'):
+        if form == 'json':
+            json.dump([collections.OrderedDict(zip(COLUMNS, row)) for row in self.rows()], stream, indent=1)
+            stream.write('\n')
+        else:
+            WRITER = csv.writer(stream, lineterminator='\n')
+            WRITER.writerow(COLUMNS)
+            WRITER.writerows(self.rows())
@@ -0,0 +1,87 @@
+"""
+sketch - Percentiles of a stream of values in constant memory.
+
+Sorting every queue wait to find its p99 means holding a week of jobs in
+memory.  A QuantileSketch instead counts each value in a logarithmic bucket,
+bucket i holding everything between gamma^(i-1) and gamma^i, where
+
+    gamma = (1 + accuracy) / (1 - accuracy)
+
+Any percentile it gives back is then within accuracy (1% by default) of the
+true value, relative to that value.  A month of waits in seconds needs well
+under a thousand buckets however many jobs there are.
+
+Two sketches with the same accuracy merge by adding their bucket counts, so
+the sketch of several shards, clusters or cached fetches put together is
+exactly the sketch we would have got from all of their jobs at once.
+
+@Version 1.0
+"""
+
+### Import commands
+import collections
+import math
+
+
+# Relative accuracy of every percentile we give back, unless told otherwise
+DEFAULT_ACCURACY = 0.01
+
+
+"""
+QuantileSketch(accuracy)
+
+@param accuracy - Relative accuracy of each percentile, e.g. 0.01 for 1%
+
+Counts values of 0 or more.  Anything under 1 counts as 0.
+"""
+class QuantileSketch(object):
+
+    def __init__(self, accuracy=DEFAULT_ACCURACY):
+        self.accuracy  = accuracy
+        self.gamma     = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets   = collections.Counter()
+        self.zeros     = 0
+        self.count     = 0
+
+    def add(self, value):
+        self.count += 1
+        if value < 1:
+            self.zeros += 1
+        else:
+            self.buckets[int(math.ceil(math.log(value) / self.log_gamma))] += 1
+
+    """
+    update(other)
+
+    @param other - Another QuantileSketch with the same accuracy
+
+    Adds every value of other into this sketch.
+    """
+    def update(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError('Can not merge sketches of accuracy ' + str(self.accuracy) + ' and ' + str(other.accuracy))
+        self.count += other.count
+        self.zeros += other.zeros
+        self.buckets.update(other.buckets)
+
+    """
+    quantile(q)
+
+    @param q - Between 0 and 1, e.g. 0.99 for the p99
+
+    @return The value at q, or 0 if we have seen nothing
+    """
+    def quantile(self, q):
+        rank = q * (self.count - 1)
+        if not self.count or rank < self.zeros:
+            return 0
+
+        seen = self.zeros
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                break
+
+        # The middle of the bucket, in relative terms
+        return 2 * self.gamma ** index / (self.gamma + 1)
@@ -0,0 +1,314 @@
+"""
+slurmdbd - Read jobs straight out of the slurmdbd database, rather than sacct.
+
+sacct asks slurmdbd, which asks MySQL, and then every row is formatted as text
+for us to split apart again.  For big windows most of our time goes there.
+A JobDatabase instead reads <cluster>_job_table in slurm_acct_db itself, with
+a server side cursor so rows come over fetchmany() at a time, and hands back
+records in exactly the shape sacct --parsable2 would have.  So every report
+is fed the same way no matter where the records came from.
+
+This is read only, and needs PyMySQL (installed by the slurmdbd ansible role)
+and credentials from ~/.my.cnf.  Any DB-API connection with the same table
+works, so a SQLite fixture loaded from a dump (see devel/slurmdbd_fixture.py)
+can stand in for MySQL.
+
+@Version 1.0
+"""
+
+### Import commands
+import os
+import pwd
+import sqlite3
+import time
+
+from slurmlib import cache
+from slurmlib import histogram
+
+try:
+    import pymysql
+    import pymysql.cursors
+except ImportError:
+    pymysql = None
+
+
+# Where slurmdbd keeps its tables, see slurmdbd.conf
+DEFAULT_HOST     = 'slurmdbd01'
+DEFAULT_DATABASE = 'slurm_acct_db'
+DEFAULT_CLUSTER  = 'batch'
+OPTION_FILE      = os.path.expanduser('~/.my.cnf')
+
+# Rows we pull over the wire at once
+BATCH_SIZE = 5000
+
+# Job states as slurmdbd stores them, the low byte of the state column
+STATES = ['PENDING', 'RUNNING', 'SUSPENDED', 'COMPLETED', 'CANCELLED', 'FAILED',
+          'TIMEOUT', 'NODE_FAIL', 'PREEMPTED', 'BOOT_FAIL', 'DEADLINE', 'OUT_OF_MEMORY']
+STATE_MASK = 0xff
+
+# TRES ids Slurm always gives the same meaning
+TRES_NAMES = {1: 'cpu', 2: 'mem', 3: 'energy', 4: 'node', 5: 'billing'}
+
+# What slurmdbd stores in an unset unsigned column
+NO_VALUE = 4294967294
+
+# The job_table columns behind each sacct field we know how to answer
+COLUMNS = {
+    'JobID'     : ['id_job', 'id_array_job', 'id_array_task'],
+    'User'      : ['id_user'],
+    'Account'   : ['account'],
+    'State'     : ['state', 'kill_requid'],
+    'ExitCode'  : ['exit_code'],
+    'Submit'    : ['time_submit'],
+    'Start'     : ['time_start'],
+    'End'       : ['time_end'],
+    'Elapsed'   : ['time_start', 'time_end'],
+    'ElapsedRaw': ['time_start', 'time_end'],
+    'NodeList'  : ['nodelist'],
+    'Partition' : ['`partition`'],
+    'AllocCPUS' : ['tres_alloc'],
+    'NNodes'    : ['nodes_alloc'],
+    'QOS'       : ['id_qos'],
+    'AllocTRES' : ['tres_alloc'],
+    'Priority'  : ['priority'],
+}
+
+
+"""
+connect(path)
+
+@param path - A SQLite fixture to read, or None for the real slurmdbd MySQL
+
+@return A DB-API connection
+"""
+def connect(path=None):
+    if path:
+        return sqlite3.connect(path)
+
+    if pymysql is None:
+        print('PyMySQL is needed to read slurmdbd directly.  Is this the slurmdbd host?')
+        raise SystemExit(1)
+
+    return pymysql.connect(host=DEFAULT_HOST, database=DEFAULT_DATABASE, read_default_file=OPTION_FILE, cursorclass=pymysql.cursors.SSCursor)
+
+
+"""
+format_time(epoch)
+
+@return epoch the way sacct prints it, or 'Unknown' when it was never set
+"""
+def format_time(epoch):
+    if not epoch:
+        return 'Unknown'
+    return cache.slurm_time(epoch)
+
+
+"""
+format_tres(text)
+
+@param text - tres_alloc as slurmdbd stores it, e.g. '1=4,2=8000,4=1'
+
+@return The TRES the way sacct prints them, e.g. 'cpu=4,mem=8000M,node=1'
+"""
+def format_tres(text):
+    TRES = []
+    for item in (text or '').split(','):
+        (tres, _, count) = item.partition('=')
+        if not tres.isdigit():
+            continue
+        name = TRES_NAMES.get(int(tres), 'tres' + tres)
+        if name == 'mem':
+            count += 'M'
+        TRES.append(name + '=' + count)
+    return ','.join(TRES)
+
+
+"""
+tres_count(text, tres)
+
+@param text - tres_alloc as slurmdbd stores it, e.g. '1=4,2=8000,4=1'
+@param tres - The TRES id we want, e.g. 1 for cpu
+
+@return The count of that TRES, as text, or '0' if it was not allocated
+"""
+def tres_count(text, tres):
+    for item in (text or '').split(','):
+        (name, _, count) = item.partition('=')
+        if name == str(tres):
+            return count
+    return '0'
+
+
+"""
+JobDatabase(connection, cluster)
+
+@param connection - A DB-API connection to slurm_acct_db, see connect()
+@param cluster    - ClusterName from slurm.conf, which names the job table
+"""
+class JobDatabase(object):
+
+    def __init__(self, connection, cluster=DEFAULT_CLUSTER):
+        self.connection = connection
+        self.table      = cluster + '_job_table'
+        self.users      = {}
+        self.qos        = None
+
+        # PyMySQL wants %s, sqlite3 wants ?
+        if isinstance(connection, sqlite3.Connection):
+            self.placeholder = '?'
+        else:
+            self.placeholder = '%s'
+
+    """
+    key()
+
+    @return What tells our jobs apart from those of any other source, for the
+            cache: the fixture file or MySQL database, and our job table
+    """
+    def key(self):
+        if isinstance(self.connection, sqlite3.Connection):
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute('PRAGMA database_list')
+                where = cursor.fetchone()[2]
+            finally:
+                cursor.close()
+        else:
+            where = DEFAULT_HOST + '/' + DEFAULT_DATABASE
+        return 'slurmdbd ' + where + ' ' + self.table
+
+    """
+    user(uid)
+
+    @return The user name behind uid, or the uid itself if we have no such user
+    """
+    def user(self, uid):
+        name = self.users.get(uid)
+        if name is None:
+            try:
+                name = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                name = str(uid)
+            self.users[uid] = name
+        return name
+
+    """
+    load_qos()
+
+    Reads all of qos_table into a dictionary.  This has to happen before the
+    job query starts, as a server side cursor must be read to the end before
+    anything else is asked of the connection.
+    """
+    def load_qos(self):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute('SELECT id, name FROM qos_table')
+            self.qos = dict(cursor.fetchall())
+        finally:
+            cursor.close()
+
+    """
+    qos_name(id_qos)
+
+    @return The name of a QOS, see load_qos()
+    """
+    def qos_name(self, id_qos):
+        return self.qos.get(id_qos, str(id_qos))
+
+    """
+    select(fields, WANTED)
+
+    @return The SQL to fetch the columns behind fields, and the List of
+            columns it returns, in order
+    """
+    def select(self, fields, WANTED=None):
+        SELECTED = []
+        for field in fields:
+            if field not in COLUMNS:
+                raise ValueError('slurmdbd can not answer sacct field ' + field)
+            for column in COLUMNS[field]:
+                if column not in SELECTED:
+                    SELECTED.append(column)
+
+        # The same jobs sacct --starttime=X --endtime=now would give us
+        SQL = 'SELECT ' + ', '.join(SELECTED) + ' FROM ' + self.table
+        SQL += ' WHERE deleted = 0 AND (time_end = 0 OR time_end >= ' + self.placeholder + ')'
+        if WANTED:
+            SQL += ' AND (state & ' + str(STATE_MASK) + ') IN (' + ', '.join(str(STATES.index(state)) for state in WANTED) + ')'
+
+        return (SQL, [column.strip('`') for column in SELECTED])
+
+    """
+    format(field, row, now)
+
+    @param field - The sacct field we want
+    @param row   - Dictionary of column -> value for a single job
+    @param now   - Epoch seconds, for how long running jobs have run
+
+    @return The field formatted the way sacct --parsable2 prints it
+    """
+    def format(self, field, row, now):
+        if field == 'JobID':
+            if row['id_array_task'] not in (None, NO_VALUE):
+                return str(row['id_array_job']) + '_' + str(row['id_array_task'])
+            return str(row['id_job'])
+        elif field == 'User':
+            return self.user(row['id_user'])
+        elif field == 'State':
+            state = STATES[row['state'] & STATE_MASK]
+            if state == 'CANCELLED' and row['kill_requid'] not in (None, -1, NO_VALUE + 1):
+                state += ' by ' + str(row['kill_requid'])
+            return state
+        elif field == 'ExitCode':
+            status = row['exit_code'] or 0
+            return str((status >> 8) & 0xff) + ':' + str(status & 0x7f)
+        elif field in ('Submit', 'Start', 'End'):
+            return format_time(row['time_' + field.lower()])
+        elif field in ('Elapsed', 'ElapsedRaw'):
+            elapsed = 0
+            if row['time_start']:
+                elapsed = max((row['time_end'] or now) - row['time_start'], 0)
+            if field == 'Elapsed':
+                return histogram.format_elapsed(elapsed)
+            return str(elapsed)
+        elif field == 'QOS':
+            return self.qos_name(row['id_qos'])
+        elif field == 'AllocTRES':
+            return format_tres(row['tres_alloc'])
+        elif field == 'AllocCPUS':
+            return tres_count(row['tres_alloc'], 1)
+
+        value = row[COLUMNS[field][0].strip('`')]
+        if value is None:
+            return ''
+        return str(value)
+
+    """
+    records(fields, WANTED, starttime)
+
+    @param fields    - The sacct fields we want, in order
+    @param WANTED    - Only jobs in these states, or None for every job
+    @param starttime - Epoch seconds our window starts at
+
+    @return A generator of records, Lists of strings in the order of fields,
+            just like query.stream() gives back
+    """
+    def records(self, fields, WANTED, starttime):
+        (SQL, SELECTED) = self.select(fields, WANTED)
+        now = int(time.time())
+
+        if 'QOS' in fields and self.qos is None:
+            self.load_qos()
+
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(SQL, (int(starttime),))
+            while True:
+                ROWS = cursor.fetchmany(BATCH_SIZE)
+                if not ROWS:
+                    break
+                for values in ROWS:
+                    row = dict(zip(SELECTED, values))
+                    yield [self.format(field, row, now) for field in fields]
+        finally:
+            cursor.close()
@@ -0,0 +1,159 @@
+"""
+snapshot - What the queue and the nodes look like right now.
+
+sacct asks slurmdbd, which only hears about jobs after slurmctld tells it, and
+is the most expensive query we make.  For "what is happening now" we only need
+one squeue and one sinfo, each asked for just the columns we use:
+
+    squeue --all --noheader --format=%i|%P|%T|%V|%C
+    sinfo --noheader --format=%R|%T|%D
+
+Both are streamed through query.stream(), so only a line is held at a time.
+Per partition we keep the running & pending jobs, the CPUs pending jobs are
+waiting for, the oldest pending submit time, and how many nodes are idle,
+allocated or down.
+
+@Version 1.0
+"""
+
+### Import commands
+import collections
+import time
+
+from slurmlib import columnar
+from slurmlib import commands
+from slurmlib import query
+
+
+# The squeue & sinfo columns we ask for, as their --format letters
+SQUEUE_FORMAT = '%i|%P|%T|%V|%C'
+SINFO_FORMAT  = '%R|%T|%D'
+
+# What we count nodes as, for every sinfo state we know of
+NODE_STATES = {
+    'idle'       : 'idle',
+    'allocated'  : 'alloc',
+    'mixed'      : 'alloc',
+    'completing' : 'alloc',
+    'down'       : 'down',
+    'drained'    : 'down',
+    'draining'   : 'down',
+    'fail'       : 'down',
+    'failing'    : 'down',
+    'maint'      : 'down',
+    'unknown'    : 'down',
+}
+NODE_COLUMNS = ['idle', 'alloc', 'down', 'other']
+
+# Every number we keep per partition, in the order we print them
+COLUMNS = ['running', 'pending', 'pending_cpus', 'oldest_pending'] + NODE_COLUMNS
+
+
+"""
+node_state(state)
+
+@param state - A node state as sinfo %T prints it, e.g. 'idle', 'down*',
+               'allocated+'
+
+@return Which of NODE_COLUMNS the node counts as
+"""
+def node_state(state):
+    return NODE_STATES.get(state.rstrip('*~#!%$@^-+'), 'other')
+
+
+"""
+QueueSnapshot(now)
+
+@param now - Epoch seconds pending ages are counted to.  Default: now
+
+Add every squeue and sinfo record with add_job() and add_nodes(), or have
+take() run both.
+"""
+class QueueSnapshot(object):
+
+    def __init__(self, now=None):
+        self.now     = int(now or time.time())
+        self.counts  = collections.defaultdict(collections.Counter)
+        self.oldest  = {}
+        self.running = 0
+        self.pending = 0
+
+    def squeue_command(self):
+        return commands.path('squeue') + ' --all --noheader --format=' + SQUEUE_FORMAT
+
+    def sinfo_command(self):
+        return commands.path('sinfo') + ' --noheader --format=' + SINFO_FORMAT
+
+    """
+    add_job(record)
+
+    @param record - [JobID, Partitions, State, Submit, CPUs] from squeue
+
+    A pending job waiting on more than one partition is backlog for each of
+    them, but only counted once in our totals.
+    """
+    def add_job(self, record):
+        (jobid, partitions, state, submit, cpus) = record
+        if state == 'RUNNING':
+            self.running += 1
+            self.counts[partitions]['running'] += 1
+        elif state == 'PENDING':
+            self.pending += 1
+            submitted = columnar.parse_time(submit)
+            for partition in partitions.split(','):
+                COUNTS = self.counts[partition]
+                COUNTS['pending'] += 1
+                COUNTS['pending_cpus'] += int(cpus or 0)
+                if submitted and submitted < self.oldest.get(partition, self.now + 1):
+                    self.oldest[partition] = submitted
+
+    """
+    add_nodes(record)
+
+    @param record - [Partition, State, Nodes] from sinfo
+    """
+    def add_nodes(self, record):
+        (partition, state, nodes) = record
+        self.counts[partition][node_state(state)] += int(nodes)
+
+    """
+    take()
+
+    Runs squeue & sinfo once each, adding everything they print.
+
+    @return The amount of lines we read
+    """
+    def take(self):
+        count = 0
+        for record in query.stream(self.squeue_command()):
+            count += 1
+            self.add_job(record)
+        for record in query.stream(self.sinfo_command()):
+            count += 1
+            self.add_nodes(record)
+        return count
+
+    """
+    oldest_pending(partition)
+
+    @return Seconds the oldest pending job of partition has waited, or 0
+    """
+    def oldest_pending(self, partition):
+        if partition not in self.oldest:
+            return 0
+        return max(self.now - self.oldest[partition], 0)
+
+    def partitions(self):
+        return sorted(self.counts)
+
+    """
+    rows()
+
+    @return List of (partition, COLUMNS...) tuples, one per partition
+    """
+    def rows(self):
+        ROWS = []
+        for partition in self.partitions():
+            COUNTS = self.counts[partition]
+            ROWS.append(tuple([partition] + [self.oldest_pending(partition) if column == 'oldest_pending' else COUNTS[column] for column in COLUMNS]))
+        return ROWS
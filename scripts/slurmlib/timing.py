@@ -0,0 +1,152 @@
+"""
+timing - Where the stats scripts spend their time.
+
+A Profiler keeps the wall clock & CPU time, peak RSS and record count of each
+stage of a run, and prints them as a summary for --profile:
+
+    PROFILER = timing.Profiler()
+    with PROFILER.stage('totals'):
+        calculate_job_totals(REPORT)
+    PROFILER.summary(sys.stderr)
+
+Reading sacct and feeding the reports happen in the one loop, record by
+record, so split() is used to tell the two apart.
+
+@Version 1.0
+"""
+
+### Import commands
+import os
+import resource
+import time
+
+
+"""
+peak_rss()
+
+@return Peak resident memory of this process so far, in MB
+"""
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+"""
+cpu_time()
+
+@return CPU seconds, user & system, used by this process so far
+"""
+def cpu_time():
+    TIMES = os.times()
+    return TIMES[0] + TIMES[1]
+
+
+"""
+child_cpu_time()
+
+@return CPU seconds used by the child processes we have waited on, e.g. sacct
+"""
+def child_cpu_time():
+    TIMES = os.times()
+    return TIMES[2] + TIMES[3]
+
+
+"""
+Stage(name, PROFILER, records)
+
+Times a block of code, wall clock & CPU, and notes the peak RSS after it.
+Set records within the block to count what it got through.
+"""
+class Stage(object):
+
+    def __init__(self, name, PROFILER, records=0):
+        self.name     = name
+        self.profiler = PROFILER
+        self.records  = records
+
+    def __enter__(self):
+        self.wall = time.time()
+        self.cpu  = cpu_time()
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.profiler.add(self.name, time.time() - self.wall, cpu_time() - self.cpu, self.records)
+
+
+"""
+Profiler()
+
+Collects the stages of one run, in the order they finished.  Each stage is a
+tuple of (name, wall, cpu, rss, records).
+"""
+class Profiler(object):
+
+    def __init__(self):
+        self.stages = []
+        self.started = time.time()
+        self.started_cpu = cpu_time()
+        self.started_child_cpu = child_cpu_time()
+
+    def add(self, name, wall, cpu, records=0):
+        self.stages.append((name, wall, cpu, peak_rss(), records))
+
+    """
+    stage(name, records)
+
+    @return A Stage to time a with block as name
+    """
+    def stage(self, name, records=0):
+        return Stage(name, self, records)
+
+    """
+    split(RECORDS, producer, consumer)
+
+    @param RECORDS  - An iterable of records, e.g. from SacctQuery.records()
+    @param producer - Name of the stage for the time spent getting each record
+    @param consumer - Name of the stage for the time spent between records, by
+                      whoever we hand them to
+
+    Times are taken around every record, so this costs a little for each one.
+
+    @return A generator of the records of RECORDS
+    """
+    def split(self, RECORDS, producer, consumer):
+        (produce_wall, produce_cpu, consume_wall, consume_cpu) = (0.0, 0.0, 0.0, 0.0)
+        count = 0
+
+        ITERATOR = iter(RECORDS)
+        while True:
+            (wall, cpu) = (time.time(), cpu_time())
+            try:
+                record = next(ITERATOR)
+            except StopIteration:
+                break
+            finally:
+                (now, now_cpu) = (time.time(), cpu_time())
+                produce_wall += now - wall
+                produce_cpu += now_cpu - cpu
+
+            count += 1
+            yield record
+
+            consume_wall += time.time() - now
+            consume_cpu += cpu_time() - now_cpu
+
+        self.add(producer, produce_wall, produce_cpu, count)
+        self.add(consumer, consume_wall, consume_cpu, count)
+
+    """
+    summary(stream)
+
+    Prints every stage, then the whole run, with the rate records went through
+    each stage that had any.
+    """
+    def summary(self, stream):
+        stream.write('Stage'.ljust(22) + 'Wall s'.rjust(9) + 'CPU s'.rjust(9) + 'Peak MB'.rjust(9) + 'Records'.rjust(10) + 'Rows/s'.rjust(11) + '\n')
+        for (name, wall, cpu, rss, records) in self.stages:
+            rate = ''
+            if records and wall:
+                rate = str(int(records / wall))
+            stream.write(name.ljust(22) + ('%.3f' % wall).rjust(9) + ('%.3f' % cpu).rjust(9) + ('%.1f' % rss).rjust(9) + str(records or '').rjust(10) + rate.rjust(11) + '\n')
+
+        stream.write('total'.ljust(22) + ('%.3f' % (time.time() - self.started)).rjust(9) + ('%.3f' % (cpu_time() - self.started_cpu)).rjust(9) + ('%.1f' % peak_rss()).rjust(9) + '\n')
+        stream.write('Slurm commands CPU s: ' + ('%.3f' % (child_cpu_time() - self.started_child_cpu)) + '\n')
@@ -0,0 +1,168 @@
+"""
+utilization - Node-hours, CPU-hours and utilization per node and partition.
+
+Counting jobs per node makes a node that ran one 48 hour job look idle next
+to one that ran 500 one second jobs.  Here every job is weighted by how long
+it ran and how many CPUs it had.
+
+A node is busy while at least one job is running on it.  Several jobs can
+share a node, so busy time is the union of their intervals, not the sum.  For
+each node (and each partition on each node) the job Start/End endpoints are
+sorted and swept once, which keeps the whole thing O(n log n).
+
+Each job is clipped to our window first, so a job that started before the
+window only counts for the part of it that was inside.  A job still running
+has no End yet, and counts as running up to the end of the window.
+
+@Version 1.0
+"""
+
+### Import commands
+import collections
+
+from slurmlib import hostlist
+
+
+"""
+sweep(INTERVALS)
+
+@param INTERVALS - List of (start, end, cpus) tuples
+
+Sweeps the sorted endpoints once, keeping track of how many jobs and CPUs are
+running at each moment.
+
+@return (busy seconds, peak CPUs in use at once)
+"""
+def sweep(INTERVALS):
+    EVENTS = []
+    for (start, end, cpus) in INTERVALS:
+        EVENTS.append((start, 1, cpus))
+        EVENTS.append((end, -1, -cpus))
+
+    # Ends sort before starts at the same second, so back to back jobs do not
+    # look like they overlapped
+    EVENTS.sort()
+
+    busy = 0
+    depth = 0
+    cpus = 0
+    peak = 0
+    since = 0
+    for (when, change, cpu_change) in EVENTS:
+        if depth == 0 and change > 0:
+            since = when
+        depth += change
+        cpus += cpu_change
+        if depth == 0 and change < 0:
+            busy += when - since
+        peak = max(peak, cpus)
+
+    return (busy, peak)
+
+
+"""
+Utilization(JOBS, window_start, window_end)
+
+@param JOBS         - The JobStore holding our jobs.  Needs NODES, PARTITIONS,
+                      START, END and CPUS columns.
+@param window_start - Epoch seconds our window starts at.  If None, the
+                      earliest job Start is used.
+@param window_end   - Epoch seconds our window ends at, and that running jobs
+                      are clipped to.  If None, the latest job End is used.
+"""
+class Utilization(object):
+
+    def __init__(self, JOBS, window_start=None, window_end=None):
+        STARTS = JOBS.column('START')
+        ENDS   = JOBS.column('END')
+        CPUS   = JOBS.column('CPUS')
+        PARTS  = JOBS.column('PARTITIONS')
+
+        KNOWN = [row for row in range(len(JOBS)) if STARTS[row]]
+        if window_start is None:
+            window_start = min([STARTS[row] for row in KNOWN] or [0])
+        if window_end is None:
+            window_end = max([ENDS[row] for row in KNOWN] or [0])
+        self.window_start = window_start
+        self.window_end   = window_end
+        self.window       = max(window_end - window_start, 1)
+
+        EXPANDED = [hostlist.expand(label) for label in JOBS.labels['NODES']]
+
+        # Every clipped job interval, by node and by (partition, node)
+        by_node      = collections.defaultdict(list)
+        by_partition = collections.defaultdict(list)
+        self.cpu_seconds           = collections.Counter()
+        self.partition_cpu_seconds = collections.Counter()
+
+        for (row, code) in enumerate(JOBS.column('NODES')):
+            # An End of 0 is a job still running, so it runs to window_end
+            start = max(STARTS[row], window_start)
+            end   = min(ENDS[row] or window_end, window_end)
+            nodes = EXPANDED[code]
+            if not STARTS[row] or end <= start or not nodes:
+                continue
+
+            # CPUs are split evenly across the nodes of a multi node job
+            cpus = CPUS[row] / len(nodes)
+            partition = JOBS.label('PARTITIONS', PARTS[row])
+            for node in nodes:
+                by_node[node].append((start, end, cpus))
+                by_partition[(partition, node)].append((start, end, cpus))
+                self.cpu_seconds[node] += (end - start) * cpus
+                self.partition_cpu_seconds[partition] += (end - start) * cpus
+
+        self.busy = {}
+        self.peak_cpus = {}
+        for (node, INTERVALS) in by_node.items():
+            (self.busy[node], self.peak_cpus[node]) = sweep(INTERVALS)
+
+        self.partition_busy  = collections.Counter()
+        self.partition_nodes = collections.Counter()
+        for ((partition, node), INTERVALS) in by_partition.items():
+            self.partition_busy[partition] += sweep(INTERVALS)[0]
+            self.partition_nodes[partition] += 1
+
+    """
+    nodes() / partitions()
+
+    @return Sorted List of every node / partition that ran a job in our window
+    """
+    def nodes(self):
+        return sorted(self.busy)
+
+    def partitions(self):
+        return sorted(self.partition_busy)
+
+    """
+    node_hours(node) / cpu_hours(node) / percent(node)
+
+    @return Hours the node was busy, CPU-hours used on it, and the percentage
+            of our window it was busy for
+    """
+    def node_hours(self, node):
+        return self.busy.get(node, 0) / 3600
+
+    def cpu_hours(self, node):
+        return self.cpu_seconds[node] / 3600
+
+    def percent(self, node):
+        return (self.busy.get(node, 0) / self.window) * 100
+
+    """
+    partition_node_hours(partition) / partition_cpu_hours(partition) /
+    partition_percent(partition)
+
+    A partition's percentage is its busy node-hours over the node-hours of
+    every node it ran a job on.
+    """
+    def partition_node_hours(self, partition):
+        return self.partition_busy[partition] / 3600
+
+    def partition_cpu_hours(self, partition):
+        return self.partition_cpu_seconds[partition] / 3600
+
+    def partition_percent(self, partition):
+        if not self.partition_nodes[partition]:
+            return 0
+        return (self.partition_busy[partition] / (self.window * self.partition_nodes[partition])) * 100
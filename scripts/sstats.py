@@ -17,17 +17,34 @@ TODO - Implement -t
 """
 
 ### Import commands
+import cProfile
+import collections
+import concurrent.futures
 import getopt
-import subprocess
+import io
 import sys
-import datetime
+
+import node_stats
+import partition_stats
+from slurmlib import archive
+from slurmlib import cache
+from slurmlib import commands
+from slurmlib import columnar
+from slurmlib import daemon
+from slurmlib import histogram
+from slurmlib import jobcomp
+from slurmlib import output
+from slurmlib import query
+from slurmlib import reports
+from slurmlib import slurmdbd
+from slurmlib import snapshot
+from slurmlib import timing
 
 
 ## Functions
 def main():
 
     ## Global Variables
-    global SACCT_CMD
     global VERBOSE
     global DATE_STRING
     global LAST_WEEK
@@ -36,9 +53,31 @@ def main():
     global GET_ALL
     global GET_COMPLETED
     global GET_FAILED
-
-    # The command that is the cornerstone of this whole script.
-    SACCT_CMD = '/apps/slurm/default/bin/sacct --allusers --allocations --noheader --format=JobID,User,Account,State,ExitCode --parsable2 --starttime='
+    global USE_CACHE
+    global CACHE_DIR
+    global SHARDS
+    global SLURMDBD
+    global SLURMDBD_FIXTURE
+    global JOBCOMP_LOG
+    global ARCHIVE_DIR
+    global FROM_ARCHIVE
+    global FAILURE_REPORT
+    global TOP_FAILURES
+    global WITH_NODES
+    global WITH_PARTITIONS
+    global DAEMON
+    global SOCKET_PATH
+    global SOCKET_MODE
+    global SERIES
+    global LIVE
+    global CLUSTERS
+    global WAIT_REPORT
+    global WAIT
+    global FORMAT
+    global TEXTFILE_DIR
+    global PROFILE
+    global PROFILE_DUMP
+    global PROFILER
 
     # Initiate our global values
     GET_ALL         = False
@@ -48,10 +87,37 @@ def main():
     YESTERDAY       = False
     LAST_WEEK       = False
     SPECIFIC        = False
+    USE_CACHE       = False
+    CACHE_DIR       = cache.DEFAULT_DIR
+    SHARDS          = 1
+    SLURMDBD        = None
+    SLURMDBD_FIXTURE = None
+    JOBCOMP_LOG     = None
+    ARCHIVE_DIR     = None
+    FROM_ARCHIVE    = None
+    FAILURE_REPORT  = None
+
+    # How many of each we list in the failure drill-down
+    TOP_FAILURES    = 5
+    WITH_NODES      = False
+    WITH_PARTITIONS = False
+    DAEMON          = False
+    SOCKET_PATH     = None
+    SOCKET_MODE     = daemon.SOCKET_MODE
+    SERIES          = None
+    LIVE            = False
+    CLUSTERS        = None
+    WAIT            = False
+    WAIT_REPORT     = None
+    FORMAT          = 'text'
+    TEXTFILE_DIR    = None
+    PROFILE         = False
+    PROFILE_DUMP    = None
+    PROFILER        = timing.Profiler()
 
     # Parse the command line arguments
     try:
-        opts, args = getopt.getopt(sys.argv[1:], 'acdfhtvw?', ['all', 'completed', 'day', 'failed', 'help', 'time', 'verbose', 'week'])
+        opts, args = getopt.getopt(sys.argv[1:], 'aCcDdfhLM:npS:s:tvWw?', ['all', 'archive=', 'cache', 'cache-dir=', 'clusters=', 'completed', 'daemon', 'day', 'days=', 'failed', 'format=', 'from-archive=', 'help', 'jobcomp=', 'live', 'nodes', 'partitions', 'profile', 'profile-dump=', 'series=', 'socket=', 'socket-mode=', 'shards=', 'slurmdbd=', 'slurmdbd-fixture=', 'textfile-dir=', 'time', 'verbose', 'wait', 'week'])
     except getopt.GetoptError:
         print('Non-existant option....')
         print('')
@@ -61,25 +127,105 @@ def main():
             usage()
         elif opt in ('-a', '--all'):
             GET_ALL = True
+        elif opt == '--archive':
+            ARCHIVE_DIR = arg
+        elif opt in ('-C', '--cache'):
+            USE_CACHE = True
+        elif opt == '--cache-dir':
+            USE_CACHE = True
+            CACHE_DIR = arg
+        elif opt in ('-M', '--clusters'):
+            CLUSTERS = arg.split(',')
         elif opt in ('-c', '--completed'):
             GET_COMPLETED = True
+        elif opt in ('-D', '--daemon'):
+            DAEMON = True
         elif opt in ('-d', '--day'):
             YESTERDAY = True
+        elif opt == '--days':
+            SPECIFIC = True
+            DATE_STRING = query.construct_date(DAYS=int(arg))
+        elif opt == '--from-archive':
+            FROM_ARCHIVE = arg
         elif opt in ('-f', '--failed'):
             GET_FAILED = True
+        elif opt == '--format':
+            FORMAT = arg
+        elif opt in ('-L', '--live'):
+            LIVE = True
+        elif opt in ('-n', '--nodes'):
+            WITH_NODES = True
+        elif opt in ('-p', '--partitions'):
+            WITH_PARTITIONS = True
+        elif opt == '--profile':
+            PROFILE = True
+        elif opt == '--profile-dump':
+            PROFILE_DUMP = arg
+        elif opt == '--series':
+            try:
+                SERIES = histogram.parse_edges(arg)[0]
+            except (ValueError, IndexError):
+                SERIES = 0
+            if not SERIES:
+                print('Invalid series interval: ' + arg)
+                usage()
+        elif opt in ('-S', '--socket'):
+            SOCKET_PATH = arg
+        elif opt == '--socket-mode':
+            SOCKET_MODE = int(arg, 8)
+        elif opt in ('-s', '--shards'):
+            SHARDS = int(arg)
+        elif opt == '--jobcomp':
+            JOBCOMP_LOG = arg
+        elif opt == '--slurmdbd':
+            SLURMDBD = arg
+        elif opt == '--slurmdbd-fixture':
+            SLURMDBD = SLURMDBD or slurmdbd.DEFAULT_CLUSTER
+            SLURMDBD_FIXTURE = arg
+        elif opt == '--textfile-dir':
+            TEXTFILE_DIR = arg
         elif opt in ('-t', '--time'): #NYI
             SPECIFIC = True
             DATE_STRING = arg
         elif opt in ('-v', '--verbose'):
             VERBOSE = True
+        elif opt in ('-W', '--wait'):
+            WAIT = True
         elif opt in ('-w', '--week'):
             LAST_WEEK = True
 
     # Do a sanity check on items we assume should be
     sanity()
 
-    # Run the script.
-    get_requested_data()
+    # Run the script, under cProfile if we want every call it made
+    try:
+        if PROFILE_DUMP:
+            PROFILE_RUN = cProfile.Profile()
+            PROFILE_RUN.runcall(run_script)
+            PROFILE_RUN.dump_stats(PROFILE_DUMP)
+            verbosity('cProfile stats written to ' + str(PROFILE_DUMP) + ', read them with python -m pstats')
+        else:
+            run_script()
+    except query.SacctError as error:
+        print(str(error))
+        print('FAILURE: Unable to get Job Status')
+        sys.exit(error.code)
+
+    # Our own output may be json etc., so the summary goes to stderr
+    if PROFILE:
+        PROFILER.summary(sys.stderr)
+
+
+"""
+run_script()
+
+Either stays running as the daemon, or gets what was asked for and exits.
+"""
+def run_script():
+    if DAEMON:
+        run_daemon()
+    else:
+        get_requested_data()
 
 
 """
@@ -109,16 +255,33 @@ TODO - Ensure provided date with -t option is a valid format for Slurm - YYYY-mm
 def sanity():
 
     # Ensure we have *some* value set for what we're trying to get.c
-    if not GET_ALL and not GET_COMPLETED and not GET_FAILED:
+    # The daemon serves all of them, and a series or live snapshot is its own class.
+    if not DAEMON and not SERIES and not LIVE and not GET_ALL and not GET_COMPLETED and not GET_FAILED and not WAIT:
         verbosity('You did not specify what class of information you wanted.')
-        print('You must specify either, All, Completed, or Failed jobs')
+        print('You must specify either, All, Completed, Failed jobs or Wait times')
+        usage()
+
+    if FORMAT not in output.FORMATS or (SERIES and FORMAT == 'prometheus'):
+        print('Unknown format: ' + str(FORMAT))
         usage()
 
+    # Only our own job reports are split out per cluster, and only from sacct
+    if CLUSTERS and (DAEMON or SERIES or LIVE or WITH_NODES or WITH_PARTITIONS or SLURMDBD or JOBCOMP_LOG or ARCHIVE_DIR or FROM_ARCHIVE):
+        print('--clusters only works with -a, -c, -f or -W, straight from sacct')
+        usage()
+
+    # Asking a daemon does not need any Slurm commands
+    if SOCKET_PATH and not DAEMON:
+        return
+
+    # Nor does reading slurmdbd, the jobcomp log or the archive
+    if SLURMDBD or JOBCOMP_LOG or FROM_ARCHIVE:
+        return
+
     # Check to see we have valid access to Slurm commands
-    (SLURM_VERIFY_CODE, STATE_INFO) = subprocess.getstatusoutput('/usr/bin/which /apps/slurm/default/bin/sinfo')
-    if SLURM_VERIFY_CODE:
-        verbosity("Slurm check exit code: " + str(SLURM_VERIFY_CODE))
-        print('No Slurm commands found.  Check PATH &/or Modules')
+    if not commands.available('sinfo'):
+        verbosity('Slurm check failed for: ' + commands.path('sinfo'))
+        print('No Slurm commands found.  Check PATH, Modules &/or SLURM_BIN')
         usage()
 
 
@@ -135,12 +298,35 @@ def usage():
     print ('Slurm Stats:')
     print ('Any valid Slurm user should be able to run this command')
     print ('-a/--all         -> Displays all stats that this script gathers')
+    print ('--archive=DIR    -> Also add every finished job we read to the history archive in DIR, e.g. ' + str(archive.DEFAULT_DIR))
+    print ('-C/--cache       -> Only query Slurm for jobs since the last cached run')
+    print ('--cache-dir=DIR  -> Where to keep the cache.  Default: ' + str(cache.DEFAULT_DIR))
     print ('-c/--completed   -> Displays information on Completed jobs')
+    print ('-M/--clusters=A,B -> Query each cluster at the same time, and display each of them & all of them combined')
+    print ('-D/--daemon      -> Stay running, keeping 12h/24h/7d stats up to date, and answer -S requests')
     print ('-d/--day         -> Get stats for the past 24 hours')
+    print ('--days=N         -> Get stats for the past N days.  Best used with --from-archive')
     print ('-f/--failed      -> Displays information on Failed jobs')
+    print ('--format=FORMAT  -> text, json, csv or prometheus.  Default: text, or csv for a --series')
+    print ('--from-archive=DIR -> Read finished jobs from the history archive in DIR, rather than sacct')
     print ('-h/?             -> Displays this help message')
+    print ('--jobcomp=FILE   -> Read finished jobs from the jobcomp/filetxt log FILE, rather than sacct, e.g. ' + jobcomp.DEFAULT_LOG)
+    print ('-L/--live        -> Pending backlog & node states per partition right now, from squeue & sinfo rather than sacct')
+    print ('-n/--nodes       -> Also display node_stats, from the same Slurm query')
+    print ('-p/--partitions  -> Also display partition_stats, from the same Slurm query')
+    print ('--profile        -> Afterwards, print how long each stage took, to stderr')
+    print ('--profile-dump=F -> Write cProfile stats of the whole run to F, for python -m pstats')
+    print ('--series=WIDTH   -> Jobs submitted, started, completed, failed & running per WIDTH, e.g. 5m, 1h, 1d')
+    print ('-S/--socket PATH -> Ask the daemon listening on PATH, rather than querying Slurm')
+    print ('                    With -D, where the daemon listens.  Default: ' + str(daemon.SOCKET_PATH))
+    print ('--socket-mode=MODE -> With -D, the permissions of our socket, in octal.  Default: ' + oct(daemon.SOCKET_MODE)[2:])
+    print ('-s/--shards N    -> Split the window into N sacct queries that run at the same time')
+    print ('--slurmdbd=NAME  -> Read the job table of cluster NAME straight from the slurmdbd MySQL, rather than sacct')
+    print ('--slurmdbd-fixture=FILE -> With --slurmdbd, read a SQLite copy of slurm_acct_db instead')
+    print ('--textfile-dir=D -> Also write our stats for the node_exporter textfile collector in D')
     print ('-t/--time        -> !!! NYI !!! Select a specific time interval.  Must use valid Slurm time format')
     print ('-v/--verbose     -> Triggers verbose output.')
+    print ('-W/--wait        -> Displays p50/p90/p99 queue wait by partition, QOS, account & job size')
     print ('-w/--week        -> Get stats for the past 7 days !!! This could take a while !!!')
     print('')
 
@@ -154,159 +340,390 @@ get_data()
 Centralized way of actually selecting which data we want based on our flags.
 """
 def get_requested_data():
+    global FAILURE_REPORT
+    global WAIT_REPORT
 
-    # If we don't have a specific date, dive into our function to choose a date.
+    # If we don't have a specific date, use one of our canned dates.
     if not SPECIFIC:
-        DATE = construct_date()
+        DATE = query.construct_date(LAST_WEEK, YESTERDAY)
     else:
         # Otherwise, set DATE to the user provided & validated DATE_STRING
         DATE = DATE_STRING
-    SLURM_INFO = run_slurm(DATE)
+
+    if SERIES:
+        get_series(DATE)
+        return
+
+    if LIVE:
+        get_live()
+        return
+
+    if CLUSTERS:
+        get_clusters(DATE)
+        return
+
+    # A daemon can answer the canned windows of our own reports in milliseconds,
+    # but only renders them as text, and only from sacct
+    if SOCKET_PATH and not SPECIFIC and not WITH_NODES and not WITH_PARTITIONS and not WAIT and FORMAT == 'text' and not TEXTFILE_DIR and not SLURMDBD and not JOBCOMP_LOG and not FROM_ARCHIVE and not ARCHIVE_DIR:
+        if ask_daemon():
+            return
+        verbosity('No answer from the daemon on ' + str(SOCKET_PATH) + ', querying Slurm')
+
+    # Every report we want is fed from the one Slurm query
+    JOB_REPORT = reports.JobReport()
+    REPORTS = [JOB_REPORT]
+    if WITH_NODES:
+        NODE_REPORT = reports.NodeReport(window_start=columnar.parse_time(DATE) or None)
+        REPORTS.append(NODE_REPORT)
+    if WITH_PARTITIONS:
+        PARTITION_REPORT = reports.PartitionReport()
+        REPORTS.append(PARTITION_REPORT)
+
+    # Only drill into failures when we are going to print them
+    if GET_ALL or GET_FAILED:
+        FAILURE_REPORT = reports.FailureReport(JOB_REPORT)
+        REPORTS.append(FAILURE_REPORT)
+    if WAIT:
+        WAIT_REPORT = reports.WaitReport()
+        REPORTS.append(WAIT_REPORT)
+    run_slurm(DATE, REPORTS)
 
     verbosity("calculating Job information")
-    calculate_job_totals(SLURM_INFO)
+    with PROFILER.stage('totals'):
+        calculate_job_totals(JOB_REPORT)
+        if WITH_NODES:
+            node_stats.VERBOSE = VERBOSE
+            node_stats.calculate_job_totals(NODE_REPORT)
+
+    with PROFILER.stage('output'):
+        # Machine readable output is everything we have, from this one query
+        if FORMAT != 'text' or TEXTFILE_DIR:
+            METRICS = output.Metrics({'window': DATE_STRING if SPECIFIC else query.window_name(LAST_WEEK, YESTERDAY)})
+            collect_metrics(METRICS)
+            if WAIT:
+                collect_wait_metrics(METRICS)
+            if WITH_NODES:
+                node_stats.collect_metrics(METRICS)
+            if WITH_PARTITIONS:
+                partition_stats.collect_metrics(METRICS, PARTITION_REPORT)
+
+            if TEXTFILE_DIR:
+                verbosity('Writing ' + str(TEXTFILE_DIR) + '/sstats.prom')
+                METRICS.write_textfile(TEXTFILE_DIR, 'sstats')
+            if FORMAT != 'text':
+                METRICS.write(sys.stdout, FORMAT)
+                return
+
+        # Get everything we possibly can
+        if GET_ALL:
+            #get_all(SLURM_INFO)
+            get_all()
+
+        # Get only completed job data.
+        elif GET_COMPLETED:
+            #get_completed(SLURM_INFO)
+            get_completed()
+
+        # Get only failed job data.
+        elif GET_FAILED:
+            #get_failed(SLURM_INFO)
+            get_failed()
+
+        if WAIT:
+            get_wait()
+
+        # Anything else that rode along on our query
+        if WITH_NODES:
+            node_stats.get_completed()
+        if WITH_PARTITIONS:
+            partition_stats.VERBOSE = VERBOSE
+            partition_stats.get_completed(PARTITION_REPORT)
+            partition_stats.get_failed(PARTITION_REPORT)
 
-    # Get everything we possibly can
-    if GET_ALL:
-        #get_all(SLURM_INFO)
-        get_all()
 
-    # Get only completed job data.
-    elif GET_COMPLETED:
-        #get_completed(SLURM_INFO)
-        get_completed()
+"""
+get_series(DATE)
+
+@param DATE - Where our window starts
+
+Queries Slurm for just what a SeriesReport needs, and writes the series out
+in FORMAT rather than our usual report.
+"""
+def get_series(DATE):
+    SERIES_REPORT = reports.SeriesReport(SERIES, columnar.parse_time(DATE) or None)
+    run_slurm(DATE, [SERIES_REPORT])
 
-    # Get only failed job data.
-    elif GET_FAILED:
-        #get_failed(SLURM_INFO)
-        get_failed()
+    verbosity('Writing ' + str(SERIES_REPORT.series.size) + ' buckets of ' + histogram.format_duration(SERIES))
+    if FORMAT == 'text':
+        SERIES_REPORT.series.write(sys.stdout, 'csv')
+    else:
+        SERIES_REPORT.series.write(sys.stdout, FORMAT)
 
 
 """
-run_slurm(starttime)
+get_clusters(DATE)
 
-@param starttime
+@param DATE - Where our window starts
 
-Our function that actually performs the Slurm command.  At this point we've
-verified that we indeed have a valid Slurm path.
+Runs a sacct -M for every one of CLUSTERS at the same time, each feeding its
+own reports, so we only wait as long as the slowest cluster takes.  Then
+prints, or writes in FORMAT, every cluster and all of them combined.
+"""
+def get_clusters(DATE):
+    global FAILURE_REPORT
+    global WAIT_REPORT
+
+    # The same reports for every cluster, and for all of them combined
+    def new_reports():
+        JOB_REPORT = reports.JobReport()
+        REPORTS = [JOB_REPORT]
+        if GET_ALL or GET_FAILED:
+            REPORTS.append(reports.FailureReport(JOB_REPORT))
+        if WAIT:
+            REPORTS.append(reports.WaitReport())
+        return REPORTS
+
+    CLUSTER_REPORTS = collections.OrderedDict()
+    for cluster in CLUSTERS:
+        CLUSTER_REPORTS[cluster] = new_reports()
+
+    # Each sacct spends its time waiting on slurmdbd, so threads are plenty
+    verbosity('Querying ' + ', '.join(CLUSTERS) + ' at the same time')
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(CLUSTERS)) as EXECUTOR:
+        FUTURES = [EXECUTOR.submit(run_slurm, DATE, REPORTS, cluster) for (cluster, REPORTS) in CLUSTER_REPORTS.items()]
+        for FUTURE in FUTURES:
+            FUTURE.result()
+
+    # Combined is just every cluster's counts added together
+    COMBINED = new_reports()
+    query.SacctQuery(COMBINED)
+    for REPORTS in CLUSTER_REPORTS.values():
+        for (report, cluster_report) in zip(COMBINED, REPORTS):
+            report.update(cluster_report)
+    for report in COMBINED:
+        report.finish()
+    CLUSTER_REPORTS['combined'] = COMBINED
+
+    METRICS = output.Metrics()
+    for (cluster, REPORTS) in CLUSTER_REPORTS.items():
+        calculate_job_totals(REPORTS[0])
+        FAILURE_REPORT = find_report(REPORTS, reports.FailureReport)
+        WAIT_REPORT = find_report(REPORTS, reports.WaitReport)
+
+        if FORMAT != 'text' or TEXTFILE_DIR:
+            METRICS.set_labels({'window': DATE_STRING if SPECIFIC else query.window_name(LAST_WEEK, YESTERDAY), 'cluster': cluster})
+            collect_metrics(METRICS)
+            if WAIT:
+                collect_wait_metrics(METRICS)
+        if FORMAT != 'text':
+            continue
+
+        print('____________________________________________')
+        print('Cluster:         ' + cluster)
+        if GET_ALL:
+            get_all()
+        elif GET_COMPLETED:
+            get_completed()
+        elif GET_FAILED:
+            get_failed()
+        if WAIT:
+            get_wait()
+
+    if TEXTFILE_DIR:
+        verbosity('Writing ' + str(TEXTFILE_DIR) + '/sstats.prom')
+        METRICS.write_textfile(TEXTFILE_DIR, 'sstats')
+    if FORMAT != 'text':
+        METRICS.write(sys.stdout, FORMAT)
 
-Within this function, we run our Slurm command, verify the output, and then
-loop over the data, separating different parts out into relevant Dictionary
-fields.  This should allow us to parse the data we just obtained.
 
-This is done so that Slurm commands are only done once, and we work off the
-dataset that was obtained, rather than many many many Slurm commands
 """
-def run_slurm(starttime):
+find_report(REPORTS, kind)
 
-    # Finalize our constructed command
-    GET_JOB_INFO = str(SACCT_CMD) + str(starttime) + ' --endtime=now'
+@return The first of REPORTS that is a kind, or None
+"""
+def find_report(REPORTS, kind):
+    for report in REPORTS:
+        if isinstance(report, kind):
+            return report
+    return None
 
-    #print('Requested time interval: ' + str(starttime))
 
-    verbosity("What does our Slurm command look like?")
-    verbosity(str(GET_JOB_INFO))
-
-    # Run our Slurm command
-    #print('Querying Slurm....')
-    (EXIT_CODE_RUN, STATE_INFO) = subprocess.getstatusoutput(GET_JOB_INFO)
-
-    if EXIT_CODE_RUN == 0:
-        verbosity('Slurm command success')
-        verbosity('Successfully gathered State information')
-
-        # Set up local Lists to contain data as we loop through our results
-        verbosity('Setting up blank local Lists for parsing')
-        jobids = []
-        users  = []
-        groups = []
-        states = []
-        exits  = []
-
-        # Loop through our results, storing relevant data within each List
-        verbosity('Looping through our results and placing into appropriate Lists')
-        for line in STATE_INFO.split("\n"):
-            jobids.append(line.split("|")[0])
-            users.append(line.split("|")[1])
-            groups.append(line.split("|")[2])
-            states.append(line.split("|")[3])
-            exits.append(line.split("|")[4])
-
-        # Take the final results of the Lists and store them within a Dictionary
-        verbosity('Constructing data Dictionary')
-        RESULT = {
-            'JOBID' : jobids,
-            'USERS' : users,
-            'GROUPS': groups,
-            'STATE' : states,
-            'EXIT'  : exits
-        }
-        return RESULT
+"""
+get_live()
+
+Takes a snapshot of the queue & nodes from squeue and sinfo, and prints it
+per partition, or writes it in FORMAT.  No sacct query at all.
+"""
+def get_live():
+    SNAPSHOT = snapshot.QueueSnapshot()
+    verbosity(SNAPSHOT.squeue_command())
+    verbosity(SNAPSHOT.sinfo_command())
+    with PROFILER.stage('squeue + sinfo') as stage:
+        stage.records = SNAPSHOT.take()
+
+    if FORMAT != 'text' or TEXTFILE_DIR:
+        METRICS = output.Metrics({'window': 'live'})
+        METRICS.describe('slurm_live_jobs', 'Jobs in the queue right now by partition and state')
+        METRICS.describe('slurm_live_pending_cpus', 'CPUs pending jobs are waiting for by partition')
+        METRICS.describe('slurm_live_oldest_pending_seconds', 'How long the oldest pending job has waited by partition')
+        METRICS.describe('slurm_live_nodes', 'Nodes by partition and state')
+        for ROW in SNAPSHOT.rows():
+            partition = ROW[0]
+            COLUMNS = dict(zip(snapshot.COLUMNS, ROW[1:]))
+            METRICS.add('slurm_live_jobs', COLUMNS['running'], {'partition': partition, 'state': 'running'})
+            METRICS.add('slurm_live_jobs', COLUMNS['pending'], {'partition': partition, 'state': 'pending'})
+            METRICS.add('slurm_live_pending_cpus', COLUMNS['pending_cpus'], {'partition': partition})
+            METRICS.add('slurm_live_oldest_pending_seconds', COLUMNS['oldest_pending'], {'partition': partition})
+            for state in snapshot.NODE_COLUMNS:
+                METRICS.add('slurm_live_nodes', COLUMNS[state], {'partition': partition, 'state': state})
+
+        if TEXTFILE_DIR:
+            verbosity('Writing ' + str(TEXTFILE_DIR) + '/sstats_live.prom')
+            METRICS.write_textfile(TEXTFILE_DIR, 'sstats_live')
+        if FORMAT != 'text':
+            METRICS.write(sys.stdout, FORMAT)
+            return
+
+    print('____________________________________________')
+    print('################ LIVE QUEUE ################')
+    print('Running jobs:    ' + str(SNAPSHOT.running))
+    print('Pending jobs:    ' + str(SNAPSHOT.pending))
+    print('____________________________________________')
+    print('Partition'.ljust(12) + 'Run'.rjust(7) + 'Pend'.rjust(7) + 'PendCPU'.rjust(9) + 'Oldest pend'.rjust(14) + 'Idle'.rjust(6) + 'Alloc'.rjust(6) + 'Down'.rjust(6) + 'Other'.rjust(6))
+    for (partition, running, pending, pending_cpus, oldest, idle, alloc, down, other) in SNAPSHOT.rows():
+        print(partition.ljust(12) + str(running).rjust(7) + str(pending).rjust(7) + str(pending_cpus).rjust(9) + histogram.format_elapsed(oldest).rjust(14) + str(idle).rjust(6) + str(alloc).rjust(6) + str(down).rjust(6) + str(other).rjust(6))
+    print('____________________________________________')
+
+
+"""
+ask_daemon()
+
+Asks the daemon on SOCKET_PATH for the window & report our flags describe, and
+prints its answer.
+
+@return True if the daemon answered
+"""
+def ask_daemon():
+    WINDOW = query.window_name(LAST_WEEK, YESTERDAY)
+
+    if GET_ALL:
+        REPORT = 'all'
+    elif GET_COMPLETED:
+        REPORT = 'completed'
     else:
-        print('FAILURE: Unable to get Job Status')
-        sys.exit(EXIT_CODE_RUN)
+        REPORT = 'failed'
+
+    verbosity('Asking the daemon on ' + str(SOCKET_PATH) + ' for ' + WINDOW + ' ' + REPORT)
+    TEXT = daemon.ask(SOCKET_PATH, WINDOW, REPORT)
+    if TEXT is None:
+        return False
+
+    sys.stdout.write(TEXT)
+    return True
+
 
+"""
+run_daemon()
 
+Runs forever as the daemon, listening on SOCKET_PATH (or the default) with
+the permissions SOCKET_MODE.
 """
-most_frequent(LIST)
+def run_daemon():
+    JOB_REPORT = reports.JobReport()
+    STATS_DAEMON = daemon.StatsDaemon([JOB_REPORT, reports.FailureReport(JOB_REPORT)], render_report, SHARDS)
 
-Taken from online.  A way to find the most common ocurrence of an item in a List
+    print('Serving sstats on ' + str(SOCKET_PATH or daemon.SOCKET_PATH))
+    STATS_DAEMON.serve(SOCKET_PATH or daemon.SOCKET_PATH, SOCKET_MODE)
 
-@param LIST - The List we want to examine.
 
-@return common - The most common item
 """
-def most_frequent(LIST):
-    counter = 0
-    common = LIST[0]
+render_report(REPORTS, WHICH)
+
+@param REPORTS - A finished JobReport, and the FailureReport reading from it
+@param WHICH   - 'all', 'completed' or 'failed'
 
-    for item in LIST:
-        current_count = LIST.count(item)
-        if(current_count > counter):
-            counter = current_count
-            common = item
+Runs our usual printing functions, printing to a string rather than the
+screen.  This is how the daemon renders its reports.
+
+@return The text of the report
+"""
+def render_report(REPORTS, WHICH):
+    global FAILURE_REPORT
+
+    OUT = io.StringIO()
+
+    calculate_job_totals(REPORTS[0])
+    FAILURE_REPORT = find_report(REPORTS, reports.FailureReport)
+    if WHICH == 'all':
+        get_all(OUT)
+    elif WHICH == 'completed':
+        get_completed(OUT)
+    else:
+        get_failed(OUT)
 
-    return common
+    return OUT.getvalue()
 
 
 """
-construct_date()
+run_slurm(starttime, REPORTS, cluster)
 
-@return DATE_STRING
+@param starttime
+@param REPORTS - The reports (from slurmlib.reports) we want to feed
+@param cluster - The cluster to ask sacct -M about, or None for our own
+
+Our function that actually performs the Slurm command.  At this point we've
+verified that we indeed have a valid Slurm path.
 
-Our way of taking canned date parameters and formatting it so that Slurm can
-accept.
+Within this function, we ask Slurm once for every field that any of our
+reports need, and stream the output to each of them one record at a time,
+rather than holding the whole output in memory.
 
-We are offering:
-7d -> 24h -> 12h
+This is done so that Slurm commands are only done once, and we work off the
+dataset that was obtained, rather than many many many Slurm commands
 """
-def construct_date():
+def run_slurm(starttime, REPORTS, cluster=None):
 
-    # 7 days.
-    verbosity("Are we looking for last week?")
-    if LAST_WEEK:
-        verbosity("Setting timestamp to last week")
-        timestamp = datetime.datetime.now() - datetime.timedelta(days = 7)
+    # The archive is just one more report riding along on our query
+    if ARCHIVE_DIR:
+        verbosity('Adding finished jobs to the archive in ' + str(ARCHIVE_DIR))
+        REPORTS = list(REPORTS) + [archive.ArchiveReport(ARCHIVE_DIR)]
 
-    # 24 hours.
-    elif YESTERDAY:
-        verbosity("No, are we looking for Yesterday?")
-        verbosity("Setting timestamp to Yesterday")
-        timestamp = datetime.datetime.now() - datetime.timedelta(days = 1)
+    # Build our query from what each report needs
+    SLURM_QUERY = query.SacctQuery(REPORTS, cluster)
 
-    # Default is 12 hours.
+    verbosity("What does our Slurm command look like?")
+    verbosity(SLURM_QUERY.command() + str(starttime) + ' --endtime=now')
+
+    SOURCE = None
+    if FROM_ARCHIVE:
+        verbosity('Reading the archive in ' + str(FROM_ARCHIVE) + ' rather than running sacct')
+        SOURCE = archive.ArchiveReader(FROM_ARCHIVE)
+    elif SLURMDBD:
+        verbosity('Reading ' + str(SLURMDBD) + '_job_table rather than running sacct')
+        SOURCE = slurmdbd.JobDatabase(slurmdbd.connect(SLURMDBD_FIXTURE), SLURMDBD)
+    elif JOBCOMP_LOG:
+        verbosity('Reading ' + str(JOBCOMP_LOG) + ' rather than running sacct')
+        SOURCE = jobcomp.JobCompLog(JOBCOMP_LOG)
+
+    # Timing every record costs a little, so only when we will print it
+    RUN_PROFILER = PROFILER if PROFILE else None
+
+    if USE_CACHE:
+        verbosity('Using the cache in ' + str(CACHE_DIR))
+        RECORDS = SLURM_QUERY.run(starttime, CACHE_DIR, SHARDS, SOURCE, RUN_PROFILER)
     else:
-        verbosity("No, we must want the default")
-        verbosity("Setting timestamp to 12 hours ago (DEFAULT)")
-        timestamp = datetime.datetime.now() - datetime.timedelta(hours = 12)
+        RECORDS = SLURM_QUERY.run(starttime, None, SHARDS, SOURCE, RUN_PROFILER)
 
-    verbosity("Construct our DATE_STRING")
-    DATE_STRING = timestamp.strftime("%Y-%m-%dT%H:%M:%S")
-
-    return DATE_STRING
+    verbosity('Slurm command success')
+    verbosity('Successfully gathered State information for ' + str(RECORDS) + ' jobs')
 
 
 """
+calculate_job_totals(STATE_INFO)
+
+@param STATE_INFO - The finished JobReport
+
+Pulls the totals we print out of the report.
 """
 def calculate_job_totals(STATE_INFO):
     verbosity('Obtaining Job Completion Stats...')
@@ -334,65 +751,86 @@ def calculate_job_totals(STATE_INFO):
 
     # Total amount of jobs based on each newline
 
-    TOTAL = len(STATE_INFO.get('JOBID'))
+    TOTAL = STATE_INFO.total
     verbosity('TOTAL = ' + str(TOTAL))
 
     # Amount of running jobs
-    RUNNING = STATE_INFO.get('STATE').count('RUNNING')
+    RUNNING = STATE_INFO.running
 
     # Amount of eligible jobs
-    ELIGIBLE = STATE_INFO.get('STATE').count('PENDING')
+    ELIGIBLE = STATE_INFO.eligible
 
     # Amount of completed jobs
-    COMPLETED = STATE_INFO.get('STATE').count('COMPLETED')
-
-    #sum(1 for s in data if 'foo' in s)
-    # Amount of cancelled jobs
-    CANCELLED = STATE_INFO.get('STATE').count('CANCELLED') + sum(1 for check in STATE_INFO.get('STATE') if 'by' in check)
+    COMPLETED = STATE_INFO.completed
 
-    STATE_INFO.get('STATE').count('CANCELLED by')
+    # Amount of cancelled jobs, including 'CANCELLED by <uid>'
+    CANCELLED = STATE_INFO.cancelled
 
-    TIMEOUT = STATE_INFO.get('STATE').count('TIMEOUT')
+    TIMEOUT = STATE_INFO.timeout
 
     # Failed amount of jobs based on MANY criteria
-    FAILED = TOTAL - COMPLETED - RUNNING - ELIGIBLE - CANCELLED - TIMEOUT
+    FAILED = STATE_INFO.failed
 
     # We want to compare rates based on the sum of total jobs
-    COMPARISON_TOTAL = FAILED + COMPLETED
-    FAIL_RATE = (FAILED/COMPARISON_TOTAL)*100
-    COMP_RATE = (COMPLETED/COMPARISON_TOTAL)*100
-    USER_FAIL = most_frequent(STATE_INFO.get('USERS'))
-    GROUP_FAIL = most_frequent(STATE_INFO.get('GROUPS'))
-    EXIT_FAIL = most_frequent(STATE_INFO.get('EXIT'))
-    E1_FAIL = STATE_INFO.get('EXIT').count('1:0')
-    E7_FAIL = STATE_INFO.get('EXIT').count('7:0')
+    COMPARISON_TOTAL = STATE_INFO.comparison_total
+    FAIL_RATE = STATE_INFO.fail_rate
+    COMP_RATE = STATE_INFO.comp_rate
+    USER_FAIL = STATE_INFO.user_fail
+    GROUP_FAIL = STATE_INFO.group_fail
+    EXIT_FAIL = STATE_INFO.exit_fail
+    E1_FAIL = STATE_INFO.e1_fail
+    E7_FAIL = STATE_INFO.e7_fail
+
+
+"""
+collect_metrics(METRICS)
 
+@param METRICS - The output.Metrics to add our totals to
 
+Everything get_completed() and get_failed() print, as metrics.
 """
-get_all()
+def collect_metrics(METRICS):
+    METRICS.describe('slurm_jobs', 'Jobs within the window by state')
+    for (state, count) in [('running', RUNNING), ('pending', ELIGIBLE), ('completed', COMPLETED), ('cancelled', CANCELLED), ('timeout', TIMEOUT), ('failed', FAILED)]:
+        METRICS.add('slurm_jobs', count, {'state': state})
+    METRICS.describe('slurm_jobs_total', 'Jobs within the window')
+    METRICS.describe('slurm_job_failure_rate_percent', 'Failed jobs as a percentage of failed and completed jobs')
+    METRICS.describe('slurm_job_success_rate_percent', 'Completed jobs as a percentage of failed and completed jobs')
+    METRICS.add('slurm_jobs_total', TOTAL)
+    METRICS.add('slurm_job_failure_rate_percent', FAIL_RATE)
+    METRICS.add('slurm_job_success_rate_percent', COMP_RATE)
+
+    METRICS.describe('slurm_jobs_exit_code', 'Jobs within the window by exit code')
+    METRICS.add('slurm_jobs_exit_code', E1_FAIL, {'code': '1:0'})
+    METRICS.add('slurm_jobs_exit_code', E7_FAIL, {'code': '7:0'})
+
+    # The names themselves are labels, so alerts can say who
+    METRICS.describe('slurm_top_failures', 'The user, group and exit code with the most jobs')
+    METRICS.add('slurm_top_failures', 1, {'user': USER_FAIL, 'group': GROUP_FAIL, 'exit_code': EXIT_FAIL})
+
+
+"""
+get_all(OUT)
+
+@param OUT - Where to print to.  Default: stdout
 
 Get all information that we have a method for.  Each function will drop its own
  error code if it fails.  If one fails, we have a script problem or a Slurm
 problem so we don't care about continuing.
-
-Exit the script once we got all information
 """
-def get_all():
+def get_all(OUT=None):
     verbosity('Getting ALL possible information...')
     # Get information on Completed jobs
-    get_completed()
+    get_completed(OUT)
 
     # Get information on Failed jobs
-    get_failed()
-
-    # Once we are done with information, cya!
-    sys.exit(0)
+    get_failed(OUT)
 
 
 """
-get_failed(STATE_INFO)
+get_failed(OUT)
 
-@param STATE_INFO
+@param OUT - Where to print to.  Default: stdout
 
 Lets get detailed information about failed jobs.  Exit codes & the such.
 Goal output is:
@@ -406,47 +844,108 @@ Occurrences of E7:      ## jobs
 
 TODO - Check for any Slurm exit codes.  0:?  Where the second field should always be 0
 """
-def get_failed():
+def get_failed(OUT=None):
     verbosity('Obtaining Job Failure Stats...')
+    print('____________________________________________', file=OUT)
+    print('########### JOB FAIL INFORMATION ###########', file=OUT)
+    print('Failed jobs:                 ' + str(FAILED), file=OUT)
+    print('Failure rate:                ' + str(int(FAIL_RATE)), file=OUT)
+    print('____________________________________________', file=OUT)
+    print('User with most Failures:     ' + str(USER_FAIL), file=OUT)
+    print('Group with most Failures:    ' + str(GROUP_FAIL), file=OUT)
+    print('Most common exit code:       ' + str(EXIT_FAIL), file=OUT)
+    print('____________________________________________', file=OUT)
+    print('Number of Exit 1 Failures:   ' + str(E1_FAIL), file=OUT)
+    print('Number of Exit 7 Failures:   ' + str(E7_FAIL), file=OUT)
+    print('____________________________________________', file=OUT)
+
+    if FAILURE_REPORT is not None:
+        get_failure_breakdown(OUT)
+
+
+"""
+get_failure_breakdown(OUT)
+
+@param OUT - Where to print to.  Default: stdout
+
+Prints the TOP_FAILURES users, accounts, exit codes, nodes and partitions
+with the most failed jobs, from the FailureReport.
+"""
+def get_failure_breakdown(OUT=None):
+    verbosity('Obtaining Job Failure Breakdown...')
+
+    for (dimension, title) in FAILURE_REPORT.DIMENSIONS:
+        print('Top ' + str(TOP_FAILURES) + ' by ' + title.lower(), file=OUT)
+        for (item, count) in FAILURE_REPORT.top(dimension, TOP_FAILURES):
+            print('    ' + str(item).ljust(25) + str(count).rjust(8) + (str(int(reports.rate(count, FAILURE_REPORT.total))) + '%').rjust(6), file=OUT)
+        print('____________________________________________', file=OUT)
+
+
+"""
+get_wait()
+
+Prints the p50, p90 & p99 queue wait of every job that started, then of each
+partition, QOS, account and job size, from the WaitReport.
+"""
+def get_wait():
+    verbosity('Obtaining Queue Wait Stats...')
+
     print('____________________________________________')
-    print('########### JOB FAIL INFORMATION ###########')
-    print('Failed jobs:                 ' + str(FAILED))
-    print('Failure rate:                ' + str(int(FAIL_RATE)))
-    print('____________________________________________')
-    print('User with most Failures:     ' + str(USER_FAIL))
-    print('Group with most Failures:    ' + str(GROUP_FAIL))
-    print('Most common exit code:       ' + str(EXIT_FAIL))
-    print('____________________________________________')
-    print('Number of Exit 1 Failures:   ' + str(E1_FAIL))
-    print('Number of Exit 7 Failures:   ' + str(E7_FAIL))
+    print('############# QUEUE WAIT TIMES #############')
+    print('    ' + ''.ljust(25) + 'Jobs'.rjust(8) + ''.join(('p' + str(int(q * 100))).rjust(13) for q in WAIT_REPORT.QUANTILES))
+    for (dimension, title) in [(None, 'All jobs')] + WAIT_REPORT.DIMENSIONS:
+        if dimension is not None:
+            print('By ' + title.lower())
+        for (item, count, WAITS) in WAIT_REPORT.percentiles(dimension):
+            print('    ' + str(item).ljust(25) + str(count).rjust(8) + ''.join(histogram.format_elapsed(int(round(wait))).rjust(13) for wait in WAITS))
     print('____________________________________________')
 
 
 """
-get_completed(STATE_INFO)
+collect_wait_metrics(METRICS)
 
-@param STATE_INFO
+@param METRICS - The output.Metrics to add our percentiles to
+
+Everything get_wait() prints, as metrics.
+"""
+def collect_wait_metrics(METRICS):
+    LABELS = {'PARTITIONS': 'partition', 'QOS': 'qos', 'ACCOUNTS': 'account', 'SIZES': 'cpus'}
+
+    METRICS.describe('slurm_job_wait_seconds', 'Queue wait of jobs that started within the window, by percentile')
+    for (dimension, title) in [(None, 'All jobs')] + WAIT_REPORT.DIMENSIONS:
+        for (item, count, WAITS) in WAIT_REPORT.percentiles(dimension):
+            for (q, wait) in zip(WAIT_REPORT.QUANTILES, WAITS):
+                SAMPLE_LABELS = {'quantile': str(q)}
+                if dimension is not None:
+                    SAMPLE_LABELS[LABELS[dimension]] = item
+                METRICS.add('slurm_job_wait_seconds', int(round(wait)), SAMPLE_LABELS)
+
+
+"""
+get_completed(OUT)
+
+@param OUT - Where to print to.  Default: stdout
 
 Get information on completed jobs.  Will run a Slurm command that will gather
 stats on completed jobs, list out the amount of failures.
 """
-def get_completed():
+def get_completed(OUT=None):
 
     # Print all this data.
-    print('____________________________________________')
-    print('############### JOB STATUS #################')
-    print('Running jobs:    ' + str(RUNNING))
-    print('Eligible jobs:   ' + str(ELIGIBLE))
-    print('Successful jobs: ' + str(COMPLETED))
-    print('Cancelled jobs:  ' + str(CANCELLED))
-    print('Overtime jobs:   ' + str(TIMEOUT))
-    print('Failed jobs:     ' + str(FAILED))
-    print('____________________________________________')
-    print('Total jobs:      ' + str(TOTAL))
-    print('____________________________________________')
-    print('Failure Rate:    ' + str(str(int(FAIL_RATE)) + '%'))
-    print('Success Rate:    ' + str(str(int(COMP_RATE)) + '%'))
-    print('____________________________________________')
+    print('____________________________________________', file=OUT)
+    print('############### JOB STATUS #################', file=OUT)
+    print('Running jobs:    ' + str(RUNNING), file=OUT)
+    print('Eligible jobs:   ' + str(ELIGIBLE), file=OUT)
+    print('Successful jobs: ' + str(COMPLETED), file=OUT)
+    print('Cancelled jobs:  ' + str(CANCELLED), file=OUT)
+    print('Overtime jobs:   ' + str(TIMEOUT), file=OUT)
+    print('Failed jobs:     ' + str(FAILED), file=OUT)
+    print('____________________________________________', file=OUT)
+    print('Total jobs:      ' + str(TOTAL), file=OUT)
+    print('____________________________________________', file=OUT)
+    print('Failure Rate:    ' + str(str(int(FAIL_RATE)) + '%'), file=OUT)
+    print('Success Rate:    ' + str(str(int(COMP_RATE)) + '%'), file=OUT)
+    print('____________________________________________', file=OUT)
 
 
 ### Call Main